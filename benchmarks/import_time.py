@@ -0,0 +1,65 @@
+"""
+Import time regression benchmark: `from invest import Stock` must stay fast and must not
+load the heavy optional dependencies (they are imported lazily by the functions using them).
+
+    python benchmarks/import_time.py [--repeat 5] [--budget 1.5]
+
+Each measure runs in a fresh interpreter; the exit code is 1 if the median time exceeds
+the budget (in seconds) or if a forbidden module is imported.
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FORBIDDEN = ['sklearn', 'scipy', 'plotly', 'toolz', 'matplotlib', 'piecewise_regression', 'yaml', 'yahooquery']
+
+SNIPPET = """
+import sys, time, json
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'elapsed': elapsed, 'modules': sorted(set(m.split('.')[0] for m in sys.modules))}}))
+"""
+
+
+def measure(statement, repeat=5):
+    """
+    Time an import statement in repeat fresh interpreters.
+
+    :return: the list of timings (seconds) and the top level modules loaded by the last run
+    """
+    timings, modules = [], []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', SNIPPET.format(statement=statement)],
+                                cwd=ROOT, capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.splitlines()[-1])
+        timings.append(result['elapsed'])
+        modules = result['modules']
+    return timings, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--statement', default='from invest import Stock')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=1.5, help='maximum median import time in seconds')
+    args = parser.parse_args()
+
+    timings, modules = measure(args.statement, args.repeat)
+    median = statistics.median(timings)
+    loaded = [module for module in FORBIDDEN if module in modules]
+    print(f"{args.statement}: median {median:.3f}s, min {min(timings):.3f}s over {args.repeat} runs")
+    if loaded:
+        print(f"FAIL: heavy modules imported eagerly: {', '.join(loaded)}")
+    if median > args.budget:
+        print(f"FAIL: over the budget of {args.budget:.3f}s")
+    return int(bool(loaded) or median > args.budget)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,299 @@
+"""
+Benchmarks of the screening pipeline on synthetic stocks (invest.sources.SyntheticSource, no
+network): Stock property access, main_fundamental_indicators, detect_trend (both windows and
+both engines), volatility, compute_score and whole universe screens of 100, 1k and 10k symbols.
+
+    python benchmarks/pipeline.py [--only screen_100 detect_trend] [--save] [--tolerance 0.3] [--instrument]
+
+Each benchmark runs in a fresh interpreter and reports its wall time (the sum of its timed
+stages, the setup excluded), the peak resident memory of the process and the time of each
+stage. The results are compared with the baselines stored in benchmarks/baselines.json: the
+exit code is 1 if a benchmark is slower, or uses more memory, than its baseline by more than
+the tolerance. --save stores the results as the new baselines, with the machine they were
+measured on (CPU model and count, Python, platform): a warning is printed when the baselines
+come from another machine.
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import contextlib
+import logging
+import subprocess
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINES = os.path.join(ROOT, 'benchmarks', 'baselines.json')
+
+# Stock properties read by the fundamental indicators
+PROPERTIES = ['market_cap', 'reference_price', 'PE', 'PB', 'book_value', 'n_shares', 'net_income', 'revenue',
+              'free_cash_flow', 'current_ratio', 'current_liabilities', 'net_current_assets', 'total_assets',
+              'stockholder_equity', 'dividend_yeld', 'annual_dividends']
+
+
+class Stages(dict):
+    """
+    The cumulated time of each stage (seconds):
+
+        stages = Stages()
+        with stages('download'):
+            ...
+    """
+    @contextlib.contextmanager
+    def __call__(self, name : str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self[name] = self.get(name, 0.0) + time.perf_counter() - start
+
+
+def synthetic_universe(n : int, chunk_size : int = 50):
+    from invest import StockUniverse
+    from invest.sources import SyntheticSource
+    return StockUniverse(SyntheticSource.symbols(n), chunk_size=chunk_size, data_source=SyntheticSource())
+
+
+def loaded_stocks(n : int):
+    stocks = list(synthetic_universe(n).prefetch())
+    for stock in stocks:
+        stock.hist
+    return stocks
+
+
+def stock_properties(stages, n=50):
+    stocks = list(synthetic_universe(n).prefetch())
+    with stages('first access'):
+        for stock in stocks:
+            for name in PROPERTIES:
+                getattr(stock, name)
+    with stages('memoized'):
+        for stock in stocks:
+            for name in PROPERTIES:
+                getattr(stock, name)
+
+
+def fundamental_indicators(stages, n=50):
+    from invest.fundamental_analysis import main_fundamental_indicators
+    stocks = list(synthetic_universe(n).prefetch())
+    with stages('main_fundamental_indicators'):
+        for stock in stocks:
+            main_fundamental_indicators(stock)
+
+
+def detect_trend(stages, n=20, piecewise=2):
+    from invest.technical_analysis import detect_trend
+    stocks = loaded_stocks(n)
+    for engine, count in [('exact', n), ('piecewise', piecewise)]:
+        for window in [120, 2520]:
+            with stages(f'{engine} {window}'):
+                for stock in stocks[:count]:
+                    detect_trend(stock.hist.reset_index(), train_length=window, verbose=0, engine=engine)
+
+
+def volatility(stages, n=50):
+    from invest.fundamental_analysis import volatility
+    stocks = loaded_stocks(n)
+    with stages('volatility'):
+        for stock in stocks:
+            volatility(stock)
+
+
+def compute_score(stages, rows=10000, n=30):
+    import pandas as pd
+    from invest.scoring import compute_score, get_indicators
+    indicators = pd.concat([get_indicators(stock, 'exact') for stock in synthetic_universe(n).prefetch()],
+                           ignore_index=True)
+    # a large universe of the same indicators, resampled
+    indicators = indicators.sample(rows, replace=True, random_state=0, ignore_index=True)
+    indicators['Symbol'] = [f"SYN{i:05d}" for i in range(rows)]
+    with stages('compute_score'):
+        compute_score(indicators)
+
+
+def screen(stages, n=100, trend_engine='exact'):
+    """
+    The screening of a whole universe, chunk by chunk (see StockUniverse.iter_chunks): the data of
+    each chunk are dropped once its indicators are computed, so that 10k symbols fit in memory.
+    """
+    import pandas as pd
+    from invest.universe import prefetch
+    from invest.scoring import compute_score, get_indicators
+    with stages('symbols'):
+        chunks = synthetic_universe(n).chunks()
+    results = []
+    while True:
+        with stages('download'):
+            chunk = next(chunks, None)
+            if chunk is None:
+                break
+            prefetch(chunk)
+        with stages('indicators'):
+            results.extend(get_indicators(stock, trend_engine) for stock in chunk)
+        for stock in chunk:
+            stock.release()
+    with stages('compute_score'):
+        compute_score(pd.concat(results, ignore_index=True))
+
+
+BENCHMARKS = {'stock_properties': (stock_properties, {}),
+              'main_fundamental_indicators': (fundamental_indicators, {}),
+              'detect_trend': (detect_trend, {}),
+              'volatility': (volatility, {}),
+              'compute_score': (compute_score, {}),
+              'screen_100': (screen, {'n': 100}),
+              'screen_1000': (screen, {'n': 1000}),
+              'screen_10000': (screen, {'n': 10000})}
+
+
+def peak_rss():
+    """
+    The peak resident memory of the process, in MB.
+    """
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+def run(name : str, instrument : bool = False):
+    """
+    Run a benchmark in this process and return its results. With instrument, the stages of the
+    pipeline recorded by invest.instrumentation are added (total seconds by stage).
+    """
+    sys.path.insert(0, ROOT)
+    logging.disable(logging.WARNING)
+    warnings.simplefilter('ignore')
+    from invest import instrumentation
+    function, kwargs = BENCHMARKS[name]
+    stages = Stages()
+    # the pipeline prints its fallbacks
+    with contextlib.redirect_stdout(io.StringIO()), \
+         (instrumentation.recording() if instrument else contextlib.nullcontext()) as recorder:
+        function(stages, **kwargs)
+    result = {'wall': sum(stages.values()), 'peak_rss_mb': peak_rss(), 'stages': dict(stages)}
+    if recorder is not None:
+        summary = recorder.summary()
+        result['instrumented'] = summary.loc['stage', 'sum'].to_dict() if 'stage' in summary.index else {}
+    return result
+
+
+def measure(name : str, instrument : bool = False):
+    """
+    Run a benchmark in a fresh interpreter, so that its peak memory is its own.
+    """
+    command = [sys.executable, os.path.abspath(__file__), '--run', name] + (['--instrument'] if instrument else [])
+    output = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def cpu_model():
+    """
+    The model of the CPU (platform.processor() is empty on most Linux systems).
+    """
+    try:
+        with open('/proc/cpuinfo') as handler:
+            for line in handler:
+                if line.startswith('model name'):
+                    return line.split(':', 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def machine():
+    """
+    The machine running the benchmarks, stored with the baselines.
+    """
+    return {'platform': platform.platform(), 'processor': cpu_model(), 'cpus': os.cpu_count(),
+            'python': platform.python_version()}
+
+
+def machine_differences(stored : dict, current : dict):
+    """
+    The features of the machine that make its timings incomparable with the stored baselines.
+    """
+    return [f"{key} {stored.get(key)!r} -> {current[key]!r}" for key in ['processor', 'cpus', 'python']
+            if stored.get(key) != current[key]]
+
+
+def load_baselines(filename : str = BASELINES):
+    try:
+        with open(filename) as handler:
+            return json.load(handler)
+    except FileNotFoundError:
+        return {'machine': {}, 'benchmarks': {}}
+
+
+def save_baselines(baselines : dict, filename : str = BASELINES):
+    with open(filename, 'w') as handler:
+        json.dump(baselines, handler, indent=2, sort_keys=True)
+        handler.write('\n')
+
+
+def regressions(result : dict, baseline : dict, tolerance : float):
+    """
+    The measures of a result exceeding their baseline by more than the tolerance (a fraction).
+    """
+    return [key for key in ['wall', 'peak_rss_mb']
+            if (baseline.get(key) is not None) and result[key] > baseline[key] * (1 + tolerance)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS),
+                        help='the benchmarks to run (default: all of them)')
+    parser.add_argument('--tolerance', type=float, default=0.3,
+                        help='the relative slowdown (or memory increase) tolerated by the baselines')
+    parser.add_argument('--save', action='store_true', help='store the results as the new baselines')
+    parser.add_argument('--instrument', action='store_true',
+                        help='also report the time of the pipeline stages (invest.instrumentation)')
+    parser.add_argument('--baselines', default=BASELINES)
+    parser.add_argument('--run', choices=list(BENCHMARKS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run(args.run, args.instrument)))
+        return 0
+
+    baselines = load_baselines(args.baselines)
+    current = machine()
+    stored = baselines.get('machine') or {}
+    if stored:
+        print(f"Baselines of {stored.get('processor')} ({stored.get('cpus')} CPUs), "
+              f"Python {stored.get('python')}, {stored.get('platform')}")
+        differences = machine_differences(stored, current)
+        if differences:
+            print(f"WARNING: the baselines were measured on another machine ({', '.join(differences)}): "
+                  f"the comparison is not meaningful, --save stores baselines for this one")
+    failed = []
+    print(f"{'benchmark':<34}{'wall (s)':>10}{'baseline':>10}{'RSS (MB)':>10}{'baseline':>10}")
+    for name in args.only:
+        result = measure(name, args.instrument)
+        baseline = baselines['benchmarks'].get(name, {})
+        slower = regressions(result, baseline, args.tolerance)
+        print(f"{name:<34}{result['wall']:>10.3f}{baseline.get('wall', float('nan')):>10.3f}"
+              f"{result['peak_rss_mb']:>10.0f}{baseline.get('peak_rss_mb', float('nan')):>10.0f}"
+              f"{'  FAIL: ' + ', '.join(slower) if slower else ''}")
+        for stage, elapsed in result['stages'].items():
+            print(f"    {stage:<30}{elapsed:>10.3f}{baseline.get('stages', {}).get(stage, float('nan')):>10.3f}")
+        # the 15 slowest stages of the pipeline
+        for stage, elapsed in sorted(result.pop('instrumented', {}).items(), key=lambda item: -item[1])[:15]:
+            print(f"      {stage:<28}{elapsed:>10.3f}")
+        failed.extend(f"{name} {key}" for key in slower)
+        baselines['benchmarks'][name] = result
+
+    if args.save:
+        baselines['machine'] = current
+        save_baselines(baselines, args.baselines)
+        print(f"Baselines saved in {args.baselines}")
+    elif failed:
+        print(f"FAIL: over the baselines by more than {args.tolerance:.0%}: {', '.join(failed)}")
+    return int(bool(failed) and not args.save)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Memory held per stock by a large universe, measured with tracemalloc on synthetic stocks
+(invest.sources.SyntheticSource, no network):
+
+- loaded: a Stock with its raw responses and its derived values, after main_fundamental_indicators;
+- released: the same Stock after snapshot(release=True);
+- snapshot: the StockSnapshot alone.
+
+    python benchmarks/stock_memory.py [--n 50]
+"""
+import gc
+import io
+import os
+import sys
+import pickle
+import argparse
+import tracemalloc
+import contextlib
+import logging
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from invest import Stock
+from invest.sources import SyntheticSource
+from invest.universe import prefetch
+from invest.fundamental_analysis import FUNDAMENTAL_FIELDS, fundamentals_panel
+
+SOURCE = SyntheticSource(missing=0)
+
+
+def synthetic_stock(i):
+    stock = Stock(f'SYN{i:05d}', data_source=SOURCE)
+    prefetch([stock])
+    return stock
+
+
+def allocated(build):
+    """
+    Return what build() returns and the change of the traced memory it causes (bytes).
+    """
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    return result, tracemalloc.get_traced_memory()[0] - before
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--n', type=int, default=50, help='number of synthetic stocks')
+    args = parser.parse_args(argv)
+    logging.disable(logging.WARNING)
+    warnings.simplefilter('ignore')
+
+    def loaded():
+        stocks = [synthetic_stock(i) for i in range(args.n)]
+        with contextlib.redirect_stdout(io.StringIO()):
+            fundamentals_panel(stocks, FUNDAMENTAL_FIELDS)
+        return stocks
+
+    # warm up: imports and module level caches are not part of the stocks
+    with contextlib.redirect_stdout(io.StringIO()):
+        synthetic_stock(args.n).snapshot(release=True)
+
+    # traced from here on, so that the memory released later is accounted for
+    tracemalloc.start()
+    stocks, loaded_size = allocated(loaded)
+    with contextlib.redirect_stdout(io.StringIO()):
+        snapshots, released_delta = allocated(lambda: [stock.snapshot(release=True) for stock in stocks])
+    released_size = loaded_size + released_delta
+    del stocks
+    # deep copies, not to share the field values with the measured snapshots
+    _, snapshot_size = allocated(lambda: [pickle.loads(pickle.dumps(snapshot)) for snapshot in snapshots])
+    _, empty_size = allocated(lambda: [Stock(f'SYN{i:05d}') for i in range(args.n)])
+    tracemalloc.stop()
+
+    rows = {'empty Stock': empty_size,
+            'loaded Stock': loaded_size,
+            'released Stock + snapshot': released_size,
+            'StockSnapshot': snapshot_size}
+    print(f"{args.n} stocks, bytes per stock:")
+    for label, size in rows.items():
+        print(f"  {label:<28}{size / args.n:>12,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,31 @@
-from invest.data_loader import loader
+import importlib
+
 from invest.stock import Stock
-from invest import utils, plot, fundamental_analysis, technical_analysis, scoring#, alternative_analysis
 
-__all__ = ['Stock', 'utils', 'loader', 'plot', 'fundamental_analysis', 'technical_analysis',  'scoring']
\ No newline at end of file
+# Submodules and names loaded on first access (see __getattr__): the analysis modules
+# pull in scikit-learn, plotly, matplotlib and piecewise_regression, which take seconds
+# to import and are not needed to download data
+_LAZY_MODULES = {'loader': 'invest.data_loader.loader',
+                 'utils': 'invest.utils',
+                 'plot': 'invest.plot',
+                 'fundamental_analysis': 'invest.fundamental_analysis',
+                 'technical_analysis': 'invest.technical_analysis',
+                 'scoring': 'invest.scoring'}
+_LAZY_NAMES = {'StockUniverse': 'invest.universe'}
+
+__all__ = ['Stock', 'StockUniverse', 'utils', 'loader', 'plot', 'fundamental_analysis', 'technical_analysis',  'scoring']
+
+
+def __getattr__(name):
+    if name in _LAZY_MODULES:
+        value = importlib.import_module(_LAZY_MODULES[name])
+    elif name in _LAZY_NAMES:
+        value = getattr(importlib.import_module(_LAZY_NAMES[name]), name)
+    else:
+        raise AttributeError(f"module 'invest' has no attribute '{name}'")
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -9,6 +9,7 @@ from time import sleep
 import pandas as pd
 from bs4 import BeautifulSoup
 from invest.data_loader import loader
+from invest.scheduler import RequestScheduler
 from selenium import webdriver
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.common.by import By
@@ -18,11 +19,15 @@ root_folder = (os.path.dirname(os.path.normpath(__file__)))
 
 
 class LinkedinScraper:
-    def __init__(self, email, password):
+    def __init__(self, email, password, scheduler=None):
         self.email = email
         self.password = password
         self.linkedin = self.load_linkedin()
         self.driver = webdriver.Chrome()
+        # one page at a time, starting from one every 5 seconds: faster while Linkedin
+        # answers, slower as soon as it pushes back
+        self.scheduler = scheduler or RequestScheduler(rate=0.2, burst=1, min_rate=0.02, max_rate=1,
+                                                       increase=0.02, max_concurrency=1, backoff=10)
 
 
     def jobs_url(self, company):
@@ -43,6 +48,15 @@ class LinkedinScraper:
         self.driver.find_element(By.ID, "password").send_keys(Keys.RETURN)
         return self.driver
 
+    def load_page(self, url):
+        self.driver.get(url)
+        return BeautifulSoup(self.driver.page_source, "html.parser")
+
+    @staticmethod
+    def is_throttled(soup):
+        text = soup.get_text()
+        return ('HTTP ERROR 429' in text) or ('Too Many Requests' in text)
+
     @staticmethod
     def get_employees_number(soup):
         s_1 = soup.get_text()
@@ -78,12 +92,11 @@ class LinkedinScraper:
 
     def scrape(self, company_list : set):
         results = {}
-        driver = self.connect()
+        self.connect()
         for company in company_list:
             print(f"Scraping {company}")
-            sleep(5)
-            driver.get(self.jobs_url(company))
-            soup = BeautifulSoup(driver.page_source, "html.parser")
+            url = self.jobs_url(company)
+            soup = self.scheduler.request(lambda: self.load_page(url), url, is_throttled=self.is_throttled)
             try:
                 results[company] = {
                     "open_jobs": self.get_open_jobs(soup),
@@ -92,7 +105,6 @@ class LinkedinScraper:
                 print(
                     f"Scraped {company}: {results[company]['open_jobs']} open jobs and {results[company]['followers']} followers!"
                 )
-                sleep(5)
             except Exception as e:
                 print(f"ERROR {e}: {e.__doc__}")
                 pass
@@ -0,0 +1,241 @@
+"""
+Asynchronous download of the yahooquery modules (quoteSummary, fundamentals time series and
+price history) of many stocks from a single event loop. The responses have the same format
+as the ones of yahooquery.Ticker, so they fill the same Stock caches (see Stock.aload).
+"""
+import asyncio
+import random
+import logging
+from datetime import datetime
+
+import pandas as pd
+
+from invest.stock import QUOTE_SUMMARY_MODULES
+from invest.scheduler import default_scheduler
+
+logger = logging.getLogger()
+
+COOKIE_URL = "https://fc.yahoo.com"
+CRUMB_URL = "https://query2.finance.yahoo.com/v1/test/getcrumb"
+DEFAULT_QUERY_PARAMS = {'lang': 'en-US', 'region': 'US', 'corsDomain': 'finance.yahoo.com', 'formatted': 'false'}
+
+# Fundamentals time series of the financial statement modules: (FUNDAMENTALS_OPTIONS keys, with TTM rows)
+TIMESERIES_MODULES = {'all_financial_data': (['income_statement', 'balance_sheet', 'cash_flow', 'valuation'], False),
+                      'balance_sheet': (['balance_sheet'], True),
+                      'cash_flow': (['cash_flow'], True),
+                      'income_statement': (['income_statement'], True)}
+
+
+def format_summary(obj, dates):
+    """
+    Format an unformatted quoteSummary module as yahooquery does: {'raw': ...} values are
+    replaced by their raw value and the timestamps of the date fields by strings.
+    """
+    for key, value in obj.items():
+        if key in dates:
+            if isinstance(value, dict):
+                obj[key] = value.get('fmt', value)
+            elif isinstance(value, list):
+                obj[key] = [item.get('fmt') if isinstance(item, dict)
+                            else datetime.fromtimestamp(item).strftime('%Y-%m-%d %H:%M:%S') for item in value]
+            else:
+                try:
+                    obj[key] = datetime.fromtimestamp(value).strftime('%Y-%m-%d %H:%M:%S')
+                except (TypeError, OSError):
+                    pass
+        elif isinstance(value, dict):
+            if 'raw' in value:
+                obj[key] = value.get('raw')
+            elif 'min' not in value:
+                obj[key] = format_summary(value, dates)
+        elif isinstance(value, list):
+            obj[key] = [format_summary(item, dates) if isinstance(item, dict) else item for item in value]
+    return obj
+
+
+def timeseries_frame(results, symbol : str, prefixes):
+    """
+    Pivot the results of the fundamentals time series endpoint as Ticker.all_financial_data:
+    one row per (asOfDate, periodType, currencyCode), one column per type, indexed by symbol.
+    """
+    frames = []
+    for result in results:
+        data_type = result['meta']['type'][0]
+        if data_type not in result:
+            continue
+        frame = pd.DataFrame.from_records([item for item in result[data_type] if item is not None])
+        if frame.empty:
+            continue
+        frame['reportedValue'] = frame['reportedValue'].apply(lambda x: x.get('raw') if isinstance(x, dict) else x)
+        for prefix in prefixes:
+            data_type = data_type.removeprefix(prefix)
+        frames.append(frame.assign(dataType=data_type, symbol=symbol))
+    if not frames:
+        return f"Fundamentals data unavailable for {symbol}"
+    frame = pd.concat(frames, sort=False)
+    frame['asOfDate'] = pd.to_datetime(frame['asOfDate'], format='%Y-%m-%d')
+    frame = frame.pivot_table(index=['symbol', 'asOfDate', 'periodType', 'currencyCode'],
+                              columns='dataType', values='reportedValue')
+    return pd.DataFrame(frame.to_records()).set_index('symbol')
+
+
+class AsyncYahooClient:
+    """
+    A pooled keep-alive HTTP client (httpx) for the Yahoo Finance endpoints used by Stock.
+    Every request goes through the RequestScheduler (default: the one shared by the process),
+    without blocking the event loop.
+
+        async with AsyncYahooClient() as client:
+            summary = await client.quote_summary('AAPL', ['summary_detail', 'financial_data'])
+    """
+    def __init__(self, max_connections : int = 100, scheduler=None, timeout : float = 30):
+        self.max_connections = max_connections
+        self.scheduler = scheduler or default_scheduler()
+        self.timeout = timeout
+        self.crumb = None
+        self._client = None
+
+    async def __aenter__(self):
+        import httpx
+        from yahooquery.constants import BROWSERS
+        headers = BROWSERS[random.choice(list(BROWSERS.keys()))]
+        self._client = httpx.AsyncClient(headers=headers, timeout=self.timeout, follow_redirects=True,
+                                         limits=httpx.Limits(max_connections=self.max_connections,
+                                                             max_keepalive_connections=self.max_connections))
+        try:
+            # the cookie set by this page is needed to obtain the crumb
+            await self.get(COOKIE_URL)
+            crumb = (await self.get(CRUMB_URL)).text
+            self.crumb = crumb if crumb and '<html>' not in crumb else None
+        except OSError as e:
+            logger.warning(f"Yahoo crumb not available: {e}")
+        return self
+
+    async def __aexit__(self, *args):
+        await self._client.aclose()
+
+    async def get(self, url : str, params : dict = None):
+        import httpx
+
+        async def send():
+            try:
+                return await self._client.get(url, params=params)
+            except httpx.TransportError as e:
+                # retried by the scheduler like the other connection errors
+                raise ConnectionError(str(e)) from e
+        return await self.scheduler.arequest(send, url)
+
+    async def get_json(self, url : str, params : dict = None):
+        params = {**DEFAULT_QUERY_PARAMS, **(params or {})}
+        if self.crumb:
+            params['crumb'] = self.crumb
+        response = await self.get(url, params)
+        try:
+            return response.json()
+        except ValueError:
+            return {'error': f"HTTP {response.status_code}: {response.text[:200]}"}
+
+    async def quote_summary(self, symbol : str, modules):
+        """
+        Return the quoteSummary modules of a symbol: a dict module -> data or error message.
+
+        :param modules: Stock module names (keys of QUOTE_SUMMARY_MODULES)
+        """
+        from yahooquery.constants import CONFIG, MODULES_DICT
+        names = [QUOTE_SUMMARY_MODULES[module] for module in modules]
+        json = await self.get_json(CONFIG['quoteSummary']['path'].format(symbol=symbol),
+                                   {'modules': ','.join(names)})
+        try:
+            result = json['quoteSummary']['result'][0]
+        except (KeyError, IndexError, TypeError):
+            error = (json.get('quoteSummary') or {}).get('error') or json.get('error') or "No data found"
+            error = error.get('description', str(error)) if isinstance(error, dict) else error
+            return {module: error for module in modules}
+        return {module: format_summary(result[name], MODULES_DICT[name]['convert_dates'])
+                        if name in result else f"{name} not found for {symbol}"
+                for module, name in zip(modules, names)}
+
+    async def financials(self, symbol : str, module : str, frequency : str = 'a'):
+        """
+        Return a financial statement module of a symbol ('all_financial_data', 'balance_sheet',
+        'cash_flow' or 'income_statement') in the format of the Ticker method of the same name.
+        """
+        from yahooquery.constants import CONFIG, FUNDAMENTALS_OPTIONS, FUNDAMENTALS_TIME_ARGS
+        options, trailing = TIMESERIES_MODULES[module]
+        prefix = FUNDAMENTALS_TIME_ARGS[frequency]['prefix']
+        prefixes = [prefix, 'trailing'] if trailing else [prefix]
+        types = [f"{p}{t}" for p in prefixes for option in options for t in FUNDAMENTALS_OPTIONS[option]]
+        query = CONFIG['fundamentals']['query']
+        json = await self.get_json(CONFIG['fundamentals']['path'].format(symbol=symbol),
+                                   {'type': ','.join(types),
+                                    'period1': query['period1']['default'],
+                                    'period2': query['period2']['default']})
+        try:
+            results = json['timeseries']['result']
+        except (KeyError, TypeError):
+            return f"Fundamentals data unavailable for {symbol}"
+        return timeseries_frame(results or [], symbol, prefixes)
+
+    async def history(self, symbol : str, start=None):
+        """
+        Return the daily price history of a symbol since start (all of it by default),
+        in the format of Ticker.history.
+        """
+        from yahooquery.constants import CONFIG
+        from yahooquery.utils import convert_to_timestamp, history_dataframe
+        json = await self.get_json(CONFIG['chart']['path'].format(symbol=symbol),
+                                   {'period1': convert_to_timestamp(start),
+                                    'period2': convert_to_timestamp(None, start=False),
+                                    'interval': '1d', 'events': 'div,split'})
+        try:
+            data = json['chart']['result'][0]
+        except (KeyError, IndexError, TypeError):
+            error = (json.get('chart') or {}).get('error') or json.get('error')
+            return error.get('description', str(error)) if isinstance(error, dict) else str(error)
+        if 'timestamp' not in data:
+            return pd.DataFrame(columns=['high', 'low', 'volume', 'open', 'close'])
+        frame = pd.concat({symbol: history_dataframe(data, daily=True)}, names=['symbol', 'date'])
+        return frame.fillna({col: 0 for col in ['dividends', 'splits'] if col in frame.columns})
+
+    def history_fetcher(self, loop):
+        """
+        The fetch(symbols, start) function of invest.history_store.HistoryStore, to be called
+        from a worker thread while loop runs the requests.
+        """
+        def fetch(symbols, start):
+            async def fetch_all():
+                frames = await asyncio.gather(*(self.history(symbol, start) for symbol in symbols))
+                return [frame for frame in frames if isinstance(frame, pd.DataFrame) and not frame.empty]
+            frames = asyncio.run_coroutine_threadsafe(fetch_all(), loop).result()
+            return pd.concat(frames) if frames else pd.DataFrame()
+        return fetch
+
+    async def fetch(self, stock, modules):
+        """
+        Download the given (module, frequency) pairs of a stock and store them in its caches.
+        """
+        code = stock.yahoo_code.upper()
+        summary = [module for module, _ in modules if module in QUOTE_SUMMARY_MODULES]
+        jobs = []
+        if summary:
+            jobs.append(self.quote_summary(code, summary))
+        for module, frequency in modules:
+            if module == 'history':
+                jobs.append(self.fetch_history(stock))
+            elif module not in QUOTE_SUMMARY_MODULES:
+                jobs.append(self.financials(code, module, frequency))
+        results = await asyncio.gather(*jobs)
+        if summary:
+            for module, value in results.pop(0).items():
+                stock.store(module, None, value)
+        for (module, frequency), value in zip([key for key in modules if key[0] not in QUOTE_SUMMARY_MODULES],
+                                              results):
+            stock.store(module, frequency, value)
+        return stock
+
+    async def fetch_history(self, stock):
+        if stock.history_store is None:
+            return await self.history(stock.yahoo_code.upper())
+        # the store decides what to download: it runs in a thread, its requests in this loop
+        fetch = self.history_fetcher(asyncio.get_running_loop())
+        return await asyncio.to_thread(stock.history_store.update, stock.yahoo_code.upper(), fetch)
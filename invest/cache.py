@@ -0,0 +1,145 @@
+import os
+import pickle
+import time
+import logging
+from datetime import timedelta
+
+from invest.utils import select_or_create
+
+logger = logging.getLogger()
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'invest')
+
+# Time to live of each yahooquery module: prices move every day, while
+# fundamentals are published at most quarterly
+DEFAULT_TTL = {'history': timedelta(hours=12),
+               'summary_detail': timedelta(days=1),
+               'financial_data': timedelta(days=1),
+               'key_stats': timedelta(days=1),
+               'asset_profile': timedelta(days=30),
+               'summary_profile': timedelta(days=30),
+               'earnings': timedelta(days=7),
+               'all_financial_data': timedelta(days=7),
+               'balance_sheet': timedelta(days=7),
+               'cash_flow': timedelta(days=7)}
+
+
+def is_error(value):
+    """
+    Return True if a yahooquery response is an error message instead of data.
+    """
+    return (value is None) or isinstance(value, str) or (isinstance(value, dict) and 'error' in value)
+
+
+class DiskCache:
+    """
+    Persistent store of the yahooquery responses, keyed by symbol, module and frequency.
+    Every entry is a pickle file: its modification time is the download time (used for the
+    TTL), its access time is refreshed on every read (used by the LRU eviction, which
+    starts when the total size exceeds max_size bytes).
+    """
+    def __init__(self, path : str = None, ttl : dict = None, max_size : int = 2 * 1024 ** 3):
+        self.path = select_or_create(path or os.environ.get('INVEST_CACHE_DIR', DEFAULT_CACHE_DIR))
+        self.ttl = DEFAULT_TTL | (ttl or {})
+        self.max_size = max_size
+        self._sizes = None
+        self._total_size = 0
+
+    def __getstate__(self):
+        # the size tally is rebuilt by each process
+        state = self.__dict__.copy()
+        state['_sizes'] = None
+        state['_total_size'] = 0
+        return state
+
+    def filename(self, symbol : str, module : str, frequency : str = None):
+        folder = module if frequency is None else f"{module}_{frequency}"
+        return os.path.join(self.path, folder, f"{symbol.upper()}.pkl")
+
+    def is_expired(self, module : str, downloaded_at : float):
+        ttl = self.ttl.get(module)
+        return (ttl is not None) and (time.time() - downloaded_at > ttl.total_seconds())
+
+    def get(self, symbol : str, module : str, frequency : str = None):
+        """
+        Return a cached response, raising KeyError if it is missing or expired.
+        """
+        filename = self.filename(symbol, module, frequency)
+        try:
+            stat = os.stat(filename)
+            if self.is_expired(module, stat.st_mtime):
+                raise KeyError((symbol, module, frequency))
+            with open(filename, 'rb') as handler:
+                value = pickle.load(handler)
+            os.utime(filename, (time.time(), stat.st_mtime))
+            return value
+        except (OSError, EOFError, pickle.UnpicklingError):
+            raise KeyError((symbol, module, frequency))
+
+    def set(self, symbol : str, module : str, frequency : str, value):
+        sizes = self.sizes
+        filename = self.filename(symbol, module, frequency)
+        select_or_create(os.path.dirname(filename))
+        tmp_filename = f"{filename}.{os.getpid()}.tmp"
+        with open(tmp_filename, 'wb') as handler:
+            pickle.dump(value, handler, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_filename, filename)
+        size = os.path.getsize(filename)
+        self._total_size += size - sizes.get(filename, 0)
+        sizes[filename] = size
+        if self.size > self.max_size:
+            self.evict()
+
+    def delete(self, symbol : str, module : str, frequency : str = None):
+        sizes = self.sizes
+        filename = self.filename(symbol, module, frequency)
+        try:
+            os.remove(filename)
+        except OSError:
+            pass
+        self._total_size -= sizes.pop(filename, 0)
+
+    @property
+    def sizes(self):
+        if self._sizes is None:
+            self._sizes = {}
+            for root, _, files in os.walk(self.path):
+                for file in files:
+                    if file.endswith('.pkl'):
+                        filename = os.path.join(root, file)
+                        self._sizes[filename] = os.path.getsize(filename)
+            self._total_size = sum(self._sizes.values())
+        return self._sizes
+
+    @property
+    def size(self):
+        """
+        The total size of the entries in bytes, kept up to date by set, delete and evict.
+        """
+        self.sizes  # the tally is built on first use
+        return self._total_size
+
+    def evict(self, max_size : int = None):
+        """
+        Remove the least recently used entries until the cache fits in max_size bytes.
+        """
+        max_size = self.max_size if max_size is None else max_size
+        sizes = self.sizes
+        last_access = {}
+        for filename in sizes:
+            try:
+                last_access[filename] = os.stat(filename).st_atime
+            except OSError:
+                last_access[filename] = 0
+        for filename in sorted(last_access, key=last_access.get):
+            if self._total_size <= max_size:
+                break
+            self._total_size -= sizes.pop(filename)
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+        logger.info(f"Cache evicted down to {self._total_size} bytes")
+
+    def clear(self):
+        self.evict(max_size=0)
@@ -1,14 +1,62 @@
-from langchain_community.document_loaders import AsyncChromiumLoader
+import asyncio
+from io import StringIO
+
 from bs4 import BeautifulSoup
 import pandas as pd
 import requests
 
-def load_isin_list():
-    url = f"https://www.milanofinanza.it/quotazioni/ricerca/listino-completo-2ae?campoord=&ord=&alias=&selettorecod=&pag=0"
-    html_code = requests.get(url)
-    soup = BeautifulSoup(html_code.content, 'html.parser')
-    tables = pd.read_html(str(soup.find("table")))[0]
-    return tables.loc[tables['Codice ISIN'].str.startswith('IT')].reset_index(drop=1)
+LISTING_URL = "https://www.milanofinanza.it/quotazioni/ricerca/listino-completo-2ae?campoord=&ord=&alias=&selettorecod=&pag={page}"
+# The columns of the listing table (see invest/symbols/euronext_milano.csv)
+LISTING_COLUMNS = ['Nome', 'Codice ISIN', 'Ultimo prezzo', 'Var. %', 'Ora ultimo prezzo', 'Volume progr.',
+                   'Migliore Denaro', 'Migliore Lettera', 'Prezzo di Riferimento', 'Apertura', 'MF Risk']
+
+def listing_session(pool_size : int = 4, retries : int = 3):
+    """
+    A requests Session reusing its connections, retrying the failed requests with backoff.
+    """
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                          max_retries=Retry(total=retries, backoff_factor=0.5,
+                                            status_forcelist=[429, 500, 502, 503, 504]))
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def iter_isin_list(session=None, max_pages : int = 500, timeout : float = 30):
+    """
+    Walk the pages of the Milano Finanza listing, yielding its rows (as dicts) page by page.
+    Each page is parsed once by lxml, keeping only the table with the 'Codice ISIN' column.
+    The walk stops at the first empty page or when a page repeats the rows already seen
+    (the website serves the last page again past the end).
+    """
+    session = session or listing_session()
+    seen = set()
+    for page in range(max_pages):
+        response = session.get(LISTING_URL.format(page=page), timeout=timeout)
+        response.raise_for_status()
+        try:
+            table = pd.read_html(StringIO(response.text), match='Codice ISIN', flavor='lxml')[0]
+        except ValueError:
+            # no table on the page
+            return
+        isins = set(table['Codice ISIN'].dropna())
+        if table.empty or isins <= seen:
+            return
+        seen |= isins
+        yield from table.to_dict('records')
+
+def load_isin_list(session=None):
+    """
+    The Italian stocks of the Milano Finanza listing (see iter_isin_list), one row per isin:
+    an empty frame with the columns of the listing if it has no rows.
+    """
+    tables = pd.DataFrame(iter_isin_list(session))
+    if tables.empty:
+        return pd.DataFrame(columns=LISTING_COLUMNS)
+    tables = tables.drop_duplicates('Codice ISIN')
+    return tables.loc[tables['Codice ISIN'].str.startswith('IT', na=False)].reset_index(drop=1)
 
 def url_scheda(isin):
     return f"https://www.borsaitaliana.it/borsa/azioni/scheda/{isin}.html?lang=it"
@@ -16,14 +64,131 @@ def url_scheda(isin):
 def url_financials(isin):
     return f"https://www.borsaitaliana.it/borsa/azioni/profilo-societa-dettaglio.html?isin={isin}&lang=it"
 
+def parse_isin_alfa_transcode(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    return pd.read_html(StringIO(str(soup.find_all("table")[1])))[0].set_index(0).T
+
+def parse_financials(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    return pd.read_html(StringIO(str(soup.find_all("table")[1])))[0]
+
+# The tables scraped for each isin: name -> (url of the page, parser of its html)
+TABLES = {'transcode': (url_scheda, parse_isin_alfa_transcode),
+          'financials': (url_financials, parse_financials)}
+
+
+class BrowserPool:
+    """
+    A headless Chromium with a fixed number of reusable tabs. At most size pages are
+    loading at the same time, and two navigations start at least min_interval seconds
+    apart, not to hammer the website.
+
+        async with BrowserPool(size=4) as pool:
+            html = await pool.fetch(url)
+    """
+    def __init__(self, size : int = 4, min_interval : float = 0.5, timeout : float = 30):
+        self.size = size
+        self.min_interval = min_interval
+        self.timeout = timeout
+        self._pages = None
+        self._last_start = None
+
+    async def __aenter__(self):
+        from playwright.async_api import async_playwright
+        self._playwright = await async_playwright().start()
+        self._browser = None
+        try:
+            self._browser = await self._playwright.chromium.launch(headless=True)
+            self._pages = asyncio.Queue()
+            for _ in range(self.size):
+                self._pages.put_nowait(await self._browser.new_page())
+        except BaseException:
+            # __aexit__ is not called: do not leak the browser and the playwright driver
+            if self._browser is not None:
+                await self._browser.close()
+            await self._playwright.stop()
+            raise
+        self._turn = asyncio.Lock()
+        return self
+
+    async def __aexit__(self, *args):
+        await self._browser.close()
+        await self._playwright.stop()
+
+    async def wait_turn(self):
+        async with self._turn:
+            loop = asyncio.get_running_loop()
+            if self._last_start is not None:
+                await asyncio.sleep(max(0, self._last_start + self.min_interval - loop.time()))
+            self._last_start = loop.time()
+
+    async def fetch(self, url : str):
+        page = await self._pages.get()
+        try:
+            await self.wait_turn()
+            await page.goto(url, timeout=self.timeout * 1000)
+            return await page.content()
+        finally:
+            self._pages.put_nowait(page)
+
+
+async def scrape(isins, tables=TABLES, size : int = 4, min_interval : float = 0.5):
+    """
+    Download and parse the Borsa Italiana tables of many isins with a single browser pool.
+    The pages are parsed in a worker thread as soon as they arrive, while the next
+    ones are loading.
+
+    :param isins: the isin codes
+    :param tables: the names of the tables to be scraped, as a list of TABLES keys
+                   or a dict name -> (url function, parser)
+    :return: an async generator of (isin, table name, parsed frame or the exception raised)
+    """
+    names = list(tables)
+    async for result in scrape_pages([(isin, name) for isin in isins for name in names],
+                                     tables, size, min_interval):
+        yield result
+
+
+async def scrape_pages(pages, tables=TABLES, size : int = 4, min_interval : float = 0.5):
+    """
+    Like scrape, for an explicit list of (isin, table name) pairs.
+    """
+    tables = tables if isinstance(tables, dict) else {name: TABLES[name] for name in tables}
+
+    async with BrowserPool(size, min_interval) as pool:
+        async def job(isin, name):
+            url, parser = tables[name]
+            try:
+                html = await pool.fetch(url(isin))
+                return isin, name, await asyncio.to_thread(parser, html)
+            except Exception as e:
+                return isin, name, e
+
+        jobs = [asyncio.ensure_future(job(isin, name)) for isin, name in pages]
+        try:
+            for done in asyncio.as_completed(jobs):
+                yield await done
+        finally:
+            for pending in jobs:
+                pending.cancel()
+
+
+def scrape_tables(isins, tables=TABLES, size : int = 4, min_interval : float = 0.5):
+    """
+    Blocking version of scrape: return a dict (isin, table name) -> parsed frame or exception.
+    """
+    async def collect():
+        return {(isin, name): result async for isin, name, result in scrape(isins, tables, size, min_interval)}
+    return asyncio.run(collect())
+
 def load_isin_alfa_transcode(url_scheda):
-    loader = AsyncChromiumLoader([url_scheda])
-    html = loader.load()
-    soup = BeautifulSoup(str(html[0]), 'html.parser')
-    return pd.read_html(str(soup.find_all("table")[1]))[0].set_index(0).T
+    return parse_isin_alfa_transcode(fetch_html(url_scheda))
 
 def load_financials(url_financials):
-    loader = AsyncChromiumLoader([url_financials])
-    html = loader.load()
-    soup = BeautifulSoup(str(html[0]), 'html.parser')
-    return pd.read_html(str(soup.find_all("table")[1]))[0]
\ No newline at end of file
+    return parse_financials(fetch_html(url_financials))
+
+def fetch_html(url):
+    async def fetch():
+        async with BrowserPool(size=1) as pool:
+            return await pool.fetch(url)
+    return asyncio.run(fetch())
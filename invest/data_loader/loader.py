@@ -1,13 +1,107 @@
-import pandas as pd
 import os
+import zlib
+import pickle
+
+import pandas as pd
+
+from invest.cache import DEFAULT_CACHE_DIR
 
 def load_linkedin():
     filepath = os.path.join(os.path.dirname(__file__), 'alternative', 'linkedin.csv')
     return pd.read_csv(filepath)
 
+# filepath -> (csv modification time, symbols frame, symbol index), filled by load_symbols
+_symbols_cache = {}
+
+
+def symbols_path(filename : str):
+    return os.path.join(os.path.dirname(os.path.dirname(__file__)), 'symbols', filename)
+
+
+def parse_symbols(filepath : str):
+    """
+    Read a symbol list: the first column (the symbol) as string, the other columns as
+    categories when their values repeat (e.g. sectors), as strings otherwise.
+    Only empty fields are missing values ('NA' is a valid ticker).
+    """
+    frame = pd.read_csv(filepath, dtype=str, keep_default_na=False, na_values=[''])
+    frame = frame.drop_duplicates().reset_index(drop=True)
+    return frame.astype({col: 'category' if (i > 0) and (frame[col].nunique() < len(frame)/2) else 'string'
+                         for i, col in enumerate(frame.columns)})
+
+
+def sidecar_path(filepath : str):
+    """
+    Where the pickle sidecar of a csv is kept: in the user cache (INVEST_CACHE_DIR, by default
+    ~/.cache/invest), not next to the csv, which may be in a read-only installed package.
+    The name includes a hash of the csv path, so that two installations do not share it.
+    """
+    folder = os.path.join(os.environ.get('INVEST_CACHE_DIR', DEFAULT_CACHE_DIR), 'symbols')
+    checksum = zlib.crc32(os.path.abspath(filepath).encode())
+    return os.path.join(folder, f"{os.path.basename(filepath)}.{checksum:08x}.pkl")
+
+
+def read_sidecar(filepath : str, mtime : float):
+    """
+    Return the parsed (frame, index) stored in the pickle sidecar of a csv (see sidecar_path),
+    or None if it is missing, older than the csv or written by another pandas version.
+    """
+    try:
+        with open(sidecar_path(filepath), 'rb') as handler:
+            source_mtime, pandas_version, frame, index = pickle.load(handler)
+    except Exception:
+        # missing, truncated or unreadable (e.g. pickled by another pandas or Python version):
+        # the sidecar is just an optimization, the csv is parsed again
+        return None
+    return (frame, index) if (source_mtime == mtime) and (pandas_version == pd.__version__) else None
+
+
+def write_sidecar(filepath : str, mtime : float, frame : pd.DataFrame, index : dict):
+    filename = sidecar_path(filepath)
+    tmp_filename = f"{filename}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(tmp_filename, 'wb') as handler:
+            pickle.dump((mtime, pd.__version__, frame, index), handler, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_filename, filename)
+    except Exception:
+        # e.g. a read-only cache folder: the sidecar is just an optimization
+        try:
+            os.remove(tmp_filename)
+        except OSError:
+            pass
+
+
+def load_symbols_and_index(filename : str):
+    """
+    Return the de-duplicated symbol list of an exchange and a dict symbol -> row. The parsed
+    list is cached in the process and in a pickle sidecar of the csv, both invalidated
+    when the csv modification time changes (the sidecar also when pandas changes).
+    """
+    filepath = symbols_path(filename)
+    mtime = os.stat(filepath).st_mtime
+    cached = _symbols_cache.get(filepath)
+    if cached is None or cached[0] != mtime:
+        parsed = read_sidecar(filepath, mtime)
+        if parsed is None:
+            frame = parse_symbols(filepath)
+            index = {symbol: row for row, symbol in enumerate(frame.iloc[:, 0]) if not pd.isna(symbol)}
+            write_sidecar(filepath, mtime, frame, index)
+            parsed = frame, index
+        cached = _symbols_cache[filepath] = (mtime, *parsed)
+    return cached[1], cached[2]
+
+
 def load_symbols(filename : str):
-    filepath = os.path.join(os.path.dirname(__file__), 'symbols', filename)
-    return pd.read_csv(filepath).drop_duplicates().reset_index(drop=True)
+    # a copy, so that callers can modify it without spoiling the cache
+    return load_symbols_and_index(filename)[0].copy()
+
+
+def load_symbol_index(filename : str):
+    """
+    Return the dict symbol -> row of load_symbols(filename).
+    """
+    return load_symbols_and_index(filename)[1]
 
 def load_borsa_italiana_stocks_symbols():
     return load_symbols('borsa_italiana.csv')
@@ -0,0 +1,104 @@
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+logger = logging.getLogger()
+
+
+def content_hash(text : str):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class RefreshManifest:
+    """
+    Record of the scraped tables (one csv per isin in each table folder): for each isin and
+    table, when it was fetched and the sha256 of its content. It decides which tables are
+    due for a refresh:
+
+    - by default, only the tables whose csv is missing;
+    - with max_age, also the tables fetched more than max_age ago;
+    - with new_only, only the isins never fetched before (e.g. the new ones of load_isin_list);
+    - with force, all of them.
+
+    Tables saved before the manifest existed are recorded by bootstrap, using the
+    modification time of their csv as fetch time.
+    """
+    def __init__(self, filename : str, table_paths : dict):
+        """
+        :param filename: the json file of the manifest
+        :param table_paths: table name -> folder of its csv files
+        """
+        self.filename = filename
+        self.table_paths = table_paths
+        try:
+            with open(filename) as handler:
+                self.entries = json.load(handler)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def csv_path(self, isin : str, table : str):
+        return os.path.join(self.table_paths[table], f'{isin}.csv')
+
+    def bootstrap(self):
+        """
+        Record the csv files not in the manifest yet.
+        """
+        for table, folder in self.table_paths.items():
+            for file in os.listdir(folder):
+                isin, extension = os.path.splitext(file)
+                if extension != '.csv' or table in self.entries.get(isin, {}):
+                    continue
+                filename = os.path.join(folder, file)
+                with open(filename, encoding='utf-8') as handler:
+                    digest = content_hash(handler.read())
+                fetched_at = datetime.fromtimestamp(os.path.getmtime(filename), timezone.utc)
+                self.entries.setdefault(isin, {})[table] = {'fetched_at': fetched_at.isoformat(),
+                                                            'sha256': digest}
+        return self
+
+    def fetched_at(self, isin : str, table : str):
+        entry = self.entries.get(isin, {}).get(table)
+        return None if entry is None else datetime.fromisoformat(entry['fetched_at'])
+
+    def due(self, isins, max_age : timedelta = None, new_only : bool = False, force : bool = False):
+        """
+        Return the (isin, table) pairs to be fetched according to the policy.
+        """
+        now = datetime.now(timezone.utc)
+        pairs = []
+        for isin in isins:
+            if new_only and isin in self.entries:
+                continue
+            for table in self.table_paths:
+                fetched_at = self.fetched_at(isin, table)
+                if (force or fetched_at is None or not os.path.exists(self.csv_path(isin, table))
+                        or (max_age is not None and now - fetched_at > max_age)):
+                    pairs.append((isin, table))
+        return pairs
+
+    def record(self, isin : str, table : str, frame : pd.DataFrame):
+        """
+        Save a freshly fetched table and record it.
+
+        :return: True if the content changed since the previous fetch
+        """
+        text = frame.to_csv(index=0)
+        digest = content_hash(text)
+        previous = self.entries.get(isin, {}).get(table, {}).get('sha256')
+        if digest != previous or not os.path.exists(self.csv_path(isin, table)):
+            with open(self.csv_path(isin, table), 'w', encoding='utf-8') as handler:
+                handler.write(text)
+        self.entries.setdefault(isin, {})[table] = {'fetched_at': datetime.now(timezone.utc).isoformat(),
+                                                    'sha256': digest}
+        return digest != previous
+
+    def save(self):
+        tmp_filename = f"{self.filename}.{os.getpid()}.tmp"
+        with open(tmp_filename, 'w') as handler:
+            json.dump(self.entries, handler, indent=1, sort_keys=True)
+        os.replace(tmp_filename, self.filename)
+        logger.info(f"Refresh manifest saved to {self.filename}")
@@ -0,0 +1,147 @@
+import os
+import logging
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger()
+
+SYMBOLS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'symbols')
+SYMBOL_MASTER_FILE = os.path.join(SYMBOLS_PATH, 'symbol_master.npy')
+
+# Fixed width utf-8 records, so that the master can be memory-mapped
+SYMBOL_MASTER_DTYPE = np.dtype([('isin', 'S12'),
+                                ('ticker', 'S12'),
+                                ('yahoo_code', 'S16'),
+                                ('exchange', 'S16'),
+                                ('name', 'S64')])
+
+
+def read_symbols_csv(filename : str, path : str = SYMBOLS_PATH):
+    # read everything as text: 'NA' is a valid ticker
+    return pd.read_csv(os.path.join(path, filename), dtype=str, keep_default_na=False)
+
+
+def milan_records(path : str = SYMBOLS_PATH):
+    transcode = read_symbols_csv('milan_isin_transcode.csv', path)
+    names = read_symbols_csv('euronext_milano.csv', path).drop_duplicates('Codice ISIN')
+    names = names.set_index('Codice ISIN')['Nome']
+    records = pd.DataFrame({'isin': transcode['Codice Isin'],
+                            'ticker': transcode['Codice Alfanumerico'],
+                            'yahoo_code': transcode['yahoo_code'],
+                            'name': transcode['Codice Isin'].map(names).fillna('')})
+    listed = read_symbols_csv('borsa_italiana.csv', path)['SYMBOL']
+    warrants = read_symbols_csv('warrant_borsa_italiana.csv', path)
+    others = pd.concat([pd.DataFrame({'isin': warrants['Isin'],
+                                      'yahoo_code': warrants['symbols'],
+                                      'name': warrants['titolo']}),
+                        pd.DataFrame({'isin': '', 'yahoo_code': listed, 'name': ''})])
+    others['ticker'] = others['yahoo_code'].str.removesuffix('.MI')
+    return pd.concat([records, others]).assign(exchange='Borsa Italiana')
+
+
+def us_records(filename : str, exchange : str, path : str = SYMBOLS_PATH):
+    symbols = read_symbols_csv(filename, path)
+    # Yahoo writes share classes and units with a dash (BRK-B)
+    return pd.DataFrame({'isin': '',
+                         'ticker': symbols['Symbol'],
+                         'yahoo_code': symbols['Symbol'].str.replace('.', '-', regex=False),
+                         'exchange': exchange,
+                         'name': symbols['Description']})
+
+
+def tokyo_records(path : str = SYMBOLS_PATH):
+    symbols = read_symbols_csv('tokyo_stock_exchange.csv', path)['SYMBOL']
+    return pd.DataFrame({'isin': '', 'ticker': symbols.str.removesuffix('.T'), 'yahoo_code': symbols,
+                         'exchange': 'Tokyo', 'name': ''})
+
+
+def build_symbol_master(path : str = SYMBOLS_PATH):
+    """
+    Merge the symbol lists of all the exchanges in a single array of SYMBOL_MASTER_DTYPE records.
+    When a yahoo code appears more than once, the first record (Borsa Italiana
+    transcode table first) wins. Tickers are not deduplicated: see SymbolMaster.resolve.
+    """
+    records = pd.concat([milan_records(path),
+                         us_records('NYSE.csv', 'NYSE', path),
+                         us_records('NASDAQ.csv', 'NASDAQ', path),
+                         tokyo_records(path)], ignore_index=True)
+    records = records.loc[records['yahoo_code'] != ''].drop_duplicates('yahoo_code')
+    master = np.empty(len(records), dtype=SYMBOL_MASTER_DTYPE)
+    for field in SYMBOL_MASTER_DTYPE.names:
+        master[field] = records[field].fillna('').str.strip().str.encode('utf-8').to_numpy()
+    return master
+
+
+def save_symbol_master(filename : str = SYMBOL_MASTER_FILE, path : str = SYMBOLS_PATH):
+    master = build_symbol_master(path)
+    np.save(filename, master)
+    logger.info(f"{len(master)} symbols written to {filename}")
+    return master
+
+
+class SymbolMaster:
+    """
+    The symbols of all the exchanges, with a hash index from ISIN, yahoo code and ticker
+    (case insensitive) to the records. An identifier is looked up in that order: ISINs and
+    yahoo codes are unique, while the same ticker can be listed on several exchanges.
+    """
+    PRECEDENCE = ('isin', 'yahoo_code', 'ticker')
+
+    def __init__(self, records : np.ndarray):
+        self.records = records
+        self.index = {field: {} for field in self.PRECEDENCE}
+        for field, keys in self.index.items():
+            for row, key in enumerate(records[field].tolist()):
+                if key:
+                    keys.setdefault(key.decode('utf-8').upper(), []).append(row)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, identifier):
+        key = identifier.upper()
+        return any(key in keys for keys in self.index.values())
+
+    def record(self, row : int):
+        record = self.records[row]
+        return {field: record[field].decode('utf-8', errors='ignore') for field in SYMBOL_MASTER_DTYPE.names}
+
+    def resolve(self, identifier : str, exchange : str = None):
+        """
+        Return the record (a dict with the fields of SYMBOL_MASTER_DTYPE) of an ISIN,
+        a yahoo code or a ticker, or None if it is unknown.
+
+        :param identifier: the ISIN, the yahoo code or the ticker, matched in this order
+        :param exchange: only consider the records of this exchange (e.g. 'Borsa Italiana'),
+                         required when the ticker is listed on several exchanges
+        :raises ValueError: if the ticker is listed on several exchanges and none is given
+        """
+        key = identifier.upper()
+        for field in self.PRECEDENCE:
+            rows = self.index[field].get(key, [])
+            if exchange is not None:
+                rows = [row for row in rows if self.records[row]['exchange'].decode('utf-8') == exchange]
+            if not rows:
+                continue
+            if field == 'ticker' and len(rows) > 1:
+                exchanges = ', '.join(self.records[row]['exchange'].decode('utf-8') for row in rows)
+                raise ValueError(f"{identifier} is listed on several exchanges ({exchanges}): pass the exchange")
+            # an ISIN listed more than once: the first record (transcode table) wins
+            return self.record(rows[0])
+        return None
+
+
+@lru_cache(maxsize=None)
+def load_symbol_master(filename : str = SYMBOL_MASTER_FILE):
+    """
+    Load the prebuilt symbol master (memory-mapped) once per process. If the file is
+    missing, the master is built from the csv files in invest/symbols.
+    """
+    try:
+        records = np.load(filename, mmap_mode='r')
+    except OSError:
+        logger.warning(f"{filename} not found, building the symbol master from the csv files")
+        records = build_symbol_master(os.path.dirname(filename))
+    return SymbolMaster(records)
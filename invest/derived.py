@@ -0,0 +1,84 @@
+"""
+Memoized properties with an explicit dependency graph, used by Stock: each value is computed
+once and dropped only when one of the raw modules it depends on (directly or through other
+derived properties) is refreshed.
+"""
+from functools import lru_cache
+
+import pandas as pd
+
+
+class derived:
+    """
+    Decorator of a memoized property depending on raw modules (see Stock.load) and on
+    other derived properties:
+
+        @derived('info', 'reference_price', 'n_shares')
+        def market_cap(self):
+            ...
+
+    The values are kept in the _memo dict of the instance, together with the number of
+    computations and hits of each property in _memo_stats. Exceptions are not memoized.
+    """
+    def __init__(self, *depends_on : str):
+        self.depends_on = depends_on
+        self.function = None
+        self.name = None
+
+    def __call__(self, function):
+        self.function = function
+        self.__doc__ = function.__doc__
+        return self
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        stats = instance._memo_stats.setdefault(self.name, [0, 0])
+        try:
+            value = instance._memo[self.name]
+        except KeyError:
+            value = instance._memo[self.name] = self.function(instance)
+            stats[0] += 1
+        else:
+            stats[1] += 1
+        return value
+
+    def __set__(self, instance, value):
+        raise AttributeError(f"can't set derived property '{self.name}'")
+
+
+def dependency_graph(cls):
+    """
+    Return the dependencies of each derived property of a class: name -> tuple of names.
+    """
+    return {name: attribute.depends_on for klass in reversed(cls.__mro__)
+            for name, attribute in vars(klass).items() if isinstance(attribute, derived)}
+
+
+@lru_cache(maxsize=None)
+def dependents(cls, node : str):
+    """
+    Return the names of the derived properties of a class depending (directly or
+    transitively) on a raw module or on another derived property.
+    """
+    graph = dependency_graph(cls)
+    affected = set()
+    frontier = [node]
+    while frontier:
+        current = frontier.pop()
+        for name, depends_on in graph.items():
+            if current in depends_on and name not in affected:
+                affected.add(name)
+                frontier.append(name)
+    return frozenset(affected)
+
+
+def memo_frame(memo_stats : dict):
+    """
+    The counters of a _memo_stats dict as a frame with columns computed and hits.
+    """
+    return (pd.DataFrame.from_dict(memo_stats, orient='index', columns=['computed', 'hits'])
+              .rename_axis('property').sort_index())
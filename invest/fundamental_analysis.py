@@ -1,148 +1,191 @@
 import pandas as pd
 from invest.ratios import liquidity, efficiency, solvency, valuation
-from sklearn.linear_model import LinearRegression
 import numpy as np
 
-def main_fundamental_indicators(stock):
-    score = pd.DataFrame()
-    score["code"] = [stock.code]
-    score["name"] = [stock.name]
-    score["LastPriceDate"] = [stock.quot_date]
-
-    score["Reference Price"] = [stock.reference_price]
-    score["Graham Price"] = [stock.graham_price]
-
-
-
-    #DIVIDEND
-    score["Dividend yeld"] = [stock.dividend_yeld]
-    score["Payout Ratio"] = [stock.payout_ratio]
+def dividend_years(stock):
     try:
-        N = 2023 - stock.annual_dividends['Year'][0] + 1
-        score["Number of Years of Dividends"] = [N]
-        if N != 0:
-            score["Dividend Consistency"] = [len(stock.annual_dividends)/N]
-        else:
-            score["Dividend Consistency"] = [0]
+        return 2023 - stock.annual_dividends['Year'][0] + 1
     except:
-        score["Number of Years of Dividends"] = [0]
-        score["Dividend Consistency"] = [0]
-
-    #LIQUIDITY
-    score["Quick Ratio"] = [liquidity.get_quick_ratio(stock.cash_and_equivalents,
-                                                      stock.accounts_receivable,
-                                                      stock.marketable_securities,
-                                                      stock.current_liabilities)]
-
-    score["Cash Ratio"] = [liquidity.get_cash_ratio(stock.cash_and_equivalents,
-                                                    stock.marketable_securities,
-                                                    stock.current_liabilities)]
-
-    score["Current Ratio"] = [stock.current_ratio]
-
-    score["Operating Cash Flow Ratio"] = [liquidity.get_operating_cash_flow_ratio(stock.operating_cash_flow,
-                                                                                  stock.current_liabilities)]
+        return 0
 
-    score["Operating Cash Flow Sales Ratio"] = [liquidity.get_operating_cash_flow_sales_ratio(stock.operating_cash_flow,
-                                                                                              stock.revenue)]
+def dividend_consistency(stock):
+    try:
+        N = dividend_years(stock)
+        return len(stock.annual_dividends)/N if N != 0 else 0
+    except:
+        return 0
 
-    score["Short Term Coverage Ratio"] = [liquidity.get_short_term_coverage_ratio(stock.operating_cash_flow,
-                                                                                  stock.accounts_receivable,
-                                                                                  stock.inventory,
-                                                                                  stock.accounts_payable)]
+def yearly_slope(label):
+    def slope(stock):
+        try:
+            return compute_slope(stock.yearly_financials[label])
+        except:
+            return 0
+    return slope
+
+# The inputs of the fundamental indicators: field -> Stock attribute (or function of the stock)
+FUNDAMENTAL_FIELDS = {'code': 'code',
+                      'name': 'name',
+                      'quot_date': 'quot_date',
+                      'reference_price': 'reference_price',
+                      'graham_price': 'graham_price',
+                      'dividend_yeld': 'dividend_yeld',
+                      'payout_ratio': 'payout_ratio',
+                      'dividend_years': dividend_years,
+                      'dividend_consistency': dividend_consistency,
+                      'cash_and_equivalents': 'cash_and_equivalents',
+                      'accounts_receivable': 'accounts_receivable',
+                      'marketable_securities': 'marketable_securities',
+                      'current_liabilities': 'current_liabilities',
+                      'current_ratio': 'current_ratio',
+                      'operating_cash_flow': 'operating_cash_flow',
+                      'revenue': 'revenue',
+                      'inventory': 'inventory',
+                      'accounts_payable': 'accounts_payable',
+                      'current_assets': 'current_assets',
+                      'market_cap': 'market_cap',
+                      'total_debt': 'total_debt',
+                      'total_assets': 'total_assets',
+                      'total_equity': 'total_equity',
+                      'operating_income': 'operating_income',
+                      'depreciation_and_amortization': 'depreciation_and_amortization',
+                      'interest_expense': 'interest_expense',
+                      'free_cash_flow': 'free_cash_flow',
+                      'net_current_assets': 'net_current_assets',
+                      'EPS': 'EPS',
+                      'n_shares': 'n_shares',
+                      'PE': 'PE',
+                      'ROE': 'ROE',
+                      'PB': 'PB',
+                      'PS': 'PS',
+                      'stockholder_equity': 'stockholder_equity',
+                      'price_to_cash_flow': 'price_to_cash_flow',
+                      'price_to_free_cash_flow': 'price_to_free_cash_flow',
+                      'net_cash_per_share': 'net_cash_per_share',
+                      'ROCE': 'ROCE',
+                      'net_income_per_employee': 'net_income_per_employee',
+                      'revenue_per_employee': 'revenue_per_employee',
+                      'full_time_employees': 'full_time_employees',
+                      'ROA': 'ROA',
+                      'NetIncome derivative': yearly_slope('NetIncome'),
+                      'Revenue derivative': yearly_slope('TotalRevenue'),
+                      'OperatingRevenue derivative': yearly_slope('OperatingRevenue'),
+                      'TotalAssets derivative': yearly_slope('TotalAssets'),
+                      'FreeCashFlow derivative': yearly_slope('FreeCashFlow'),
+                      'TangibleBookValue derivative': yearly_slope('TangibleBookValue'),
+                      'volatility': lambda stock: volatility(stock),
+                      'BUYBACK_SCORE': lambda stock: score_buyback(stock)}
+
+def stock_fundamentals(stock, fields=FUNDAMENTAL_FIELDS):
+    """
+    Collect the inputs of the fundamental indicators of a stock.
+
+    :return: a dict field -> value
+    """
+    return {field: getter(stock) if callable(getter) else getattr(stock, getter)
+            for field, getter in fields.items()}
+
+def fundamentals_panel(stocks, fields=FUNDAMENTAL_FIELDS):
+    """
+    Collect the fundamentals of many stocks in a wide frame (one row per stock, one column per field).
+    """
+    return pd.DataFrame([stock_fundamentals(stock, fields) for stock in stocks])
+
+def panel_fundamental_indicators(fundamentals : pd.DataFrame):
+    """
+    Compute the fundamental indicators of a whole universe in a single columnar pass:
+    each ratio of invest.ratios is evaluated once, on the columns of all the stocks.
+    Divisions by zero give ±inf (NaN for 0/0), as in main_fundamental_indicators.
+
+    :param fundamentals: a wide frame (one row per stock, the columns of FUNDAMENTAL_FIELDS,
+                         see fundamentals_panel) or a long one, with columns symbol, field and value
+    :return: the indicators, one row per stock (the columns of main_fundamental_indicators)
+    :rtype: pd.DataFrame
+    """
+    if {'symbol', 'field', 'value'} <= set(fundamentals.columns):
+        fundamentals = fundamentals.pivot(index='symbol', columns='field', values='value')
+        fundamentals = fundamentals.rename_axis(columns=None).reset_index()
+        if 'code' not in fundamentals.columns:
+            fundamentals['code'] = fundamentals['symbol']
+    f = {col: values if col in ['code', 'name', 'quot_date'] else pd.to_numeric(values, errors='coerce')
+         for col, values in fundamentals.reset_index(drop=True).items()}
+
+    score = pd.DataFrame({'code': f['code']})
+    score["name"] = f['name']
+    score["LastPriceDate"] = f['quot_date']
+    score["Reference Price"] = f['reference_price']
+    score["Graham Price"] = f['graham_price']
 
-    score['Working capital over market cap'] = [liquidity.get_working_capital(stock.current_assets,
-                                                                              stock.current_liabilities)/
-                                                                              stock.market_cap]
+    #DIVIDEND
+    score["Dividend yeld"] = f['dividend_yeld']
+    score["Payout Ratio"] = f['payout_ratio']
+    score["Number of Years of Dividends"] = f['dividend_years']
+    score["Dividend Consistency"] = f['dividend_consistency']
 
-    #EFFICIENCY
-    #score["Asset Turnover Ratio"] = [efficiency.get_asset_turnover_ratio(stock.sales,
-    #                                                                     stock.total_assets_begin,
-    #                                                                     stock.total_assets_end )]
+    #LIQUIDITY
+    score["Quick Ratio"] = liquidity.get_quick_ratio(f['cash_and_equivalents'],
+                                                     f['accounts_receivable'],
+                                                     f['marketable_securities'],
+                                                     f['current_liabilities'])
+    score["Cash Ratio"] = liquidity.get_cash_ratio(f['cash_and_equivalents'],
+                                                   f['marketable_securities'],
+                                                   f['current_liabilities'])
+    score["Current Ratio"] = f['current_ratio']
+    score["Operating Cash Flow Ratio"] = liquidity.get_operating_cash_flow_ratio(f['operating_cash_flow'],
+                                                                                 f['current_liabilities'])
+    score["Operating Cash Flow Sales Ratio"] = liquidity.get_operating_cash_flow_sales_ratio(f['operating_cash_flow'],
+                                                                                             f['revenue'])
+    score["Short Term Coverage Ratio"] = liquidity.get_short_term_coverage_ratio(f['operating_cash_flow'],
+                                                                                 f['accounts_receivable'],
+                                                                                 f['inventory'],
+                                                                                 f['accounts_payable'])
+    score['Working capital over market cap'] = liquidity.get_working_capital(f['current_assets'],
+                                                                             f['current_liabilities'])/f['market_cap']
 
     #SOLVENCY
-    score["Debt to Assets Ratio"] = [solvency.get_debt_to_assets_ratio(stock.total_debt,
-                                                                       stock.total_assets)]
-    score["Debt to Equity Ratio"] = [solvency.get_debt_to_equity_ratio(stock.total_debt,
-                                                                       stock.total_equity)]
-
-    score["Interest Coverage Ratio"] = [solvency.get_interest_coverage_ratio(stock.operating_income,
-                                                                             stock.depreciation_and_amortization,
-                                                                             stock.interest_expense)]
-    score["Debt Service Coverage Ratio"] = [solvency.get_debt_service_coverage_ratio(stock.operating_income,
-                                                                                     stock.current_liabilities)]
-
-    score["Free Cash Flow Yield"] = solvency.get_free_cash_flow_yield(stock.free_cash_flow,
-                                                                      stock.market_cap)
-
+    score["Debt to Assets Ratio"] = solvency.get_debt_to_assets_ratio(f['total_debt'], f['total_assets'])
+    score["Debt to Equity Ratio"] = solvency.get_debt_to_equity_ratio(f['total_debt'], f['total_equity'])
+    score["Interest Coverage Ratio"] = solvency.get_interest_coverage_ratio(f['operating_income'],
+                                                                            f['depreciation_and_amortization'],
+                                                                            f['interest_expense'])
+    score["Debt Service Coverage Ratio"] = solvency.get_debt_service_coverage_ratio(f['operating_income'],
+                                                                                    f['current_liabilities'])
+    score["Free Cash Flow Yield"] = solvency.get_free_cash_flow_yield(f['free_cash_flow'], f['market_cap'])
 
     #VALUATION
-    score["price_over_graham"] = [stock.reference_price/stock.graham_price]
-    score["Net current asset per share over price"] = [stock.net_current_assets/stock.market_cap]
-
-    score['EPS over price'] = [stock.EPS/stock.reference_price]
-    score['Revenue per Share'] = [valuation.get_revenue_per_share(stock.revenue,
-                                                                  stock.n_shares)]
-
-    score["PE"] = [stock.PE]
-    score["ROE"] = [stock.ROE]
-    score["PB"] = [stock.PB]
-    score["PS"] = [stock.PS]
-    score['Book Value per Share'] = [valuation.get_book_value_per_share(stock.stockholder_equity,
-                                                                        0,
-                                                                        stock.n_shares)]
-    score["Price to cash flow"] = [stock.price_to_cash_flow]
-    score["Price to free cash flow"] = [stock.price_to_free_cash_flow]
-    score['Net cash over market cap'] = [stock.net_cash_per_share/stock.reference_price]
-    score['ROCE'] = [stock.ROCE]
-    score['Net income per employee'] = [stock.net_income_per_employee]
-    score['Revenue per employee'] = [stock.revenue_per_employee]
-    score['Fulltime employee'] = [stock.full_time_employees]
-    score['market_cap'] = [stock.market_cap]
-    score["Return on Assets"] = [stock.ROA]
+    score["price_over_graham"] = f['reference_price']/f['graham_price']
+    score["Net current asset per share over price"] = f['net_current_assets']/f['market_cap']
+    score['EPS over price'] = f['EPS']/f['reference_price']
+    score['Revenue per Share'] = valuation.get_revenue_per_share(f['revenue'], f['n_shares'])
+    score["PE"] = f['PE']
+    score["ROE"] = f['ROE']
+    score["PB"] = f['PB']
+    score["PS"] = f['PS']
+    score['Book Value per Share'] = valuation.get_book_value_per_share(f['stockholder_equity'], 0, f['n_shares'])
+    score["Price to cash flow"] = f['price_to_cash_flow']
+    score["Price to free cash flow"] = f['price_to_free_cash_flow']
+    score['Net cash over market cap'] = f['net_cash_per_share']/f['reference_price']
+    score['ROCE'] = f['ROCE']
+    score['Net income per employee'] = f['net_income_per_employee']
+    score['Revenue per employee'] = f['revenue_per_employee']
+    score['Fulltime employee'] = f['full_time_employees']
+    score['market_cap'] = f['market_cap']
+    score["Return on Assets"] = f['ROA']
+
+    for col in ['NetIncome derivative', 'Revenue derivative', 'OperatingRevenue derivative',
+                'TotalAssets derivative', 'FreeCashFlow derivative', 'TangibleBookValue derivative',
+                'volatility', 'BUYBACK_SCORE']:
+        score[col] = f[col]
 
-    try:
-        score['NetIncome derivative'] = compute_slope(stock.yearly_financials.NetIncome)
-    except:
-        score['NetIncome derivative'] = 0
-
-    try:
-        score['Revenue derivative'] = compute_slope(stock.yearly_financials.TotalRevenue)
-    except:
-        score['Revenue derivative'] = 0
-
-    try:
-        score['OperatingRevenue derivative'] = compute_slope(stock.yearly_financials.OperatingRevenue)
-    except:
-        score['OperatingRevenue derivative'] = 0
-
-    try:
-        score['TotalAssets derivative'] = compute_slope(stock.yearly_financials.TotalAssets)
-    except:
-        score['TotalAssets derivative'] = 0
-
-    try:
-        score['TotalAssets derivative'] = compute_slope(stock.yearly_financials.TotalAssets)
-    except:
-        score['TotalAssets derivative'] = 0
-    try:
-        score['FreeCashFlow derivative'] = compute_slope(stock.yearly_financials.FreeCashFlow)
-    except:
-        score['FreeCashFlow derivative'] = 0
-    try:
-        score['TangibleBookValue derivative'] = compute_slope(stock.yearly_financials.TangibleBookValue)
-    except:
-        score['TangibleBookValue derivative'] = 0
-
-        
-    score['volatility'] = volatility(stock)
-    score['BUYBACK_SCORE'] = score_buyback(stock)
-   
     return score
 
+def main_fundamental_indicators(stock):
+    return panel_fundamental_indicators(fundamentals_panel([stock]))
+
 
 def compute_slope(y):
     X = np.array(range(len(y))).reshape(-1, 1)
+    from sklearn.linear_model import LinearRegression
     reg = LinearRegression().fit(X, y)
     return reg.coef_.item()
 
@@ -0,0 +1,143 @@
+import os
+import logging
+
+import numpy as np
+import pandas as pd
+
+from invest.utils import select_or_create
+
+logger = logging.getLogger()
+
+DEFAULT_HISTORY_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'invest', 'history')
+
+
+def split_history(frame):
+    """
+    Split a multi-symbol yahooquery history into a dict of daily frames indexed by date.
+    """
+    if not isinstance(frame, pd.DataFrame) or frame.empty:
+        return {}
+    return {symbol: normalize_history(part.droplevel('symbol'))
+            for symbol, part in frame.groupby(level='symbol', sort=False)}
+
+
+def normalize_history(frame):
+    """
+    Index a daily history by a naive DatetimeIndex. yahooquery indexes closed sessions with
+    datetime.date objects and the live session (if any) with a timezone-aware datetime.
+    """
+    frame = frame.copy()
+    frame.index = pd.DatetimeIndex([pd.Timestamp(date).replace(tzinfo=None) for date in frame.index],
+                                   name='date').normalize()
+    frame = frame.loc[~frame.index.duplicated(keep='last')].sort_index()
+    for col in ['dividends', 'splits']:
+        if col in frame.columns:
+            frame[col] = frame[col].fillna(0)
+    return frame
+
+
+def ticker_fetcher(ticker):
+    """
+    Wrap a yahooquery Ticker into the fetch(symbols, start) function used by HistoryStore.
+    """
+    def fetch(symbols, start):
+        ticker.symbols = symbols
+        if start is None:
+            return ticker.history(period="max")
+        return ticker.history(start=start)
+    return fetch
+
+
+def to_yahoo_history(frame, symbol):
+    """
+    Restore the (symbol, date) MultiIndex of yahooquery histories.
+    """
+    return pd.concat({symbol: frame}, names=['symbol', 'date'])
+
+
+class HistoryStore:
+    """
+    Local columnar store of the daily price histories (one parquet file per symbol).
+    Each update downloads only the bars after the last stored date, plus a few
+    overlapping bars: if Yahoo adjusted the overlapping prices, or a split or a dividend
+    occurred in the new bars, the adjusted closes of the whole history changed and the
+    full history is downloaded again.
+    """
+    def __init__(self, path : str = None, overlap : int = 5, rtol : float = 1e-6):
+        self.path = select_or_create(path or os.environ.get('INVEST_HISTORY_DIR', DEFAULT_HISTORY_DIR))
+        self.overlap = overlap
+        self.rtol = rtol
+
+    def filename(self, symbol : str):
+        return os.path.join(self.path, f"{symbol.upper()}.parquet")
+
+    def read(self, symbol : str):
+        try:
+            return pd.read_parquet(self.filename(symbol))
+        except (OSError, ValueError):
+            return None
+
+    def write(self, symbol : str, frame : pd.DataFrame):
+        filename = self.filename(symbol)
+        tmp_filename = f"{filename}.{os.getpid()}.tmp"
+        frame.to_parquet(tmp_filename)
+        os.replace(tmp_filename, filename)
+
+    def is_adjusted(self, stored : pd.DataFrame, fresh : pd.DataFrame):
+        """
+        Return True if the fresh bars are inconsistent with the stored ones.
+        """
+        # the last stored bar may be a live session, still subject to change
+        common = stored.index[:-1].intersection(fresh.index)
+        if not len(common):
+            return True
+        for col in ['close', 'adjclose']:
+            if (col in stored.columns) and (col in fresh.columns):
+                if not np.allclose(stored.loc[common, col], fresh.loc[common, col],
+                                   rtol=self.rtol, equal_nan=True):
+                    return True
+        new_bars = fresh.loc[fresh.index > stored.index[-1]]
+        return any((new_bars[col] != 0).any() for col in ['dividends', 'splits'] if col in new_bars.columns)
+
+    def update_many(self, symbols, fetch):
+        """
+        Bring the stored histories of many symbols up to date.
+
+        :param symbols: the yahoo codes to be updated
+        :type symbols: list
+        :param fetch: a function fetch(symbols, start) returning the multi-symbol yahooquery
+                      history since start (the full history if start is None)
+        :return: a dict symbol -> history with the (symbol, date) index of yahooquery.
+                 Symbols that Yahoo could not provide are missing.
+        """
+        stored = {symbol: self.read(symbol) for symbol in symbols}
+        stored = {symbol: frame for symbol, frame in stored.items()
+                  if frame is not None and not frame.empty}
+        full = [symbol for symbol in symbols if symbol not in stored]
+        results = {}
+        if stored:
+            start = min(frame.index[-min(self.overlap, len(frame))] for frame in stored.values())
+            fresh = split_history(fetch(list(stored), start))
+            for symbol, frame in stored.items():
+                new = fresh.get(symbol)
+                if new is None or new.empty:
+                    results[symbol] = frame
+                elif self.is_adjusted(frame, new):
+                    logger.info(f"{symbol}: prices adjusted, downloading the full history")
+                    full.append(symbol)
+                else:
+                    results[symbol] = pd.concat([frame.loc[frame.index < new.index[0]], new])
+                    self.write(symbol, results[symbol])
+        if full:
+            fresh = split_history(fetch(full, None))
+            for symbol in full:
+                if symbol in fresh:
+                    results[symbol] = fresh[symbol]
+                    self.write(symbol, results[symbol])
+        return {symbol: to_yahoo_history(frame, symbol) for symbol, frame in results.items()}
+
+    def update(self, symbol : str, fetch):
+        """
+        Bring the stored history of a symbol up to date. See update_many.
+        """
+        return self.update_many([symbol], fetch).get(symbol)
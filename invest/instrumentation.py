@@ -0,0 +1,148 @@
+"""
+Opt-in instrumentation of the pipeline: how long each stage takes for each symbol (downloads,
+trend fits, fundamental indicators, scores), the cache hits and misses and the number of HTTP
+requests sent to the data providers.
+
+    from invest import instrumentation
+
+    with instrumentation.recording() as recorder:
+        result = screen(symbols)
+    recorder.summary()
+    recorder.to_jsonl('results/instrumentation.jsonl')
+
+Nothing is recorded outside of a recording block: stage and count then return immediately.
+"""
+import os
+import time
+import threading
+from contextlib import contextmanager, nullcontext
+
+import pandas as pd
+
+COLUMNS = ['symbol', 'kind', 'name', 'value', 'pid', 'time']
+
+# the active Recorder, shared by all the threads of the process (None: disabled)
+_recorder = None
+# the symbol processed by each thread, for the stages and counters that do not know it
+_local = threading.local()
+_NULL = nullcontext()
+
+
+class Recorder:
+    """
+    The records of a recording: each one is a (symbol, kind, name, value, pid, time) tuple, kind
+    being 'stage' (value: seconds) or 'counter' (value: count).
+    """
+    def __init__(self):
+        self.records = []
+        self._lock = threading.Lock()
+
+    def add(self, symbol, kind : str, name : str, value : float):
+        record = (symbol, kind, name, value, os.getpid(), time.time())
+        with self._lock:
+            self.records.append(record)
+
+    def extend(self, records):
+        """
+        Merge the records of another recording, e.g. of a worker process.
+        """
+        with self._lock:
+            self.records.extend(records)
+
+    @contextmanager
+    def stage(self, name : str, symbol=None):
+        symbol = symbol if symbol is not None else current_symbol()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(symbol, 'stage', name, time.perf_counter() - start)
+
+    def to_frame(self):
+        with self._lock:
+            return pd.DataFrame(self.records, columns=COLUMNS)
+
+    def to_jsonl(self, path_or_buf=None):
+        """
+        Write the records as JSON lines (return them as a string if no path is given).
+        """
+        frame = self.to_frame()
+        frame['time'] = pd.to_datetime(frame['time'], unit='s')
+        return frame.to_json(path_or_buf, orient='records', lines=True, date_format='iso')
+
+    def summary(self):
+        """
+        Aggregate the records by stage and counter: number of records, total, mean and maximum value.
+        """
+        return (self.to_frame().groupby(['kind', 'name'])['value']
+                               .agg(['count', 'sum', 'mean', 'max'])
+                               .sort_values('sum', ascending=False))
+
+
+@contextmanager
+def recording(recorder : Recorder = None):
+    """
+    Record the stages and the counters of the whole process while in the block.
+    """
+    global _recorder
+    previous, _recorder = _recorder, recorder or Recorder()
+    try:
+        yield _recorder
+    finally:
+        _recorder = previous
+
+
+def active():
+    """
+    The active Recorder, None outside of a recording block.
+    """
+    return _recorder
+
+
+def stage(name : str, symbol=None):
+    """
+    Time a block as a stage of the given symbol (default: the current one, see symbol_scope).
+    """
+    if _recorder is None:
+        return _NULL
+    return _recorder.stage(name, symbol)
+
+
+def count(name : str, value : float = 1, symbol=None):
+    """
+    Increment a counter of the given symbol (default: the current one).
+    """
+    if _recorder is not None:
+        _recorder.add(symbol if symbol is not None else current_symbol(), 'counter', name, value)
+
+
+def current_symbol():
+    return getattr(_local, 'symbol', None)
+
+
+@contextmanager
+def _symbol(symbol):
+    previous, _local.symbol = current_symbol(), symbol
+    try:
+        yield
+    finally:
+        _local.symbol = previous
+
+
+def symbol_scope(symbol):
+    """
+    Attribute the stages and the counters of the block (in this thread) to a symbol.
+    """
+    if _recorder is None:
+        return _NULL
+    return _symbol(symbol)
+
+
+def recorded(function, *args, **kwargs):
+    """
+    Call a function while recording, in a worker process, and return its result with the
+    records, to be merged (Recorder.extend) by the parent process.
+    """
+    with recording() as recorder:
+        result = function(*args, **kwargs)
+    return result, recorder.records
@@ -0,0 +1,210 @@
+"""
+Point-in-time history of the invest.ratios functions: every ratio is evaluated on all the
+reported periods (annual and quarterly asOfDates) of all the stocks at once.
+"""
+import inspect
+import logging
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from invest.ratios import liquidity, efficiency, solvency, valuation, profitability
+
+logger = logging.getLogger()
+
+RATIO_MODULES = [liquidity, efficiency, solvency, valuation, profitability]
+
+# Argument of the ratio functions -> yahooquery columns (the first one available is used).
+# Arguments ending with _begin / _end are the same quantity at the previous / current period.
+RATIO_INPUTS = {'cash_and_equivalents': ['CashAndCashEquivalents'],
+                'cash_and_cash_equivalents': ['CashAndCashEquivalents'],
+                'marketable_securities': ['AvailableForSaleSecurities'],
+                'current_assets': ['CurrentAssets'],
+                'total_current_assets': ['CurrentAssets'],
+                'current_liabilities': ['CurrentLiabilities'],
+                'total_current_liabilities': ['CurrentLiabilities'],
+                'operating_cash_flow': ['OperatingCashFlow'],
+                'operating_cashflow': ['OperatingCashFlow'],
+                'operations_cash_flow': ['OperatingCashFlow'],
+                'cash_flow_from_operations': ['OperatingCashFlow'],
+                'cash_flow_from_operating_activities': ['OperatingCashFlow'],
+                'revenue': ['TotalRevenue'],
+                'total_revenue': ['TotalRevenue'],
+                'sales': ['TotalRevenue'],
+                'net_sales': ['TotalRevenue'],
+                'net_credit_sales': ['TotalRevenue'],
+                'accounts_receivable': ['AccountsReceivable'],
+                'accounts_payable': ['AccountsPayable'],
+                'inventory': ['Inventory'],
+                'cost_of_goods_sold': ['CostOfRevenue'],
+                'operating_expenses': ['OperatingExpense'],
+                'sga_expenses': ['SellingGeneralAndAdministration'],
+                'capital_expenditure': ['CapitalExpenditure'],
+                'capital_expenditures': ['CapitalExpenditure'],
+                'total_debt': ['TotalDebt'],
+                'net_debt': ['NetDebt'],
+                'total_assets': ['TotalAssets'],
+                'total_liabilities': ['TotalLiabilitiesNetMinorityInterest'],
+                'total_equity': ['TotalEquityGrossMinorityInterest', 'StockholdersEquity'],
+                'total_shareholder_equity': ['StockholdersEquity'],
+                'minority_interest': ['MinorityInterest'],
+                'preferred_equity': ['PreferredStockEquity'],
+                'goodwill': ['GoodwillAndOtherIntangibleAssets', 'Goodwill'],
+                'intangible_assets': ['GoodwillAndOtherIntangibleAssets'],
+                'net_fixed_assets': ['NetPPE'],
+                'operating_income': ['OperatingIncome'],
+                'depreciation_and_amortization': ['DepreciationAndAmortization', 'DepreciationAmortizationDepletion'],
+                'interest_expense': ['InterestExpense'],
+                'free_cash_flow': ['FreeCashFlow'],
+                'net_income': ['NetIncome', 'NetIncomeCommonStockholders'],
+                'income_before_tax': ['PretaxIncome'],
+                'earnings_before_tax': ['PretaxIncome'],
+                'earnings_before_interest_and_taxes': ['EBIT'],
+                'income_tax_expense': ['TaxProvision'],
+                'tax_expense': ['TaxProvision'],
+                'effective_tax_rate': ['TaxRateForCalcs'],
+                'dividends': ['CashDividendsPaid'],
+                'dividends_paid': ['CashDividendsPaid'],
+                'preferred_dividends': ['PreferredStockDividends'],
+                'shares_outstanding': ['ShareIssued', 'OrdinarySharesNumber'],
+                'total_shares_outstanding': ['ShareIssued', 'OrdinarySharesNumber'],
+                'common_shares_outstanding': ['ShareIssued', 'OrdinarySharesNumber'],
+                'average_outstanding_shares': ['DilutedAverageShares', 'BasicAverageShares', 'ShareIssued']}
+
+# Missing values treated as zero, as Stock does for the latest values
+ZERO_WHEN_MISSING = ['marketable_securities', 'accounts_receivable', 'accounts_payable', 'inventory',
+                     'interest_expense', 'minority_interest', 'preferred_equity', 'preferred_dividends']
+
+PRICE_INPUTS = ['stock_price', 'share_price', 'price_per_share', 'market_price_per_share']
+
+
+@lru_cache(maxsize=None)
+def ratio_functions():
+    """
+    Return the (ratio name, function, required arguments) of all the invest.ratios functions.
+    The name is '<module>.<function name without get_>', e.g. 'liquidity.current_ratio'.
+    """
+    functions = []
+    for module in RATIO_MODULES:
+        for name, function in inspect.getmembers(module, inspect.isfunction):
+            if function.__module__ != module.__name__ or not name.startswith('get_'):
+                continue
+            required = tuple(arg for arg, parameter in inspect.signature(function).parameters.items()
+                             if parameter.default is inspect.Parameter.empty)
+            functions.append((f"{module.__name__.split('.')[-1]}.{name[4:]}", function, required))
+    return functions
+
+
+def reports(stock):
+    """
+    Return the annual and quarterly financials and balance sheets of a stock, stacked.
+    """
+    frames = []
+    for module in ['all_financial_data', 'balance_sheet']:
+        for frequency in ['a', 'q']:
+            try:
+                frame = stock.load(module, frequency)
+            except Exception as e:
+                logger.warning(f"{stock.code} {module} {frequency}: {e}")
+                continue
+            if isinstance(frame, pd.DataFrame) and not frame.empty:
+                frames.append(frame.reset_index(drop=True).assign(symbol=stock.code))
+    return frames
+
+
+def close_at(stock, dates):
+    """
+    Return the last close price of a stock at (or before) each date.
+    """
+    try:
+        close = stock.hist['Close'].sort_index()
+    except Exception as e:
+        logger.warning(f"{stock.code} history: {e}")
+        return np.full(len(dates), np.nan)
+    position = close.index.searchsorted(pd.DatetimeIndex(dates), side='right') - 1
+    return np.where(position >= 0, close.to_numpy()[np.maximum(position, 0)], np.nan)
+
+
+def reported_periods(stocks):
+    """
+    Merge the financials and balance sheets of many stocks in a single frame, one row per
+    (symbol, asOfDate, periodType) with the first non-null value of each column, and the
+    close price at each asOfDate.
+    """
+    stocks = list(stocks)
+    frames = [frame for stock in stocks for frame in reports(stock)]
+    if not frames:
+        return pd.DataFrame()
+    periods = (pd.concat(frames, ignore_index=True)
+                 .groupby(['symbol', 'periodType', 'asOfDate'], sort=True).first()
+                 .reset_index())
+    periods['price'] = np.nan
+    by_code = {stock.code: stock for stock in stocks}
+    for code, rows in periods.groupby('symbol', sort=False).indices.items():
+        periods.loc[rows, 'price'] = close_at(by_code[code], periods['asOfDate'].iloc[rows])
+    return periods
+
+
+def ratio_inputs(periods : pd.DataFrame):
+    """
+    Build the matrix of the ratio arguments (one column per argument) from the reported periods
+    of many stocks (see reported_periods, sorted by symbol, period type and date). The _begin
+    values come from the previous period of the same symbol and period type.
+    """
+    def column(labels):
+        available = [label for label in labels if label in periods.columns]
+        if not available:
+            return pd.Series(np.nan, index=periods.index)
+        values = periods[available[0]].astype(float)
+        for label in available[1:]:
+            values = values.fillna(periods[label].astype(float))
+        return values
+
+    inputs = pd.DataFrame({arg: column(labels) for arg, labels in RATIO_INPUTS.items()}, index=periods.index)
+    inputs[ZERO_WHEN_MISSING] = inputs[ZERO_WHEN_MISSING].fillna(0)
+    price = periods['price'].astype(float)
+    for arg in PRICE_INPUTS:
+        inputs[arg] = price
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inputs['market_cap'] = inputs['market_capitalization'] = price * inputs['shares_outstanding']
+        inputs['earnings_per_share'] = inputs['net_income'] / inputs['shares_outstanding']
+        inputs['book_value_per_share'] = inputs['total_shareholder_equity'] / inputs['shares_outstanding']
+        inputs['enterprise_value'] = (inputs['market_cap'] + inputs['total_debt'] + inputs['minority_interest']
+                                      + inputs['preferred_equity'] - inputs['cash_and_equivalents'])
+
+    previous = inputs.groupby([periods['symbol'], periods['periodType']]).shift(1)
+    inputs = pd.concat([inputs, inputs.add_suffix('_end'), previous.add_suffix('_begin')], axis=1)
+    return inputs
+
+
+def ratio_history(stocks, ratios=None):
+    """
+    Evaluate the invest.ratios functions on every reported period of every stock.
+    Each function runs once, on the aligned period matrix of all the stocks. The ratios
+    needing an argument that cannot be derived from the financials are skipped.
+
+    :param stocks: the stocks (e.g. a StockUniverse)
+    :param ratios: the names of the ratios to be evaluated (default: all, see ratio_functions)
+    :return: a tidy frame with columns symbol, asOfDate, periodType, ratio and value
+    :rtype: pd.DataFrame
+    """
+    periods = reported_periods(stocks)
+    columns = ['symbol', 'asOfDate', 'periodType', 'ratio', 'value']
+    if periods.empty:
+        return pd.DataFrame(columns=columns)
+    inputs = ratio_inputs(periods)
+
+    values = {}
+    for name, function, required in ratio_functions():
+        if (ratios is not None and name not in ratios) or not all(arg in inputs.columns for arg in required):
+            continue
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result = function(**{arg: inputs[arg] for arg in required})
+        values[name] = pd.Series(result, index=inputs.index, dtype=float) if np.ndim(result) else float(result)
+    wide = pd.DataFrame(values, index=inputs.index).replace([np.inf, -np.inf], np.nan)
+
+    wide[['symbol', 'asOfDate', 'periodType']] = periods[['symbol', 'asOfDate', 'periodType']]
+    tidy = wide.melt(id_vars=['symbol', 'asOfDate', 'periodType'], var_name='ratio', value_name='value')
+    return tidy.dropna(subset=['value']).sort_values(['symbol', 'asOfDate', 'periodType', 'ratio'],
+                                                     ignore_index=True)[columns]
@@ -0,0 +1,64 @@
+import os
+import glob
+import logging
+
+import pandas as pd
+
+from invest.utils import select_or_create
+
+logger = logging.getLogger()
+
+
+class ResultsStore:
+    """
+    Append-only store of the indicator rows of a screening: a folder of parquet
+    part files, each holding up to flush_every rows. Parts are never rewritten,
+    so a crashed run loses at most the rows still in the buffer, and a new run
+    can skip the symbols already stored (see done).
+    """
+    def __init__(self, path : str, key : str = 'code', flush_every : int = 50):
+        self.path = select_or_create(path)
+        self.key = key
+        self.flush_every = flush_every
+        self._buffer = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.flush()
+
+    @property
+    def parts(self):
+        return sorted(glob.glob(os.path.join(self.path, 'part-*.parquet')))
+
+    def done(self):
+        """
+        Return the set of keys already stored (only the key column is read).
+        """
+        keys = set()
+        for part in self.parts:
+            keys.update(pd.read_parquet(part, columns=[self.key])[self.key])
+        return keys
+
+    def append(self, frame : pd.DataFrame):
+        self._buffer.append(frame)
+        if sum(map(len, self._buffer)) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        frame = pd.concat(self._buffer, ignore_index=True)
+        filename = os.path.join(self.path, f"part-{len(self.parts):06d}-{os.getpid()}.parquet")
+        frame.to_parquet(f"{filename}.tmp", index=False)
+        os.replace(f"{filename}.tmp", filename)
+        self._buffer = []
+        logger.info(f"{len(frame)} rows written to {filename}")
+
+    def read(self):
+        """
+        Materialize all the stored rows (and the buffered ones) in a single frame.
+        """
+        frames = [pd.read_parquet(part) for part in self.parts] + self._buffer
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
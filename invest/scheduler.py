@@ -0,0 +1,333 @@
+"""
+Client side rate limiting of the requests to the data providers (Yahoo Finance, Linkedin).
+"""
+import time
+import asyncio
+import random
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+from functools import lru_cache
+from weakref import WeakKeyDictionary
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+
+from invest import instrumentation
+
+logger = logging.getLogger()
+
+# Statuses meaning "slow down": the rate of the host is cut and the request retried
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+
+class HostState:
+    """
+    Token bucket, concurrency slots and counters of a single host.
+    """
+    def __init__(self, rate : float, burst : float, max_concurrency : int, window : int):
+        self.rate = rate
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.decreased_at = float('-inf')
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        # asyncio semaphores belong to an event loop: one per loop
+        self._async_slots = WeakKeyDictionary()
+        self.waits = deque(maxlen=window)
+        self.requests = 0
+        self.throttled = 0
+        self.retries = 0
+        self.errors = 0
+
+    def async_slots(self, max_concurrency : int):
+        loop = asyncio.get_running_loop()
+        if loop not in self._async_slots:
+            self._async_slots[loop] = asyncio.Semaphore(max_concurrency)
+        return self._async_slots[loop]
+
+
+class RequestScheduler:
+    """
+    A token bucket per host, shared by all the requests of a process: each request takes a
+    token, and the tokens are refilled at the current rate of the host. The rate adapts to
+    what the host tolerates (additive increase, multiplicative decrease): while the requests
+    succeed it grows by about increase requests per second every second, on a 429 or 5xx
+    response it is multiplied by decrease (at most once every cooldown seconds, not once per
+    request in flight) and the host is paused for a jittered exponential backoff (or for its
+    Retry-After) before the request is retried. At most max_concurrency requests per host
+    are in flight at the same time.
+
+        scheduler = RequestScheduler(rate=5)
+        response = scheduler.request(lambda: session.get(url), url)
+        scheduler.stats()
+    """
+    def __init__(self, rate : float = 5.0, burst : float = 5.0, min_rate : float = 0.2, max_rate : float = 100.0,
+                 increase : float = 1.0, decrease : float = 0.5, max_concurrency : int = 8, retries : int = 5,
+                 backoff : float = 1.0, max_backoff : float = 60.0, retry_statuses=RETRY_STATUSES,
+                 retry_exceptions=(OSError,), cooldown : float = 1.0, window : int = 10000):
+        """
+        :param rate: the initial number of requests per second of each host
+        :param burst: the size of the token bucket (requests sent at once after an idle time)
+        :param min_rate: the rate never goes below min_rate
+        :param max_rate: the rate never goes above max_rate
+        :param max_concurrency: the maximum number of requests in flight to the same host
+        :param retries: the number of retries of a throttled or failed request
+        :param backoff: the base of the exponential backoff (seconds)
+        :param window: the number of queue waits kept for the statistics
+        """
+        self.initial_rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_statuses = frozenset(retry_statuses)
+        self.retry_exceptions = tuple(retry_exceptions)
+        self.cooldown = cooldown
+        self.window = window
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def __getstate__(self):
+        # locks cannot be pickled: each process gets its own buckets
+        state = self.__dict__.copy()
+        del state['_lock']
+        state['_hosts'] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def host(self, host : str):
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = HostState(self.initial_rate, self.burst, self.max_concurrency, self.window)
+            return self._hosts[host]
+
+    def _take_token(self, state : HostState):
+        """
+        Take a token if the host is not paused; otherwise return how long to wait (seconds).
+        """
+        with self._lock:
+            now = time.monotonic()
+            state.tokens = min(self.burst, state.tokens + (now - state.updated) * state.rate)
+            state.updated = now
+            if now < state.paused_until:
+                return state.paused_until - now
+            if state.tokens >= 1:
+                state.tokens -= 1
+                return 0.0
+            return (1 - state.tokens) / state.rate
+
+    @contextmanager
+    def slot(self, host : str):
+        """
+        Wait for a concurrency slot and a token of the host, and hold the slot while the
+        request is in flight. The time spent waiting is recorded as queue wait.
+        """
+        state = self.host(host)
+        start = time.monotonic()
+        state.slots.acquire()
+        try:
+            # the rate may change while waiting: the delay is checked again after each sleep
+            while (delay := self._take_token(state)) > 0:
+                time.sleep(delay)
+            self._started(state, start, host)
+            yield state
+        finally:
+            state.slots.release()
+
+    @asynccontextmanager
+    async def aslot(self, host : str):
+        """
+        Like slot, waiting without blocking the event loop.
+        """
+        state = self.host(host)
+        start = time.monotonic()
+        async with state.async_slots(self.max_concurrency):
+            while (delay := self._take_token(state)) > 0:
+                await asyncio.sleep(delay)
+            self._started(state, start, host)
+            yield state
+
+    def _started(self, state : HostState, start : float, host : str):
+        with self._lock:
+            state.waits.append(time.monotonic() - start)
+            state.requests += 1
+        instrumentation.count(f"requests {host}")
+
+    def succeeded(self, state : HostState):
+        with self._lock:
+            # rate successes per second: +increase per second
+            state.rate = min(self.max_rate, state.rate + self.increase / state.rate)
+
+    def throttled(self, state : HostState, attempt : int, retry_after : float = None):
+        """
+        Cut the rate of a host and pause it; return the pause (seconds).
+        """
+        pause = retry_after if retry_after is not None else self.backoff_delay(attempt)
+        with self._lock:
+            now = time.monotonic()
+            state.throttled += 1
+            # the other requests in flight were sent at the same rate: cut it only once
+            if now - state.decreased_at >= self.cooldown:
+                state.rate = max(self.min_rate, state.rate * self.decrease)
+                state.decreased_at = now
+            state.tokens = min(state.tokens, 0)
+            state.paused_until = max(state.paused_until, now + pause)
+        return pause
+
+    def backoff_delay(self, attempt : int):
+        # "full jitter": uniform between 0 and the exponential backoff
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def _should_retry(self, state : HostState, host : str, attempt : int, response=None, error=None,
+                      is_throttled=None):
+        """
+        Update the host after an attempt; return True if the request must be sent again.
+        """
+        last_attempt = attempt == self.retries
+        if error is not None:
+            with self._lock:
+                state.errors += 1
+            if last_attempt:
+                return False
+            pause = self.throttled(state, attempt)
+            logger.warning(f"{host}: {error}, retrying in {pause:.1f}s")
+        elif not (is_throttled or self.is_throttled)(response):
+            self.succeeded(state)
+            return False
+        else:
+            pause = self.throttled(state, attempt, retry_after(response))
+            if last_attempt:
+                return False
+            logger.info(f"{host} throttled, rate {state.rate:.2f}/s, retrying in {pause:.1f}s")
+        with self._lock:
+            state.retries += 1
+        return True
+
+    def request(self, send, url : str, is_throttled=None):
+        """
+        Send a request through the scheduler, retrying it when throttled.
+
+        :param send: a function sending the request and returning the response
+        :param url: the url of the request (its host selects the bucket)
+        :param is_throttled: a function response -> True if the host asked to slow down
+                             (default: the status code is one of retry_statuses)
+        :return: the last response; the last exception is raised if every attempt failed
+        """
+        host = urlsplit(url).netloc or url
+        for attempt in range(self.retries + 1):
+            response, error = None, None
+            with self.slot(host) as state:
+                try:
+                    response = send()
+                except self.retry_exceptions as e:
+                    error = e
+            if not self._should_retry(state, host, attempt, response, error, is_throttled):
+                break
+        if error is not None:
+            raise error
+        return response
+
+    async def arequest(self, send, url : str, is_throttled=None):
+        """
+        Like request, for a coroutine function send.
+        """
+        host = urlsplit(url).netloc or url
+        for attempt in range(self.retries + 1):
+            response, error = None, None
+            async with self.aslot(host) as state:
+                try:
+                    response = await send()
+                except self.retry_exceptions as e:
+                    error = e
+            if not self._should_retry(state, host, attempt, response, error, is_throttled):
+                break
+        if error is not None:
+            raise error
+        return response
+
+    def is_throttled(self, response):
+        return getattr(response, 'status_code', None) in self.retry_statuses
+
+    def stats(self):
+        """
+        Return the state and the counters of each host: current rate (requests per second),
+        requests, throttled responses, retries, errors and queue wait (mean, 95th percentile
+        and maximum, in seconds).
+        """
+        with self._lock:
+            rows = {host: {'rate': state.rate,
+                           'requests': state.requests,
+                           'throttled': state.throttled,
+                           'retries': state.retries,
+                           'errors': state.errors,
+                           'wait_mean': np.mean(state.waits) if state.waits else np.nan,
+                           'wait_p95': np.percentile(state.waits, 95) if state.waits else np.nan,
+                           'wait_max': max(state.waits, default=np.nan)}
+                    for host, state in self._hosts.items()}
+        return pd.DataFrame.from_dict(rows, orient='index').rename_axis('host')
+
+
+def retry_after(response):
+    """
+    Return the Retry-After header of a response in seconds, or None.
+    """
+    try:
+        return float(response.headers.get('Retry-After'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+@lru_cache(maxsize=None)
+def default_scheduler():
+    """
+    The scheduler shared by all the Yahoo Finance requests of the process.
+    """
+    return RequestScheduler()
+
+
+@lru_cache(maxsize=None)
+def scheduled_session_class():
+    # curl_cffi comes with yahooquery and is slow to import: the class is built on first use
+    from curl_cffi import requests as curl_requests
+
+    class ScheduledSession(curl_requests.Session):
+        """
+        The yahooquery session, sending every request through a RequestScheduler.
+        """
+        def __init__(self, scheduler : RequestScheduler, **kwargs):
+            super().__init__(**kwargs)
+            self.scheduler = scheduler
+
+        def request(self, method, url, *args, **kwargs):
+            send = super().request
+            return self.scheduler.request(lambda: send(method, url, *args, **kwargs), url)
+
+    return ScheduledSession
+
+
+def yahoo_session(scheduler : RequestScheduler = None, asynchronous : bool = False, max_workers : int = 8):
+    """
+    Build a session for yahooquery.Ticker (session argument) whose requests go through
+    the scheduler (default: the shared one). With asynchronous, the requests of a
+    multi-symbol Ticker run in max_workers threads.
+    """
+    from requests_futures.sessions import FuturesSession
+    from yahooquery.constants import BROWSERS
+    from yahooquery.session_management import setup_session
+    impersonate = random.choice(list(BROWSERS.keys()))
+    session = scheduled_session_class()(scheduler or default_scheduler(),
+                                        headers=BROWSERS[impersonate], impersonate=impersonate)
+    if asynchronous:
+        session = FuturesSession(max_workers=max_workers, session=session)
+    return setup_session(session)
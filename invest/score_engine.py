@@ -0,0 +1,92 @@
+"""
+Declarative scoring rules, evaluated on float arrays in a single pass over the indicators table.
+"""
+import numpy as np
+import pandas as pd
+
+from invest import instrumentation
+
+
+def inside(values, low, high):
+    """
+    Whether the values are in the open interval (low, high); an infinite bound includes the
+    infinity itself, so that e.g. inf is in (0, inf).
+    """
+    above = (values > low) if np.isfinite(low) else (values >= low)
+    below = (values < high) if np.isfinite(high) else (values <= high)
+    return above & below
+
+
+class Bands:
+    """
+    Piecewise score over open intervals (see inside): the first band (low, high, score)
+    containing the value wins. The score of a band is either a constant or a pair of lists
+    (xp, fp), linearly interpolated with np.interp.
+    """
+    def __init__(self, bands, default=np.nan, nan=np.nan):
+        self.bands = bands
+        self.default = default
+        self.nan = nan
+
+    def __call__(self, values):
+        conditions = [inside(values, low, high) for low, high, _ in self.bands]
+        choices = [np.interp(values, *score) if isinstance(score, tuple) else np.full(values.shape, float(score))
+                   for _, _, score in self.bands]
+        scores = np.select(conditions, choices, default=self.default)
+        return np.where(np.isnan(values), self.nan, scores)
+
+
+class Linear:
+    """
+    Score linearly interpolated through the points (xp, fp), constant outside of them.
+    """
+    def __init__(self, xp, fp, nan=np.nan):
+        self.xp = xp
+        self.fp = fp
+        self.nan = nan
+
+    def __call__(self, values):
+        return np.where(np.isnan(values), self.nan, np.interp(values, self.xp, self.fp))
+
+
+class QuantileCap:
+    """
+    Score growing linearly from 0 (value 0) to 5 (the q-quantile of the column), 5 above
+    the quantile and 0 for negative values. With positive_only the quantile is computed
+    on the positive values only.
+    """
+    def __init__(self, q=0.85, nan=0.0, positive_only=False):
+        self.q = q
+        self.nan = nan
+        self.positive_only = positive_only
+
+    def __call__(self, values):
+        sample = values[values > 0] if self.positive_only else values[~np.isnan(values)]
+        cap = np.quantile(sample, self.q) if len(sample) else np.nan
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = np.select([(values >= 0) & (values <= cap), values > cap, values < 0],
+                               [5 * values / cap, 5.0, 0.0],
+                               default=np.nan)
+        return np.where(np.isnan(values), self.nan, scores)
+
+
+def column_values(table : pd.DataFrame, source):
+    """
+    Return the input of a rule as a float array: source is a column name or a function of the table.
+    """
+    values = table[source] if isinstance(source, str) else source(table)
+    return pd.to_numeric(values, errors='coerce').to_numpy(dtype=float)
+
+
+def evaluate(table : pd.DataFrame, rules):
+    """
+    Evaluate a list of (score name, source, rule) on a table.
+
+    :return: a frame of float64 scores, aligned to the table
+    :rtype: pd.DataFrame
+    """
+    scores = {}
+    for name, source, rule in rules:
+        with instrumentation.stage(name):
+            scores[name] = rule(column_values(table, source))
+    return pd.DataFrame(scores, index=table.index)
@@ -1,62 +1,104 @@
+import os
+import logging
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 import pandas as pd
 from invest.fundamental_analysis import main_fundamental_indicators, compute_slope
 from invest.technical_analysis import detect_trend
-from sklearn.preprocessing import MinMaxScaler
+from invest import instrumentation
+from invest.stock import Stock
+from invest.universe import prefetch, DEFAULT_MODULES
+from invest.score_engine import Bands, Linear, QuantileCap, evaluate
 import numpy as np
 
-def compute_score(indicatori : pd.DataFrame):
-
+logger = logging.getLogger()
+
+inf = np.inf
+
+# The rules of the single indicators, shared by SCORE_RULES and the score_* helpers
+YELD = QuantileCap(0.9)
+PAYOUT = Bands([(0, 1, ([0, 1], [0, 5]))], default=0)  # of 1 - payout ratio
+DIVIDEND_HISTORY = Linear([0, 20], [0, 5])
+DIVIDEND_CONSISTENCY = Linear([0, 1], [0, 5])
+QUICK_RATIO = Linear([0, 1], [0, 5])
+CASH_RATIO = Linear([0.5, 1], [0, 5])
+CURRENT_RATIO = Linear([1, 3], [0, 5])
+OCFR = Bands([(2, inf, 5), (1.2, inf, 4), (1, inf, 3), (-inf, 0, 0), (-inf, 0.8, 1), (-inf, 1, 2)])
+PRICE_EARNINGS = Bands([(-inf, 10, 5), (-inf, 12, 4), (-inf, 15, 3), (-inf, 17.5, 2)], default=1, nan=0)
+PRICE_BOOK = Bands([(0, 1, 5), (1, 2, 4), (2, 3, 2), (3, inf, 1)], default=0, nan=0)
+RETURN_ON_ASSETS = Bands([(0, inf, ([0, 0.1], [0, 5])), (-inf, 0, 0)], nan=0)
+RETURN_ON_EQUITY = Bands([(0, inf, ([0, 0.2], [0, 5])), (-inf, 0, 0)], nan=0)
+NET_CURRENT_ASSETS = Bands([(0, inf, 5), (-1, 0, 4), (-5, -1, 3), (-10, -5, 2), (-inf, -10, 1)], nan=3)
+ROCE = QuantileCap(0.9)
+EPS = QuantileCap(positive_only=True)
+PFCF = QuantileCap(nan=np.nan, positive_only=True)
+GRAHAM = Bands([(-inf, 1, 5), (1, 1.1, 4), (1.1, 1.5, 3), (1.5, 2, 2), (2, inf, 1)], nan=0)
+GROWTH = Bands([(0, inf, 5)], default=0, nan=0)
+
+SCORE_RULES = [
     #DIVIDEND
-    indicatori['score_dividend_YELD'] = score_YELD(indicatori['Dividend yeld'])
-    indicatori['score_dividend_PAYOUT'] = score_PAYOUT(indicatori['Payout Ratio'])
-    indicatori['score_dividend_HISTORY'] = score_DIVHIST(indicatori['Number of Years of Dividends'])
-    indicatori['score_dividend_CONSISTENCY'] = score_DIVCONSISTENCY(indicatori['Dividend Consistency'])
+    ('score_dividend_YELD', 'Dividend yeld', YELD),
+    ('score_dividend_PAYOUT', lambda t: 1 - t['Payout Ratio'], PAYOUT),
+    ('score_dividend_HISTORY', 'Number of Years of Dividends', DIVIDEND_HISTORY),
+    ('score_dividend_CONSISTENCY', 'Dividend Consistency', DIVIDEND_CONSISTENCY),
 
     #LIQUIDITY
-    indicatori['score_liquidity_QR'] = score_QR(indicatori['Quick Ratio'])
-    indicatori['score_liquidity_CASHR'] = score_CashRatio(indicatori['Cash Ratio'])
-    indicatori['score_liquidity_CUR'] = score_CurrentRatio(indicatori['Current Ratio'])
-    indicatori['score_liquidity_OCFR'] = score_OCFR(indicatori['Operating Cash Flow Ratio'])
-    #indicatori['score_liquidity_OCFSR'] = score_quantile(indicatori['Operating Cash Flow Sales Ratio'],  nan_score=np.nan)
-    #indicatori['score_liquidity_STCFR'] = score_quantile(indicatori['Short Term Coverage Ratio'],  nan_score=np.nan)
-    #indicatori['score_liquidity_WCOMC'] = score_quantile(indicatori['Working capital over market cap'],  nan_score=np.nan)
-    indicatori['score_liquidity_MCAP'] = score_quantile(indicatori['market_cap'],  nan_score=np.nan)
+    ('score_liquidity_QR', 'Quick Ratio', QUICK_RATIO),
+    ('score_liquidity_CASHR', 'Cash Ratio', CASH_RATIO),
+    ('score_liquidity_CUR', 'Current Ratio', CURRENT_RATIO),
+    ('score_liquidity_OCFR', 'Operating Cash Flow Ratio', OCFR),
+    #('score_liquidity_OCFSR', 'Operating Cash Flow Sales Ratio', QuantileCap(nan=np.nan)),
+    #('score_liquidity_STCFR', 'Short Term Coverage Ratio', QuantileCap(nan=np.nan)),
+    #('score_liquidity_WCOMC', 'Working capital over market cap', QuantileCap(nan=np.nan)),
+    ('score_liquidity_MCAP', 'market_cap', QuantileCap(nan=np.nan)),
 
     #EFFICIENCY
-    #indicatori['score_value_ATR'] = score_efficiency_ATR(indicatori.copy())
-    indicatori['score_value_NIPE'] = score_quantile(indicatori['Net income per employee'])
+    ('score_value_NIPE', 'Net income per employee', QuantileCap()),
 
     #SOLVENCY
-    indicatori['score_solvency_DAR'] = score_quantile(indicatori['Debt to Assets Ratio']**-1,  nan_score=np.nan)
-    #indicatori['score_solvency_DER'] = score_quantile(indicatori['Debt to Equity Ratio']**-1,  nan_score=np.nan)
-    indicatori['score_solvency_ICR'] = score_quantile(indicatori['Interest Coverage Ratio'],  nan_score=np.nan)
-    indicatori['score_solvency_DSCR'] = score_quantile(indicatori['Debt Service Coverage Ratio'],  nan_score=np.nan)
-    indicatori['score_solvency_FCFY'] = score_quantile(indicatori['Free Cash Flow Yield'],  nan_score=np.nan)
+    ('score_solvency_DAR', lambda t: t['Debt to Assets Ratio']**-1, QuantileCap(nan=np.nan)),
+    #('score_solvency_DER', lambda t: t['Debt to Equity Ratio']**-1, QuantileCap(nan=np.nan)),
+    ('score_solvency_ICR', 'Interest Coverage Ratio', QuantileCap(nan=np.nan)),
+    ('score_solvency_DSCR', 'Debt Service Coverage Ratio', QuantileCap(nan=np.nan)),
+    ('score_solvency_FCFY', 'Free Cash Flow Yield', QuantileCap(nan=np.nan)),
 
     #VALUE
-    indicatori['score_value_PE'] = score_PE(indicatori['PE'])
-    indicatori['score_value_PB'] = score_PB(indicatori['PB'])
-    indicatori['score_value_ROA'] = score_ROA(indicatori['Return on Assets'])
-    indicatori['score_value_ROE'] = score_ROE(indicatori['ROE'])
-    indicatori['score_value_NCAPSOP'] = score_NCAPSOP(indicatori['Net current asset per share over price'])
-    indicatori['score_value_ROCE'] = score_ROCE(indicatori['ROCE'])
-    indicatori['score_value_EPS'] = score_EPS(indicatori['EPS over price'])
-    indicatori['score_value_BVS'] = score_quantile((indicatori['Book Value per Share'] - indicatori['Reference Price'])/indicatori['Reference Price'])
-    indicatori['score_value_PFCF'] = score_price_to_free_cashflow(indicatori['Price to free cash flow'])
-    indicatori['score_value_graham'] = score_graham(indicatori['price_over_graham'])
+    ('score_value_PE', 'PE', PRICE_EARNINGS),
+    ('score_value_PB', 'PB', PRICE_BOOK),
+    ('score_value_ROA', 'Return on Assets', RETURN_ON_ASSETS),
+    ('score_value_ROE', 'ROE', RETURN_ON_EQUITY),
+    ('score_value_NCAPSOP', 'Net current asset per share over price', NET_CURRENT_ASSETS),
+    ('score_value_ROCE', 'ROCE', ROCE),
+    ('score_value_EPS', 'EPS over price', EPS),
+    ('score_value_BVS', lambda t: (t['Book Value per Share'] - t['Reference Price'])/t['Reference Price'], QuantileCap()),
+    ('score_value_PFCF', 'Price to free cash flow', PFCF),
+    ('score_value_graham', 'price_over_graham', GRAHAM),
 
     #GROWTH
-    indicatori['score_growth_netincome'] = 5*(indicatori['NetIncome derivative'] > 0).astype(int)
-    indicatori['score_growth_revenue'] = 5*(indicatori['Revenue derivative'] > 0).astype(int)
-    #indicatori['score_growth_operatingrevenue'] = 5*(indicatori['OperatingRevenue derivative'] > 0).astype(int)
-    indicatori['score_growth_assets'] = 5*(indicatori['TotalAssets derivative'] > 0).astype(int)
-    #indicatori['score_growth_freecashflow'] = 5*(indicatori['FreeCashFlow derivative'] > 0).astype(int)
-    #indicatori['score_growth_tangiblebookvalue'] = 5*(indicatori['TangibleBookValue derivative'] > 0).astype(int)
+    ('score_growth_netincome', 'NetIncome derivative', GROWTH),
+    ('score_growth_revenue', 'Revenue derivative', GROWTH),
+    #('score_growth_operatingrevenue', 'OperatingRevenue derivative', GROWTH),
+    ('score_growth_assets', 'TotalAssets derivative', GROWTH),
+    #('score_growth_freecashflow', 'FreeCashFlow derivative', GROWTH),
+    #('score_growth_tangiblebookvalue', 'TangibleBookValue derivative', GROWTH),
 
     #TECHNICAL
-    indicatori['score_technical_sttrend'] = score_TREND(indicatori['st_trend_magnitude'])
-    indicatori['score_technical_lttrend'] = score_TREND(indicatori['lt_trend_magnitude'])
-    #indicatori['score_technical_volatility'] = score_quantile(-indicatori['volatility'])
+    ('score_technical_sttrend', 'st_trend_magnitude', GROWTH),
+    ('score_technical_lttrend', 'lt_trend_magnitude', GROWTH),
+    #('score_technical_volatility', lambda t: -t['volatility'], QuantileCap()),
+]
+
+def compute_score(indicatori : pd.DataFrame, rules=SCORE_RULES):
+    """
+    Score the indicators of each stock (see SCORE_RULES) and compute the overall score,
+    the mean of all the score columns.
+    """
+    with instrumentation.stage('compute_score'):
+        return _compute_score(indicatori, rules)
+
+def _compute_score(indicatori, rules):
+    scores = evaluate(indicatori, rules)
+    indicatori = indicatori.assign(**scores)
 
     #indicatori['VALUE_SCORE'] =  indicatori.filter(like='score_value').mean(axis=1)
     #indicatori['DIVIDEND_SCORE'] =  indicatori.filter(like='score_dividend').mean(axis=1)
@@ -64,31 +106,27 @@ def compute_score(indicatori : pd.DataFrame):
     #indicatori['GROWTH_SCORE'] =  indicatori.filter(like='score_growth').mean(axis=1)
     #indicatori['LIQUIDITY_SCORE'] =  indicatori.filter(like='score_liquidity').mean(axis=1)
     #indicatori['SOLVENCY_SCORE'] =  indicatori.filter(like='score_solvency').mean(axis=1)
-    #indicatori['GRAHAM_SCORE'] =  indicatori['score_value_graham']
-    #indicatori['PE_SCORE'] =  indicatori['score_value_PE'] 
-    #indicatori['PB_SCORE'] =  indicatori['score_value_PB']
 
     indicatori['OVERALL_SCORE'] =  indicatori.filter(like='score').mean(axis=1)
 
     return indicatori.sort_values(by='OVERALL_SCORE', ascending=False)
 
-def score_price_to_free_cashflow(value):
-    tmp = pd.DataFrame()
-    tmp['Price to free cash flow'] = value
-    tmp['score_value_PFCF'] = None
-    tmp.loc[tmp['Price to free cash flow'] <= 0, 'score_value_PFCF'] = 0
-    tmp.loc[tmp['Price to free cash flow'] > 0, 'score_value_PFCF'] = score_quantile(tmp.loc[tmp['Price to free cash flow'] > 0]['Price to free cash flow'])
-    return tmp['score_value_PFCF']
-
-def get_indicators(stock):
-    st_trend_magnitude, st_last_value_trendline = detect_trend(stock.hist.reset_index(),
-                                                         verbose=0)
-
-    lt_trend_magnitude, lt_last_value_trendline = detect_trend(stock.hist.reset_index(),
-                                                               train_length=252*10,
-                                                         verbose=0)
+def get_indicators(stock, trend_engine='piecewise'):
+    with instrumentation.symbol_scope(stock.code), instrumentation.stage('get_indicators'):
+        return _get_indicators(stock, trend_engine)
+
+def _get_indicators(stock, trend_engine):
+    with instrumentation.stage('detect_trend 120'):
+        st_trend_magnitude, st_last_value_trendline = detect_trend(stock.hist.reset_index(),
+                                                             verbose=0, engine=trend_engine)
+
+    with instrumentation.stage('detect_trend 2520'):
+        lt_trend_magnitude, lt_last_value_trendline = detect_trend(stock.hist.reset_index(),
+                                                                   train_length=252*10,
+                                                             verbose=0, engine=trend_engine)
     
-    tmp = main_fundamental_indicators(stock)
+    with instrumentation.stage('main_fundamental_indicators'):
+        tmp = main_fundamental_indicators(stock)
     tmp['st_trendline'] = st_last_value_trendline.tail(1)['predicted_trend'].item()
     tmp['st_trend_magnitude'] = st_trend_magnitude
     tmp['price_over_st_trend'] = (tmp['Reference Price'])/st_last_value_trendline.tail(1)['predicted_trend'].item()
@@ -99,12 +137,111 @@ def get_indicators(stock):
 
     tmp['sector'] = stock.sector
     tmp['description'] = stock.get_info('longBusinessSummary')
-    tmp['#div_past20y'] = years_of_dividend_payments(stock)
-    tmp['score_dividend_DIVTREND'] = score_DIVTREND(stock)
+    with instrumentation.stage('dividends'):
+        tmp['#div_past20y'] = years_of_dividend_payments(stock)
+        tmp['score_dividend_DIVTREND'] = score_DIVTREND(stock)
     return tmp
 
+def process_pool(workers : int):
+    """
+    A pool of worker processes started by a fork server (spawned where it is not available):
+    a process forked from screen would inherit the sockets and the locks of the download
+    threads in whatever state they are.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+    return ProcessPoolExecutor(workers, mp_context=context)
+
+def screen(symbols, workers : int = None, network_workers : int = 4, chunk_size : int = 50,
+           cache=None, history_store=None, sink=None, trend_engine='piecewise', scheduler=None, data_source=None):
+    """
+    Compute the indicators of many stocks. The data of each chunk of symbols are
+    downloaded in bulk by a pool of network_workers threads; as soon as a chunk is
+    available, its stocks are sent to a pool of worker processes running the CPU-bound
+    part of get_indicators (trend fits and fundamental indicators).
+
+    :param symbols: the isins (or codes) of the stocks to be screened
+    :type symbols: iterable
+    :param workers: number of worker processes (default: the number of CPUs, 1 runs in process)
+    :type workers: int
+    :param network_workers: number of chunks downloaded at the same time
+    :type network_workers: int
+    :param sink: where each row is appended as soon as it is computed (e.g. invest.results.ResultsStore).
+                 The stocks already in the sink are skipped, so an interrupted screening can be resumed.
+    :param trend_engine: the breakpoint search of detect_trend ('piecewise' or the faster 'exact')
+    :param scheduler: the invest.scheduler.RequestScheduler throttling the downloads (default: the shared one)
+    :param data_source: where the data are downloaded from, an invest.sources.DataSource (default: Yahoo Finance)
+    :return: the indicators frame (one row per stock, including the ones already in the sink); the
+             errors, as a dict input symbol -> exception, are stored in its attrs['errors']
+
+    Within an invest.instrumentation.recording block, the stages and counters of the worker
+    processes are merged into the active recorder.
+    """
+    workers = workers or os.cpu_count()
+    recorder = instrumentation.active()
+    done = sink.done() if sink is not None else set()
+    errors = {}
+    stocks = []
+    for symbol in symbols:
+        try:
+            stock = Stock(symbol, cache=cache, history_store=history_store, scheduler=scheduler,
+                          data_source=data_source)
+        except Exception as e:
+            errors[symbol] = e
+            continue
+        if stock.code not in done:
+            stocks.append((symbol, stock))
+    chunks = [stocks[i:i + chunk_size] for i in range(0, len(stocks), chunk_size)]
+
+    results = []
+    collect = results.append if sink is None else sink.append
+    # the worker processes are not forked from this process, which runs the download threads
+    pool = process_pool(workers) if workers > 1 else None
+    try:
+        with ThreadPoolExecutor(network_workers) as downloads:
+            fetches = {downloads.submit(prefetch, [stock for _, stock in chunk], DEFAULT_MODULES): chunk
+                       for chunk in chunks}
+            computations = {}
+            for fetch in as_completed(fetches):
+                if fetch.exception() is not None:
+                    logger.warning(f"Bulk download failed: {fetch.exception()}")
+                for symbol, stock in fetches[fetch]:
+                    if pool is None:
+                        try:
+                            collect(get_indicators(stock, trend_engine))
+                        except Exception as e:
+                            errors[symbol] = e
+                    elif recorder is not None:
+                        # the workers record on their own, their records are merged here
+                        computation = pool.submit(instrumentation.recorded, get_indicators, stock, trend_engine)
+                        computations[computation] = symbol
+                    else:
+                        computations[pool.submit(get_indicators, stock, trend_engine)] = symbol
+            for computation in as_completed(computations):
+                try:
+                    result = computation.result()
+                    if recorder is not None:
+                        result, records = result
+                        recorder.extend(records)
+                    collect(result)
+                except Exception as e:
+                    errors[computations[computation]] = e
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if sink is not None:
+            sink.flush()
+
+    if sink is not None:
+        indicators = sink.read()
+    else:
+        indicators = pd.concat(results, ignore_index=True) if results else pd.DataFrame()
+    indicators.attrs['errors'] = errors
+    return indicators
+
 def score_efficiency_ATR(result):
     sectors = result['sector'].unique()
+    from sklearn.preprocessing import MinMaxScaler
     result['score_efficiency_ATR'] = np.nan
     try:
         for sector in sectors:
@@ -114,230 +251,89 @@ def score_efficiency_ATR(result):
         pass
     return result['score_efficiency_ATR']
 
+def score_series(rule, values, name : str = None):
+    """
+    Evaluate a rule of invest.score_engine on a series of values of a single indicator.
+
+    :return: the scores, aligned to the values
+    :rtype: pd.Series
+    """
+    values = pd.Series(values)
+    scores = rule(pd.to_numeric(values, errors='coerce').to_numpy(dtype=float))
+    return pd.Series(scores, index=values.index, name=name)
+
+def score_price_to_free_cashflow(value):
+    return score_series(PFCF, value, 'score_value_PFCF')
+
 def score_OCFR(value):
-    df = pd.DataFrame()
-    df['Operating Cash Flow Ratio'] = value
-    df.loc[df['Operating Cash Flow Ratio'] < 1, 'score_liquidity_OCFR'] = 2
-    df.loc[df['Operating Cash Flow Ratio'] < 0.8, 'score_liquidity_OCFR'] = 1    
-    df.loc[df['Operating Cash Flow Ratio'] < 0, 'score_liquidity_OCFR'] = 0
-    
-    df.loc[df['Operating Cash Flow Ratio'] > 1, 'score_liquidity_OCFR'] = 3
-    df.loc[df['Operating Cash Flow Ratio'] > 1.2, 'score_liquidity_OCFR'] = 4
-    df.loc[df['Operating Cash Flow Ratio'] > 2, 'score_liquidity_OCFR'] = 5
-    return df['score_liquidity_OCFR']
+    return score_series(OCFR, value, 'score_liquidity_OCFR')
 
 def score_DIVHIST(years_of_payments):
-    tmp = pd.DataFrame()
-    tmp['score_dividend_HISTORY'] = years_of_payments.apply(lambda x : min(x, 20))/4
-    return tmp['score_dividend_HISTORY']
+    return score_series(DIVIDEND_HISTORY, years_of_payments, 'score_dividend_HISTORY')
 
 def score_DIVCONSISTENCY(fraction_of_payments):
-    tmp = pd.DataFrame()
-    tmp['score_dividend_CONSISTENCY'] = 5*fraction_of_payments.apply(lambda x : min(x, 1))
-    return tmp['score_dividend_CONSISTENCY']
+    return score_series(DIVIDEND_CONSISTENCY, fraction_of_payments, 'score_dividend_CONSISTENCY')
 
 def score_quantile(value, nan_score=0):
-    tmp = pd.DataFrame()
-    tmp['value'] = value
-    soglia_5 = tmp['value'].quantile(0.85)
-    tmp['score'] = None
-    tmp.loc[tmp['value'].isna(), 'score'] = nan_score
-    tmp.loc[(tmp['value'] < 0), 'score'] = 0
-    tmp.loc[(tmp['value'] > soglia_5), 'score'] = 5
-    tmp.loc[((tmp['value'] >= 0) &
-             (tmp['value'] <= soglia_5)), 'score'] = 5*tmp['value']/soglia_5
-    return tmp['score']
+    return score_series(QuantileCap(nan=nan_score), value, 'score')
 
 def score_ROCE(roce):
-    tmp = pd.DataFrame()
-    tmp['ROCE'] = roce
-    soglia_5 = tmp['ROCE'].quantile(0.9)
-    tmp['score_ROCE'] = None
-    tmp.loc[(tmp['ROCE'].isna() |
-            (tmp['ROCE'] < 0)), 'score_ROCE'] = 0
-    tmp.loc[(tmp['ROCE'] > soglia_5), 'score_ROCE'] = 5
-    tmp.loc[((tmp['ROCE'] >= 0) &
-             (tmp['ROCE'] <= soglia_5)), 'score_ROCE'] = 5*tmp['ROCE']/soglia_5
-    return tmp['score_ROCE']
+    return score_series(ROCE, roce, 'score_ROCE')
 
 def score_OPENJOBS(roce):
-    tmp = pd.DataFrame()
-    tmp['OPENJOBS'] = roce
-    soglia_5 = tmp['OPENJOBS'].quantile(0.9)
-    tmp['score_OPENJOBS'] = None
-    tmp.loc[(tmp['OPENJOBS'].isna() |
-            (tmp['OPENJOBS'] < 0)), 'score_OPENJOBS'] = 0
-    tmp.loc[(tmp['OPENJOBS'] > soglia_5), 'score_OPENJOBS'] = 5
-    tmp.loc[((tmp['OPENJOBS'] >= 0) &
-             (tmp['OPENJOBS'] <= soglia_5)), 'score_OPENJOBS'] = 5*tmp['OPENJOBS']/soglia_5
-    return tmp['score_OPENJOBS']
+    return score_series(QuantileCap(0.9), roce, 'score_OPENJOBS')
 
 def score_FOLLOWERS(roce):
-    tmp = pd.DataFrame()
-    tmp['FOLLOWERS'] = roce
-    soglia_5 = tmp['FOLLOWERS'].quantile(0.9)
-    tmp['score_FOLLOWERS'] = None
-    tmp.loc[(tmp['FOLLOWERS'].isna() |
-            (tmp['FOLLOWERS'] < 0)), 'score_FOLLOWERS'] = 0
-    tmp.loc[(tmp['FOLLOWERS'] > soglia_5), 'score_FOLLOWERS'] = 5
-    tmp.loc[((tmp['FOLLOWERS'] >= 0) &
-             (tmp['FOLLOWERS'] <= soglia_5)), 'score_FOLLOWERS'] = 5*tmp['FOLLOWERS']/soglia_5
-    return tmp['score_FOLLOWERS']
+    return score_series(QuantileCap(0.9), roce, 'score_FOLLOWERS')
 
 def score_YELD(div_yeld):
-    tmp_df = pd.DataFrame()
-    tmp_df['Dividend yeld'] = div_yeld
-    tmp_df['score_YELD'] =  (5*tmp_df['Dividend yeld']/tmp_df['Dividend yeld'].quantile(0.9)).map(lambda x : min(5, x))
-    return tmp_df['score_YELD']
+    return score_series(YELD, div_yeld, 'score_YELD')
 
 def score_PAYOUT(payout):
-    tmp_df = pd.DataFrame()
-    tmp_df['payout'] = 1 - payout
-    tmp_df['score_PAYOUT'] = None
-    tmp_df.loc[(tmp_df['payout'] <= 0)  |
-               (tmp_df['payout'] >= 1), 'score_PAYOUT'] = 0
-    tmp_df.loc[(tmp_df['payout'] > 0) &
-               (tmp_df['payout'] < 1) , 'score_PAYOUT'] = 5*tmp_df['payout']
-    return tmp_df['score_PAYOUT']
-
-def years_of_dividend_payments(mystock):
-    tmp_div_df = pd.DataFrame()
-    mydate = mystock.quot_date
-    tmp_div_df['Year'] = list(range(mydate.year-20, mydate.year))
-    try:
-        dividends_df = mystock.annual_dividends.copy().merge(tmp_div_df)
-        return len(dividends_df)
-    except:
-        return 0
+    return score_series(PAYOUT, 1 - pd.Series(payout), 'score_PAYOUT')
 
 def score_PE(PE):
-    tmp_df = pd.DataFrame()
-    tmp_df['PE'] = PE
-    tmp_df['score_PE'] = 1
-    tmp_df.loc[tmp_df['PE'].isna(), 'score_PE'] = 0
-    tmp_df.loc[tmp_df['PE'] < 17.5, 'score_PE'] = 2
-    tmp_df.loc[tmp_df['PE'] < 15, 'score_PE'] = 3
-    tmp_df.loc[tmp_df['PE'] < 12, 'score_PE'] = 4
-    tmp_df.loc[tmp_df['PE'] < 10, 'score_PE'] = 5
-    return tmp_df['score_PE']
+    return score_series(PRICE_EARNINGS, PE, 'score_PE')
 
 def score_QR(qr):
-    tmp_df = pd.DataFrame()
-    tmp_df['QR'] = qr
-    tmp_df['score_QR'] = 0
-    tmp_df.loc[tmp_df['QR'].isna(), 'score_QR'] = np.nan
-    tmp_df.loc[(tmp_df['QR'] < 1.0) &
-               (tmp_df['QR'] > 0.0) , 'score_QR'] =  5*(tmp_df['QR'])
-    tmp_df.loc[tmp_df['QR'] >= 1.0, 'score_QR'] = 5.0
-    return tmp_df['score_QR']
+    return score_series(QUICK_RATIO, qr, 'score_QR')
 
 def score_CashRatio(qr):
-    tmp_df = pd.DataFrame()
-    tmp_df['CR'] = qr
-    tmp_df['score_CR'] = np.nan
-    tmp_df.loc[tmp_df['CR'] <= 0.5, 'score_CR'] = 0.0
-    tmp_df.loc[(tmp_df['CR'] <= 1.0) &
-               (tmp_df['CR'] > 0.5) , 'score_CR'] = 10*(tmp_df['CR'] - 0.5)
-    tmp_df.loc[tmp_df['CR'] > 1.0, 'score_CR'] = 5.0
-    return tmp_df['score_CR']
+    return score_series(CASH_RATIO, qr, 'score_CR')
 
 def score_CurrentRatio(qr):
-    tmp_df = pd.DataFrame()
-    tmp_df['CR'] = qr
-    tmp_df['score_CR'] = 0.0
-    tmp_df.loc[tmp_df['CR'].isna(), 'score_CR'] = np.nan
-    tmp_df.loc[(tmp_df['CR'] < 3.0) &
-               (tmp_df['CR'] > 1.0) , 'score_CR'] =  2.5*(tmp_df['CR']-1.0)
-    tmp_df.loc[tmp_df['CR'] >= 3.0, 'score_CR'] = 5.0
-    return tmp_df['score_CR']
+    return score_series(CURRENT_RATIO, qr, 'score_CR')
 
 def score_PB(PB):
-    tmp_df = pd.DataFrame()
-    tmp_df['PB'] = PB
-    tmp_df['score_PB'] = 0
-    tmp_df.loc[tmp_df['PB'].isna() | (tmp_df['PB'] < 0), 'score_PB'] = 0
-    tmp_df.loc[(tmp_df['PB'] > 3), 'score_PB'] = 1
-    tmp_df.loc[((tmp_df['PB'] < 3) & (tmp_df['PB'] > 2)), 'score_PB'] = 2
-    tmp_df.loc[(tmp_df['PB'] < 2) & (tmp_df['PB'] > 1), 'score_PB'] = 4
-    tmp_df.loc[(tmp_df['PB'] < 1)& (tmp_df['PB'] > 0), 'score_PB'] = 5
-    return tmp_df['score_PB']
+    return score_series(PRICE_BOOK, PB, 'score_PB')
 
 def score_TREND(trend):
-    tmp_df = pd.DataFrame()
-    tmp_df['TREND'] = trend
-    tmp_df['score_TREND'] = 0
-    tmp_df.loc[(tmp_df['TREND'] > 0), 'score_TREND'] = 5
-    return tmp_df['score_TREND']
+    return score_series(GROWTH, trend, 'score_TREND')
 
 def score_EPS(ROE):
-    tmp_df = pd.DataFrame()
-    tmp_df['EPS'] = ROE
-    tmp_df['score_EPS'] = None
-    best_decile = tmp_df.loc[tmp_df['EPS'] > 0]['EPS'].quantile(0.85)
-    tmp_df.loc[tmp_df['EPS'].isna() |
-              (tmp_df['EPS'] < 0), 'score_EPS'] = 0
-    tmp_df.loc[tmp_df['EPS'] > 0 &
-              (tmp_df['EPS'] < best_decile), 'score_EPS'] = 5*tmp_df['EPS']/best_decile
-    tmp_df.loc[((tmp_df['EPS'] >= best_decile)), 'score_EPS'] = 5
-    return tmp_df['score_EPS']
-
+    return score_series(EPS, ROE, 'score_EPS')
 
 def score_graham(price_over_graham):
-    tmp_df = pd.DataFrame()
-    tmp_df['graham'] = price_over_graham
-    tmp_df['score_GRAHAM'] = None
-    tmp_df.loc[tmp_df['graham'].isna(), 'score_GRAHAM'] = 0
-    tmp_df.loc[(tmp_df['graham'] > 2) , 'score_GRAHAM'] = 1
-    tmp_df.loc[((tmp_df['graham'] > 1.5) &
-                (tmp_df['graham'] < 2)) , 'score_GRAHAM'] = 2
-    tmp_df.loc[((tmp_df['graham'] > 1.1) &
-                (tmp_df['graham'] < 1.5)) , 'score_GRAHAM'] = 3
-    tmp_df.loc[((tmp_df['graham'] > 1) &
-                (tmp_df['graham'] < 1.1)) , 'score_GRAHAM'] = 4
-    tmp_df.loc[tmp_df['graham'] < 1, 'score_GRAHAM'] = 5
-    return tmp_df['score_GRAHAM']
+    return score_series(GRAHAM, price_over_graham, 'score_GRAHAM')
 
 def score_ROA(ROA):
-    tmp_df = pd.DataFrame()
-    tmp_df['ROA'] = ROA
-    tmp_df['score_ROA'] = None
-    tmp_df.loc[tmp_df['ROA'].isna() |
-              (tmp_df['ROA'] < 0), 'score_ROA'] = 0
-    tmp_df.loc[tmp_df['ROA'] > 0 &
-              (tmp_df['ROA'] < 0.1), 'score_ROA'] = 5*tmp_df['ROA']/0.1
-    tmp_df.loc[((tmp_df['ROA'] >= 0.1)), 'score_ROA'] = 5
-    return tmp_df['score_ROA']
-
+    return score_series(RETURN_ON_ASSETS, ROA, 'score_ROA')
 
 def score_ROE(ROE):
-    tmp_df = pd.DataFrame()
-    tmp_df['ROE'] = ROE
-    tmp_df['score_ROE'] = None
-    tmp_df.loc[tmp_df['ROE'].isna() |
-              (tmp_df['ROE'] < 0), 'score_ROE'] = 0
-    tmp_df.loc[tmp_df['ROE'] > 0 &
-              (tmp_df['ROE'] < 0.2), 'score_ROE'] = 5*tmp_df['ROE']/0.2
-    tmp_df.loc[((tmp_df['ROE'] >= 0.2)), 'score_ROE'] = 5
-    return tmp_df['score_ROE']
-
-
+    return score_series(RETURN_ON_EQUITY, ROE, 'score_ROE')
 
 def score_NCAPSOP(NCAPSOP):
-    tmp_df = pd.DataFrame()
-    tmp_df['NCAPSOP'] = NCAPSOP
-    tmp_df['score_NCAPSOP'] = None
-    tmp_df.loc[tmp_df['NCAPSOP'].isna(), 'score_NCAPSOP'] = 3
-    tmp_df.loc[tmp_df['NCAPSOP'] < -10, 'score_NCAPSOP'] = 1
-    tmp_df.loc[((tmp_df['NCAPSOP'] > -10) &
-                (tmp_df['NCAPSOP'] < -5)), 'score_NCAPSOP'] = 2
-    tmp_df.loc[((tmp_df['NCAPSOP'] > -5) &
-                (tmp_df['NCAPSOP'] < -1)), 'score_NCAPSOP'] = 3
-    tmp_df.loc[((tmp_df['NCAPSOP'] > -1) &
-                (tmp_df['NCAPSOP'] < 0)), 'score_NCAPSOP'] = 4
-    tmp_df.loc[((tmp_df['NCAPSOP'] > 0)), 'score_NCAPSOP'] = 5
-    return tmp_df['score_NCAPSOP']
-
+    return score_series(NET_CURRENT_ASSETS, NCAPSOP, 'score_NCAPSOP')
 
+def years_of_dividend_payments(mystock):
+    tmp_div_df = pd.DataFrame()
+    mydate = mystock.quot_date
+    tmp_div_df['Year'] = list(range(mydate.year-20, mydate.year))
+    try:
+        dividends_df = mystock.annual_dividends.copy().merge(tmp_div_df)
+        return len(dividends_df)
+    except:
+        return 0
 
 def score_DIVTREND(stock):
     try:
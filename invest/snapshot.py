@@ -0,0 +1,103 @@
+"""
+Compact, immutable record of the fundamentals of a stock: the inputs of
+invest.fundamental_analysis.panel_fundamental_indicators as plain floats, without the
+yahooquery responses and the pandas frames they come from.
+"""
+from datetime import datetime
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+
+class StockSnapshot(NamedTuple):
+    code: str
+    name: str
+    quot_date: datetime
+    reference_price: float
+    graham_price: float
+    dividend_yeld: float
+    payout_ratio: float
+    dividend_years: float
+    dividend_consistency: float
+    cash_and_equivalents: float
+    accounts_receivable: float
+    marketable_securities: float
+    current_liabilities: float
+    current_ratio: float
+    operating_cash_flow: float
+    revenue: float
+    inventory: float
+    accounts_payable: float
+    current_assets: float
+    market_cap: float
+    total_debt: float
+    total_assets: float
+    total_equity: float
+    operating_income: float
+    depreciation_and_amortization: float
+    interest_expense: float
+    free_cash_flow: float
+    net_current_assets: float
+    EPS: float
+    n_shares: float
+    PE: float
+    ROE: float
+    PB: float
+    PS: float
+    stockholder_equity: float
+    price_to_cash_flow: float
+    price_to_free_cash_flow: float
+    net_cash_per_share: float
+    ROCE: float
+    net_income_per_employee: float
+    revenue_per_employee: float
+    full_time_employees: float
+    ROA: float
+    net_income_derivative: float
+    revenue_derivative: float
+    operating_revenue_derivative: float
+    total_assets_derivative: float
+    free_cash_flow_derivative: float
+    tangible_book_value_derivative: float
+    volatility: float
+    buyback_score: float
+
+
+# StockSnapshot field -> FUNDAMENTAL_FIELDS key, where they differ
+FIELD_NAMES = {'net_income_derivative': 'NetIncome derivative',
+               'revenue_derivative': 'Revenue derivative',
+               'operating_revenue_derivative': 'OperatingRevenue derivative',
+               'total_assets_derivative': 'TotalAssets derivative',
+               'free_cash_flow_derivative': 'FreeCashFlow derivative',
+               'tangible_book_value_derivative': 'TangibleBookValue derivative',
+               'buyback_score': 'BUYBACK_SCORE'}
+
+TEXT_FIELDS = ['code', 'name', 'quot_date']
+
+
+def as_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def take_snapshot(stock):
+    """
+    Compute the fundamentals of a stock (see invest.fundamental_analysis.FUNDAMENTAL_FIELDS)
+    and freeze them in a StockSnapshot. Values that are not numbers become NaN.
+    """
+    from invest.fundamental_analysis import FUNDAMENTAL_FIELDS, stock_fundamentals
+    values = stock_fundamentals(stock, FUNDAMENTAL_FIELDS)
+    return StockSnapshot(**{field: values[FIELD_NAMES.get(field, field)] if field in TEXT_FIELDS
+                            else as_float(values[FIELD_NAMES.get(field, field)])
+                            for field in StockSnapshot._fields})
+
+
+def snapshots_panel(snapshots):
+    """
+    The wide fundamentals frame of many snapshots, the input of
+    invest.fundamental_analysis.panel_fundamental_indicators.
+    """
+    return pd.DataFrame(list(snapshots), columns=StockSnapshot._fields).rename(columns=FIELD_NAMES)
@@ -0,0 +1,413 @@
+"""
+Where the raw module responses of a Stock come from. A data source returns, for a symbol and a
+(module, frequency) pair, the same object as the yahooquery.Ticker attribute of that name:
+
+- YahooSource: the Yahoo Finance API, through yahooquery (the default);
+- RecordingSource: another source whose responses are saved in a compressed archive;
+- ReplaySource: the responses of an archive, served back without the network;
+- SyntheticSource: random responses, for universes of any size.
+
+    with RecordingSource('aapl.zip') as source:
+        get_indicators(Stock('AAPL', data_source=source))
+    get_indicators(Stock('AAPL', data_source=ReplaySource('aapl.zip')))
+"""
+import os
+import time
+import zlib
+import pickle
+import logging
+import zipfile
+import threading
+import warnings
+import weakref
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from invest import instrumentation
+from invest.history_store import ticker_fetcher
+
+logger = logging.getLogger()
+
+
+def entry_name(symbol : str, module : str, frequency : str = None):
+    """
+    The name of a response in an archive, laid out as invest.cache.DiskCache: module/SYMBOL.pkl
+    """
+    folder = module if frequency is None else f"{module}_{frequency}"
+    return f"{folder}/{symbol.upper()}.pkl"
+
+
+class DataSource:
+    """
+    The interface of the data sources: download is required, prefetch may fetch many stocks at once.
+    """
+    def download(self, stock, module : str, frequency : str = None):
+        """
+        Return the raw response of a module of a stock (an error message if it is not available).
+
+        :param stock: the invest.Stock requesting the module
+        :param module: the name of the yahooquery Ticker attribute (e.g. 'summary_detail', 'history')
+        :param frequency: 'a' or 'q' for the financial statements, None otherwise
+        """
+        raise NotImplementedError
+
+    def prefetch(self, by_code : dict, missing : dict, max_workers : int = 8):
+        """
+        Download the missing modules of many stocks and store them (Stock.store).
+
+        :param by_code: the stocks, by upper case yahoo code
+        :param missing: (module, frequency) -> the codes of the stocks missing it
+        """
+        for (module, frequency), codes in missing.items():
+            for code in codes:
+                with instrumentation.stage(f"download {module}", code):
+                    value = self.download(by_code[code], module, frequency)
+                by_code[code].store(module, frequency, value)
+
+
+class YahooSource(DataSource):
+    """
+    The Yahoo Finance API through yahooquery, throttled by the scheduler of each stock.
+    """
+    def download(self, stock, module : str, frequency : str = None):
+        from invest.stock import QUOTE_SUMMARY_MODULES
+        if module in QUOTE_SUMMARY_MODULES:
+            return getattr(stock.ticker, module)[stock.yahoo_code]
+        elif module == 'history':
+            if stock.history_store is not None:
+                return stock.history_store.update(stock.yahoo_code.upper(), ticker_fetcher(stock.ticker))
+            return stock.ticker.history(period="max")
+        else:
+            return getattr(stock.ticker, module)(frequency=frequency)
+
+    def prefetch(self, by_code : dict, missing : dict, max_workers : int = 8):
+        """
+        A single multi-symbol Ticker for all the stocks: all the quoteSummary modules are requested
+        with one call per symbol, the requests run in max_workers threads. Symbols for which
+        Yahoo returns an error are left untouched: their properties will retry the download on their own.
+        """
+        from yahooquery import Ticker
+        from invest.stock import QUOTE_SUMMARY_MODULES
+        from invest.scheduler import yahoo_session
+        session = yahoo_session(next(iter(by_code.values())).scheduler, asynchronous=True, max_workers=max_workers)
+        ticker = Ticker(sorted(set().union(*missing.values())), session=session)
+
+        summary = [module for module, _ in missing if module in QUOTE_SUMMARY_MODULES]
+        if summary:
+            ticker.symbols = sorted(set().union(*(missing[(module, None)] for module in summary)))
+            data = ticker.get_modules([QUOTE_SUMMARY_MODULES[module] for module in summary])
+            for code in ticker.symbols:
+                payload = data.get(code) if isinstance(data, dict) else None
+                if not isinstance(payload, dict):
+                    logger.warning(f"{code}: {payload}")
+                    continue
+                for module in summary:
+                    if QUOTE_SUMMARY_MODULES[module] in payload:
+                        by_code[code].store(module, None, payload[QUOTE_SUMMARY_MODULES[module]])
+
+        for (module, frequency), codes in missing.items():
+            if module in QUOTE_SUMMARY_MODULES:
+                continue
+            ticker.symbols = codes
+            history_store = by_code[codes[0]].history_store
+            if module == 'history' and history_store is not None:
+                for code, history in history_store.update_many(codes, ticker_fetcher(ticker)).items():
+                    by_code[code].store(module, frequency, history)
+                continue
+            elif module == 'history':
+                frame = ticker.history(period="max")
+            else:
+                frame = getattr(ticker, module)(frequency=frequency)
+            if not isinstance(frame, pd.DataFrame) or frame.empty:
+                logger.warning(f"{module}: {frame}")
+                continue
+            for code, part in frame.groupby(level='symbol', sort=False):
+                if code in by_code:
+                    by_code[code].store(module, frequency, part)
+
+
+@lru_cache(maxsize=None)
+def default_source():
+    """
+    The source of the stocks without a data_source: Yahoo Finance.
+    """
+    return YahooSource()
+
+
+class RecordingSource(DataSource):
+    """
+    Pass the downloads through to another source (Yahoo Finance by default) and save every
+    response, errors included, in a zip archive (one pickle per symbol and module, deflated).
+    The archive is complete once closed (close, or the end of a with block).
+
+    Only the downloads are recorded: use it without a cache, or with refresh=True. A copy sent
+    to another process (e.g. the workers of invest.scoring.screen) does not record: the
+    modules of DEFAULT_MODULES are downloaded by the parent process.
+    """
+    def __init__(self, path : str, source : DataSource = None):
+        self.path = path
+        self.source = source or default_source()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._archive = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        state['_archive'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            if self._archive is not None:
+                self._archive.close()
+                self._archive = None
+
+    def record(self, symbol : str, module : str, frequency : str, value):
+        if os.getpid() != self._pid:
+            logger.warning(f"{symbol} {module}: not recorded, downloaded by another process")
+            return
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            if self._archive is None:
+                self._archive = zipfile.ZipFile(self.path, 'a', compression=zipfile.ZIP_DEFLATED)
+                # the central directory is only written on close
+                weakref.finalize(self, self._archive.close)
+            with warnings.catch_warnings():
+                # recording a response again: the last one is replayed
+                warnings.filterwarnings('ignore', 'Duplicate name', UserWarning)
+                self._archive.writestr(entry_name(symbol, module, frequency), data)
+
+    def download(self, stock, module : str, frequency : str = None):
+        value = self.source.download(stock, module, frequency)
+        self.record(stock.yahoo_code, module, frequency, value)
+        return value
+
+    def prefetch(self, by_code : dict, missing : dict, max_workers : int = 8):
+        self.source.prefetch(by_code, missing, max_workers)
+        for key, codes in missing.items():
+            for code in codes:
+                if key in by_code[code]._raw:
+                    self.record(code, *key, by_code[code]._raw[key])
+
+
+class ReplaySource(DataSource):
+    """
+    Serve the responses of a RecordingSource archive. A module that was not recorded is an
+    error message, as an unavailable module of Yahoo Finance, or a KeyError with strict.
+
+    :param latency: seconds waited by each download, to simulate the network
+    """
+    def __init__(self, path : str, strict : bool = False, latency : float = 0.0):
+        self.path = path
+        self.strict = strict
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._archive = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        state['_archive'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def archive(self):
+        with self._lock:
+            if self._archive is None:
+                self._archive = zipfile.ZipFile(self.path)
+            return self._archive
+
+    def symbols(self):
+        """
+        The symbols with at least a recorded module.
+        """
+        return sorted({os.path.splitext(name.split('/')[-1])[0] for name in self.archive.namelist()})
+
+    def download(self, stock, module : str, frequency : str = None):
+        if self.latency:
+            time.sleep(self.latency)
+        try:
+            return pickle.loads(self.archive.read(entry_name(stock.yahoo_code, module, frequency)))
+        except KeyError:
+            if self.strict:
+                raise KeyError((stock.yahoo_code, module, frequency))
+            return f"{module} not recorded for {stock.yahoo_code}"
+
+
+@lru_cache(maxsize=None)
+def report_dates(end : pd.Timestamp, periods : int, freq : str):
+    # the same for every synthetic symbol: built once
+    return pd.date_range(end=end, periods=periods, freq=freq)
+
+
+SECTORS = ['Utilities', 'Energy', 'Financial Services', 'Industrials', 'Technology',
+           'Consumer Cyclical', 'Healthcare', 'Basic Materials']
+
+# Columns of the synthetic financial statements
+FLOWS = ['NetIncome', 'NetIncomeCommonStockholders', 'OperatingIncome', 'PretaxIncome', 'EBIT', 'TotalRevenue',
+         'OperatingRevenue', 'FreeCashFlow', 'OperatingCashFlow', 'DepreciationAndAmortization',
+         'InterestExpense', 'CapitalExpenditure']
+BALANCES = ['TotalAssets', 'TotalLiabilitiesNetMinorityInterest', 'ShareIssued', 'TangibleBookValue',
+            'CashAndCashEquivalents', 'AvailableForSaleSecurities', 'CurrentAssets', 'CurrentLiabilities',
+            'Inventory', 'LongTermDebt', 'AccountsReceivable', 'AccountsPayable',
+            'TotalEquityGrossMinorityInterest', 'GoodwillAndOtherIntangibleAssets']
+# share of each flow in the revenues, of each balance in the total assets
+FLOW_SHARES = {'NetIncome': 0.08, 'NetIncomeCommonStockholders': 0.08, 'OperatingIncome': 0.14,
+               'PretaxIncome': 0.11, 'EBIT': 0.13, 'TotalRevenue': 1.0, 'OperatingRevenue': 0.95,
+               'FreeCashFlow': 0.07, 'OperatingCashFlow': 0.15, 'DepreciationAndAmortization': 0.05,
+               'InterestExpense': 0.02, 'CapitalExpenditure': -0.08}
+BALANCE_SHARES = {'TotalAssets': 1.0, 'TotalLiabilitiesNetMinorityInterest': 0.6, 'TangibleBookValue': 0.3,
+                  'CashAndCashEquivalents': 0.08, 'AvailableForSaleSecurities': 0.02, 'CurrentAssets': 0.35,
+                  'CurrentLiabilities': 0.25, 'Inventory': 0.06, 'LongTermDebt': 0.3,
+                  'AccountsReceivable': 0.1, 'AccountsPayable': 0.08, 'TotalEquityGrossMinorityInterest': 0.4,
+                  'GoodwillAndOtherIntangibleAssets': 0.1}
+
+
+class SyntheticSource(DataSource):
+    """
+    Random but plausible responses (financial statements consistent with the price and the market
+    cap, ten years of daily prices with yearly dividends), without the network. The responses of
+    a symbol depend only on seed and on the symbol, so synthetic universes are reproducible:
+
+        universe = StockUniverse(SyntheticSource.symbols(1000), data_source=SyntheticSource())
+
+    :param days: the length of the price history (business days up to end)
+    :param missing: the probability of each quoteSummary field to be missing
+    :param latency: seconds waited by each download, to simulate the network
+    """
+    def __init__(self, seed : int = 0, days : int = 2520, end : str = '2024-12-31', years : int = 5,
+                 quarters : int = 8, missing : float = 0.1, latency : float = 0.0):
+        self.seed = seed
+        self.days = days
+        self.end = pd.Timestamp(end)
+        self.years = years
+        self.quarters = quarters
+        self.missing = missing
+        self.latency = latency
+
+    @staticmethod
+    def symbols(n : int, prefix : str = 'SYN'):
+        return [f"{prefix}{i:05d}" for i in range(n)]
+
+    def rng(self, symbol : str, *keys):
+        return np.random.default_rng([self.seed] + [zlib.crc32(str(key).encode()) for key in (symbol,) + keys])
+
+    def profile(self, symbol : str):
+        """
+        The size and the valuation of a symbol, shared by all its modules.
+        """
+        rng = self.rng(symbol)
+        revenue = float(np.exp(rng.normal(20, 1.5)))
+        return {'revenue': revenue,
+                'assets': revenue * rng.uniform(0.8, 3),
+                'shares': float(np.round(revenue / rng.uniform(5, 50), -3)),
+                'pe': rng.uniform(5, 40),
+                'growth': rng.normal(0.03, 0.05),
+                'sector': SECTORS[rng.integers(len(SECTORS))],
+                'employees': int(revenue / rng.uniform(1e5, 1e6)) + 1,
+                'dividend_year': rng.uniform(0, 1) < 0.7}
+
+    def download(self, stock, module : str, frequency : str = None):
+        if self.latency:
+            time.sleep(self.latency)
+        symbol = stock.yahoo_code.upper()
+        rng = self.rng(symbol, module, frequency)
+        profile = self.profile(symbol)
+        if module == 'history':
+            return self.history(symbol, profile, rng)
+        elif module in ('all_financial_data', 'balance_sheet', 'cash_flow', 'income_statement'):
+            return self.statement(symbol, module, frequency, profile, rng)
+        elif module == 'earnings':
+            return self.earnings(profile, rng)
+        fields = self.summary(symbol, module, profile, rng)
+        if fields is None:
+            return f"{module} not found for {symbol}"
+        return {key: value for key, value in fields.items() if rng.uniform() >= self.missing}
+
+    def close_price(self, profile : dict):
+        net_income = profile['revenue'] * FLOW_SHARES['NetIncome']
+        return net_income * profile['pe'] / profile['shares']
+
+    def summary(self, symbol : str, module : str, profile : dict, rng):
+        price = self.close_price(profile)
+        market_cap = price * profile['shares']
+        equity = profile['assets'] * BALANCE_SHARES['TotalEquityGrossMinorityInterest']
+        dividend = price * rng.uniform(0.01, 0.06) if profile['dividend_year'] else 0.0
+        if module == 'summary_detail':
+            return {'marketCap': market_cap, 'trailingPE': profile['pe'], 'dividendRate': dividend,
+                    'dividendYield': dividend / price, 'payoutRatio': dividend * profile['pe'] / price,
+                    'priceToSalesTrailing12Months': market_cap / profile['revenue'], 'currency': 'USD'}
+        elif module == 'financial_data':
+            return {'currentRatio': BALANCE_SHARES['CurrentAssets'] / BALANCE_SHARES['CurrentLiabilities'],
+                    'totalCash': profile['assets'] * BALANCE_SHARES['CashAndCashEquivalents'],
+                    'returnOnEquity': profile['revenue'] * FLOW_SHARES['NetIncome'] / equity,
+                    'returnOnAssets': profile['revenue'] * FLOW_SHARES['NetIncome'] / profile['assets'],
+                    'totalRevenue': profile['revenue'], 'financialCurrency': 'USD'}
+        elif module in ('asset_profile', 'summary_profile'):
+            return {'longBusinessSummary': f"{symbol.title()} S.p.A. makes things in {profile['sector']}.",
+                    'sector': profile['sector'], 'industry': profile['sector'],
+                    'fullTimeEmployees': profile['employees'], 'country': 'Italy'}
+        elif module == 'key_stats':
+            return {'priceToBook': market_cap / equity, 'bookValue': equity / profile['shares'],
+                    'sharesOutstanding': profile['shares']}
+        return None
+
+    def statement(self, symbol : str, module : str, frequency : str, profile : dict, rng):
+        n, months = (self.years, 12) if frequency == 'a' else (self.quarters, 3)
+        growth = (1 + profile['growth']) ** (np.arange(n) * months / 12 - (n - 1) * months / 12)
+        data = {'asOfDate': report_dates(self.end, n, 'YE' if frequency == 'a' else 'QE'),
+                'periodType': f"{months}M", 'currencyCode': 'USD'}
+        flows = profile['revenue'] * months / 12 * growth
+        balances = profile['assets'] * growth
+        columns = (list(FLOW_SHARES) if module in ('all_financial_data', 'income_statement', 'cash_flow') else []) + \
+                  (list(BALANCE_SHARES) + ['ShareIssued'] if module in ('all_financial_data', 'balance_sheet') else [])
+        for col in columns:
+            if col == 'ShareIssued':
+                data[col] = profile['shares'] + np.round(rng.normal(0, profile['shares'] / 100, n), -3)
+            elif col in FLOW_SHARES:
+                data[col] = flows * FLOW_SHARES[col] * rng.normal(1, 0.1, n)
+            else:
+                data[col] = balances * BALANCE_SHARES[col] * rng.normal(1, 0.05, n)
+        return pd.DataFrame(data, index=pd.Index([symbol] * n, name='symbol'))
+
+    def earnings(self, profile : dict, rng):
+        years = range(self.end.year - self.years + 1, self.end.year + 1)
+        revenue = profile['revenue']
+        return {'financialsChart': {'yearly': [{'date': year,
+                                                'revenue': revenue * rng.normal(1, 0.1),
+                                                'earnings': revenue * FLOW_SHARES['NetIncome'] * rng.normal(1, 0.2)}
+                                               for year in years]},
+                'financialCurrency': 'USD'}
+
+    def history(self, symbol : str, profile : dict, rng):
+        dates = report_dates(self.end, self.days, 'B')
+        returns = rng.normal(profile['growth'] / 252, rng.uniform(0.01, 0.03), self.days)
+        close = self.close_price(profile) * np.exp(np.cumsum(returns) - returns.sum())
+        spread = np.abs(rng.normal(0, 0.005, self.days))
+        dividends = np.zeros(self.days)
+        if profile['dividend_year']:
+            # one dividend a year, on the first business day after the 20th of May
+            paid = (dates.month == 5) & (dates.day > 20)
+            dividends[np.flatnonzero(paid & ~np.roll(paid, 1))] = close.mean() * rng.uniform(0.01, 0.06)
+        return pd.DataFrame({'open': close * (1 + rng.normal(0, 0.003, self.days)),
+                             'high': close * (1 + spread), 'low': close * (1 - spread), 'close': close,
+                             'volume': rng.integers(1e4, 1e6, self.days).astype(float), 'adjclose': close,
+                             'dividends': dividends},
+                            index=pd.MultiIndex.from_product([[symbol], dates], names=['symbol', 'date']))
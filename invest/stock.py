@@ -4,9 +4,11 @@ import pandas as pd
 from datetime import datetime
 import logging
 
-from yahooquery import Ticker
+from invest import instrumentation
 from invest.ratios import liquidity
-import os
+from invest.cache import is_error
+from invest.derived import derived, dependents, memo_frame
+from invest.data_loader.symbol_master import load_symbol_master
 
 logger = logging.getLogger()
 
@@ -19,37 +21,287 @@ INTEREST_EXPENSE = 'InterestExpense'
 TOT_EQUITY = "TotalStockholderEquity"
 INTANGIBLE_ASSETS = "IntangibleAssets"
 
+# quoteSummary modules exposed by yahooquery as Ticker properties, mapped to
+# the module name used by the quoteSummary endpoint
+QUOTE_SUMMARY_MODULES = {'summary_detail': 'summaryDetail',
+                         'financial_data': 'financialData',
+                         'asset_profile': 'assetProfile',
+                         'key_stats': 'defaultKeyStatistics',
+                         'summary_profile': 'summaryProfile',
+                         'earnings': 'earnings'}
+
+def latest_values(timeline : pd.DataFrame):
+    """
+    Index the last non-null value of each column of a date-sorted frame.
+
+    :param timeline: a frame sorted by its date index
+    :type timeline: pd.DataFrame
+    :return: a dict column -> (last non-null value, its date)
+    """
+    mask = timeline.notna().to_numpy()
+    last_row = len(timeline) - 1 - np.argmax(mask[::-1], axis=0)
+    values = timeline.to_numpy()
+    return {col: (values[row, i], timeline.index[row])
+            for i, (col, row) in enumerate(zip(timeline.columns, last_row)) if mask[:, i].any()}
+
+
+def trailing_sums(financials : pd.DataFrame, columns):
+    """
+    Trailing twelve months of the given columns of periodic (e.g. quarterly) reports: each
+    value is the sum of the last 12/period non-null values of its column up to its row, NaN
+    when fewer values are available or when its own value is null.
+
+    :param financials: reports indexed by asOfDate, with a periodType column such as '3M'
+    :return: a frame indexed by asOfDate, sorted
+    """
+    periods = financials['periodType'].str.extract(r'^(\d+)M$')[0].dropna().astype(int)
+    columns = [col for col in dict.fromkeys(columns) if col in financials.columns]
+    if periods.empty or not columns:
+        return pd.DataFrame(columns=columns, index=financials.index[:0])
+    period = periods.mode().iloc[0]
+    window = max(12 // period, 1)
+    reports = financials.loc[financials['periodType'] == f"{period}M", columns].sort_index(kind='stable')
+    values = reports.reset_index(drop=True).apply(pd.to_numeric, errors='coerce').stack().dropna()
+    by_column = values.groupby(level=1)
+    totals = by_column.cumsum()
+    sums = totals - totals.groupby(level=1).shift(window).fillna(0)
+    sums = sums.where(by_column.cumcount() >= window - 1).unstack()
+    sums = sums.reindex(index=range(len(reports)), columns=columns)
+    sums.index = reports.index
+    return sums
+
+
 class Stock:
-    def __init__(self, isin : str):
-        self.isin = isin
-
-        self.scheda = pd.read_csv(os.path.join('symbols', 'isin_transcode', f'{isin}.csv'))
-        self.yahoo_code = f"{self.scheda['Codice Alfanumerico'].item()}.MI"
-
-        self._name = None
-        self.ticker = Ticker(self.yahoo_code.upper())
-        self._sector = None
-        self._reference_price = None
-        self._hist = None
-        self._info = None
-        self._financials = None
-        self._yearly_financials = None
-        self._quarterly_financials = None
-        self._balance_sheet = None
-        self._cashflow = None
-        self._revenue_and_earning = None
-        self._quarterly_balance_sheet = None
-        self._n_shares = None
-        self._quarterly_cashflow = None
-        self._net_income = None
+    # no per-instance __dict__: the lazily computed values live in _memo (see invest.derived)
+    __slots__ = ('isin', 'yahoo_code', 'exchange', 'cache', 'history_store', 'scheduler', 'data_source',
+                 'quot_date', '_refresh', '_ticker', '_raw', '_memo', '_memo_stats')
+
+    def __init__(self, isin : str, cache=None, refresh=False, history_store=None, scheduler=None,
+                 data_source=None, exchange=None):
+        """
+        :param isin: the isin code of the stock (or its yahoo code, or its ticker).
+                     Identifiers missing from the symbol master are used as yahoo codes.
+        :type isin: str
+        :param cache: where the yahooquery responses are persisted (e.g. invest.cache.DiskCache)
+        :param refresh: True to ignore the cached responses, or the list of modules to be downloaded again
+        :type refresh: bool or list
+        :param history_store: where the price history is kept and updated incrementally
+                              (e.g. invest.history_store.HistoryStore)
+        :param scheduler: the invest.scheduler.RequestScheduler throttling the downloads
+                          (default: the one shared by the whole process)
+        :param data_source: where the modules are downloaded from, an invest.sources.DataSource
+                            (default: Yahoo Finance)
+        :param exchange: the exchange of the stock (e.g. 'Borsa Italiana'), needed for the
+                         tickers listed on several exchanges
+        :type exchange: str
+        """
+        record = load_symbol_master().resolve(isin, exchange)
+        self.isin = (record['isin'] or isin) if record else isin
+        self.yahoo_code = record['yahoo_code'] if record else isin
+        self.exchange = record['exchange'] if record else exchange
+        self.cache = cache
+        self.history_store = history_store
+        self.scheduler = scheduler
+        self.data_source = data_source
+        self._refresh = refresh
+
+        self._ticker = None
+        self._raw = {}
+        # values of the derived properties and their (computed, hits) counters, see invest.derived
+        self._memo = {}
+        self._memo_stats = {}
         self.quot_date =  datetime.now()
-        self._last_financial_data = None
-        self._total_assets = None
-        self._total_liabilities = None
-        self._intangible_assets = None
-        
-        self._pretax_income = None
-        self._EBIT = None
+
+    def __getstate__(self):
+        # the yahooquery session cannot be sent to other processes, it is rebuilt on demand
+        state = {slot: getattr(self, slot) for slot in self.__slots__}
+        state['_ticker'] = None
+        return state
+
+    def __setstate__(self, state):
+        for slot, value in state.items():
+            setattr(self, slot, value)
+
+    @property
+    def code(self):
+        return self.yahoo_code
+
+    @classmethod
+    def batch(cls, isins, chunk_size : int = 50, cache=None, refresh=False, history_store=None, scheduler=None,
+              data_source=None):
+        """
+        Build the stocks of a list of isins, downloading their data in bulk.
+        See invest.universe.StockUniverse.
+        """
+        from invest.universe import StockUniverse
+        return StockUniverse(isins, chunk_size=chunk_size, cache=cache, refresh=refresh,
+                             history_store=history_store, scheduler=scheduler, data_source=data_source).prefetch()
+
+    @property
+    def ticker(self):
+        if self._ticker is None:
+            from yahooquery import Ticker
+            from invest.scheduler import yahoo_session
+            self._ticker = Ticker(self.yahoo_code.upper(), session=yahoo_session(self.scheduler))
+        return self._ticker
+
+    def load(self, module : str, frequency : str = None):
+        """
+        Return the raw yahooquery response of a module, downloading it only once.
+        Responses are read from the cache when available and can be injected in
+        advance (see invest.universe.StockUniverse).
+
+        :param module: the name of the yahooquery Ticker attribute (e.g. 'summary_detail', 'history')
+        :type module: str
+        :param frequency: 'a' or 'q' for the financial statements, None otherwise
+        :type frequency: str
+        """
+        key = (module, frequency)
+        if key not in self._raw and not self.load_cached(module, frequency):
+            with instrumentation.stage(f"download {module}", self.code):
+                value = self._download(module, frequency)
+            self.store(module, frequency, value)
+        return self._raw[key]
+
+    async def aload(self, modules=None, client=None):
+        """
+        Download the given modules without blocking the event loop, filling the same caches
+        read by the properties. The modules already loaded or in the cache are skipped.
+        Only Yahoo Finance is downloaded asynchronously, the other data sources run in a thread.
+
+        :param modules: (module, frequency) pairs (default: invest.universe.DEFAULT_MODULES)
+        :param client: an open invest.async_client.AsyncYahooClient, to share its connections
+                       with other stocks (a new one is opened otherwise)
+        """
+        from invest.sources import YahooSource
+        if modules is None:
+            from invest.universe import DEFAULT_MODULES as modules
+        missing = [key for key in modules if (key not in self._raw) and not self.load_cached(*key)]
+        if not missing:
+            return self
+        if not isinstance(self.source, YahooSource):
+            # the other sources are synchronous: they run in a worker thread
+            import asyncio
+            for module, frequency in missing:
+                self.store(module, frequency, await asyncio.to_thread(self._download, module, frequency))
+            return self
+        from invest.async_client import AsyncYahooClient
+        if client is None:
+            async with AsyncYahooClient(scheduler=self.scheduler) as client:
+                return await client.fetch(self, missing)
+        return await client.fetch(self, missing)
+
+    def uses_cache(self, module : str):
+        # the history store already persists the price history
+        return (self.cache is not None) and not (module == 'history' and self.history_store is not None)
+
+    def must_refresh(self, module : str):
+        return (self._refresh is True) or (bool(self._refresh) and module in self._refresh)
+
+    def load_cached(self, module : str, frequency : str = None):
+        """
+        Fill a module from the cache, if it holds a valid response. Return True on success.
+        """
+        if not self.uses_cache(module) or self.must_refresh(module):
+            return False
+        try:
+            self._raw[(module, frequency)] = self.cache.get(self.yahoo_code, module, frequency)
+        except KeyError:
+            instrumentation.count('cache miss', symbol=self.code)
+            return False
+        instrumentation.count('cache hit', symbol=self.code)
+        return True
+
+    def store(self, module : str, frequency : str, value):
+        """
+        Set the raw response of a module, persisting it in the cache (errors are not cached).
+        Replacing a response drops the derived values depending on its module.
+        """
+        if (module, frequency) in self._raw:
+            self.invalidate(module)
+        self._raw[(module, frequency)] = value
+        if self.uses_cache(module) and not is_error(value):
+            self.cache.set(self.yahoo_code, module, frequency, value)
+
+    def invalidate(self, *modules : str):
+        """
+        Drop the memoized values depending on the given raw modules (or derived properties).
+        """
+        for module in modules:
+            for name in dependents(type(self), module):
+                self._memo.pop(name, None)
+
+    def refresh(self, *modules : str):
+        """
+        Download the given raw modules again (all the loaded ones if none is given), bypassing
+        the cache, on their next access. Only the derived values depending on them are dropped.
+        """
+        modules = modules or tuple({module for module, _ in self._raw})
+        if self._refresh is not True:
+            self._refresh = sorted(set(self._refresh or []) | set(modules))
+        for key in [key for key in self._raw if key[0] in modules]:
+            del self._raw[key]
+        self.invalidate(*modules)
+        return self
+
+    def snapshot(self, release : bool = False):
+        """
+        Return the fundamentals of the stock as a frozen invest.snapshot.StockSnapshot.
+
+        :param release: True to drop the raw responses and the derived values afterwards
+                        (see release), keeping only the snapshot in memory
+        """
+        from invest.snapshot import take_snapshot
+        snapshot = take_snapshot(self)
+        if release:
+            self.release()
+        return snapshot
+
+    def release(self):
+        """
+        Free the memory held by the stock: the raw responses, the derived values (with their
+        counters) and the yahooquery session. They are downloaded (or read from the cache)
+        again if needed.
+        """
+        self._raw = {}
+        self._memo = {}
+        self._memo_stats = {}
+        self._ticker = None
+        return self
+
+    def memo_stats(self):
+        """
+        Return how many times each derived property has been computed and served from the memo.
+        """
+        return memo_frame(self._memo_stats)
+
+    @property
+    def source(self):
+        from invest.sources import default_source
+        return self.data_source if self.data_source is not None else default_source()
+
+    def _download(self, module, frequency=None):
+        return self.source.download(self, module, frequency)
+
+    @property
+    def summary_detail(self):
+        return self.load('summary_detail')
+
+    @property
+    def financial_data(self):
+        return self.load('financial_data')
+
+    @property
+    def asset_profile(self):
+        return self.load('asset_profile')
+
+    @property
+    def key_stats(self):
+        return self.load('key_stats')
+
+    @property
+    def summary_profile(self):
+        return self.load('summary_profile')
 
     def name_option(self, key):
         if key in self.business_summary:
@@ -60,20 +312,16 @@ class Stock:
 
     @property
     def business_summary(self):
-        return self.ticker.summary_profile[self.yahoo_code]['longBusinessSummary']
+        return self.summary_profile['longBusinessSummary']
 
 
-    @property
+    @derived('summary_profile')
     def name(self):
-        if self._name is None:
-            self._name = self.get_name()
-        return self._name
+        return self.get_name()
 
-    @property
+    @derived('financial_data')
     def last_financial_data(self):
-        if self._last_financial_data is None:
-            self._last_financial_data = self.ticker.financial_data[self.yahoo_code]
-        return self._last_financial_data
+        return self.financial_data
     
     @staticmethod
     def company_suffixes():
@@ -103,93 +351,149 @@ class Stock:
         except:
             return self.yahoo_code
 
-    @property
+    @derived('summary_detail', 'financial_data', 'asset_profile')
     def info(self):
-        if self._info is None:
-            self._info = (self.ticker.summary_detail[self.yahoo_code] |
-                          self.ticker.financial_data[self.yahoo_code] |
-                          self.ticker.asset_profile[self.yahoo_code])
-        return self._info
+        return (self.summary_detail |
+                self.financial_data |
+                self.asset_profile)
 
-    @property
+    @derived('info')
     def sector(self):
-        if self._sector is None:
-            self._sector = self.get_info('sector')
-        return self._sector
+        return self.get_info('sector')
         
-    @property
+    @derived('all_financial_data')
     def yearly_financials(self):
-        if self._yearly_financials is None:
-            self._yearly_financials = self.ticker.all_financial_data(frequency='a').set_index('asOfDate')
-        return self._yearly_financials
+        return self.load('all_financial_data', 'a').set_index('asOfDate')
 
-    @property
+    @derived('all_financial_data')
     def quarterly_financials(self):
-        if self._quarterly_financials is None:
-            self._quarterly_financials = self.ticker.all_financial_data(frequency='q').set_index('asOfDate')
-        return self._quarterly_financials
+        return self.load('all_financial_data', 'q').set_index('asOfDate')
 
-    @property
+    @derived('balance_sheet')
     def yearly_balance_sheet(self):
-        if self._balance_sheet is None:
-            self._balance_sheet = self.ticker.balance_sheet(frequency='a').set_index('asOfDate')
-        return self._balance_sheet
+        return self.load('balance_sheet', 'a').set_index('asOfDate')
 
-    @property
+    @derived('balance_sheet')
     def quarterly_balance_sheet(self):
-        if self._quarterly_balance_sheet is None:
-            self._quarterly_balance_sheet = self.ticker.balance_sheet(frequency='q').set_index('asOfDate')
-        return self._quarterly_balance_sheet
+        return self.load('balance_sheet', 'q').set_index('asOfDate')
 
-    @property
+    @derived('cash_flow')
     def yearly_cashflow(self):
-        if self._cashflow is None:
-            self._cashflow = self.ticker.cash_flow(frequency="a").set_index('asOfDate')
-        return self._cashflow
+        return self.load('cash_flow', 'a').set_index('asOfDate')
 
-    @property
+    @derived('cash_flow')
     def quarterly_cashflow(self):
-        if self._quarterly_cashflow is None:
-            self._quarterly_cashflow = self.ticker.cash_flow(frequency="q").set_index('asOfDate')
-        return self._quarterly_cashflow
+        return self.load('cash_flow', 'q').set_index('asOfDate')
+
+    @derived('quarterly_financials')
+    def ttm_financials(self):
+        """
+        Trailing twelve months sums of all the flow columns (income statement and cash flow)
+        of the quarterly financials, see trailing_sums.
+        """
+        from yahooquery.constants import FUNDAMENTALS_OPTIONS
+        flows = FUNDAMENTALS_OPTIONS['income_statement'] + FUNDAMENTALS_OPTIONS['cash_flow']
+        try:
+            return trailing_sums(self.quarterly_financials, flows)
+        except Exception as e:
+            logger.warning(f"{self.code}: quarterly financials not available ({e}), using yearly")
+            return pd.DataFrame()
 
-    @property
+    def latest_flow(self, label : str):
+        """
+        Return the last value of a flow column over a year: the yearly report or the trailing
+        twelve months of quarterly reports, whichever is more recent (the yearly one on the same date).
+        Raise KeyError if the column is missing or always null.
+        """
+        candidates = []
+        for frame in [self.yearly_financials, self.ttm_financials]:
+            if label in frame.columns:
+                values = frame[label].dropna()
+                if len(values):
+                    candidates.append((values.index.max(), values.loc[values.index.max()]))
+        if not candidates:
+            raise KeyError(label)
+        value = max(candidates, key=lambda candidate: candidate[0])[1]
+        return value.iloc[-1] if isinstance(value, pd.Series) else value
+
+    @derived('yearly_financials', 'quarterly_financials')
+    def financials_timeline(self):
+        """
+        Yearly and quarterly financials merged and sorted by date (on the same date, quarterly rows come last).
+        """
+        return pd.concat([self.yearly_financials, self.quarterly_financials]).sort_index(kind='stable')
+
+    @derived('yearly_balance_sheet', 'quarterly_balance_sheet')
+    def balance_sheet_timeline(self):
+        """
+        Yearly and quarterly balance sheets merged and sorted by date (on the same date, quarterly rows come last).
+        """
+        return pd.concat([self.yearly_balance_sheet, self.quarterly_balance_sheet]).sort_index(kind='stable')
+
+    @derived('financials_timeline')
+    def latest_financials(self):
+        return latest_values(self.financials_timeline)
+
+    @derived('balance_sheet_timeline')
+    def latest_balance_sheet(self):
+        return latest_values(self.balance_sheet_timeline)
+
+    def latest(self, label : str, source : str = 'financials'):
+        """
+        Return the last reported value of a column, as a (value, asOfDate) pair.
+        Raise KeyError if the column is missing or always null.
+
+        :param label: the yahooquery column name (e.g. 'TotalAssets')
+        :type label: str
+        :param source: 'financials' (all_financial_data) or 'balance_sheet'
+        :type source: str
+        """
+        if source == 'balance_sheet':
+            return self.latest_balance_sheet[label]
+        return self.latest_financials[label]
+
+    def latest_value(self, label : str, source : str = 'financials'):
+        return self.latest(label, source)[0]
+
+    def ratio_history(self, ratios=None):
+        """
+        Evaluate the invest.ratios functions on every annual and quarterly period reported.
+        See invest.ratio_history.ratio_history.
+        """
+        from invest.ratio_history import ratio_history
+        return ratio_history([self], ratios)
+
+    @derived('earnings')
     def revenue_and_earning(self):
-        if self._revenue_and_earning is None:
-            self._revenue_and_earning = self.ticker.earnings
-        return self._revenue_and_earning
+        return self.load('earnings')
 
-    @property
+    @derived('yearly_balance_sheet', 'quarterly_balance_sheet', 'market_cap', 'reference_price')
     def n_shares(self):
-        if self._n_shares is None:
-            try:
-                self._n_shares = (pd.concat([self.yearly_balance_sheet,
-                                            self.quarterly_balance_sheet])
-                                    .reset_index().sort_values(by='asOfDate').dropna()
-                                    .tail(1)['ShareIssued'].item())
-            except:
-                self._n_shares = int(self.market_cap/self.reference_price)
-        return self._n_shares
+        try:
+            return (pd.concat([self.yearly_balance_sheet,
+                               self.quarterly_balance_sheet])
+                      .reset_index().sort_values(by='asOfDate').dropna()
+                      .tail(1)['ShareIssued'].item())
+        except:
+            return int(self.market_cap/self.reference_price)
 
-    @property
+    @derived('history')
     def hist(self):
-        if self._hist is None:
-            self._hist = self.ticker.history(period="max").reset_index().drop(columns='symbol')
-            self._hist.columns = [col.capitalize() for col in self._hist.columns]
-            try:
-                self._hist['Date'] = self._hist['Date'].dt.tz_localize(None)
-            except: pass
-            self._hist = self._hist.set_index('Date')
-        return self._hist
+        hist = self.load('history').reset_index().drop(columns='symbol')
+        hist.columns = [col.capitalize() for col in hist.columns]
+        try:
+            hist['Date'] = hist['Date'].dt.tz_localize(None)
+        except: pass
+        return hist.set_index('Date')
 
-    @property
+    @derived('hist')
     def dividends(self):
         try:
             return self.hist["Dividends"].replace({0: None}).dropna()
         except:
             return pd.DataFrame()
 
-    @property
+    @derived('dividends')
     def annual_dividends(self):
         try:
             dividends = self.dividends.reset_index()
@@ -207,36 +511,34 @@ class Stock:
         except:
             return None
 
-    @property
+    @derived('hist')
     def reference_price(self):
-        if self._reference_price is None:
-           self._reference_price = self.hist.tail(1)['Close'].item()
-        return self._reference_price
+        return self.hist.tail(1)['Close'].item()
 
-    @property
+    @derived('market_cap', 'PS')
     def sales(self):
         return self.market_cap/self.PS
 
-    @property
+    @derived('info')
     def PS(self):
         return self.get_info('priceToSalesTrailing12Months') or np.nan
 
-    @property
+    @derived('key_stats', 'reference_price', 'book_value')
     def PB(self):
         try:
-            return self.ticker.key_stats[self.yahoo_code]['priceToBook']
+            return self.key_stats['priceToBook']
         except Exception as e:
             print(e, e.__doc__)
             return self.reference_price/ self.book_value
 
-    @property
+    @derived('info', 'reference_price', 'n_shares')
     def market_cap(self):
         if (self.get_info("marketCap") is not None):
             return float(self.get_info("marketCap"))
         else:
             return self.reference_price * self.n_shares
 
-    @property
+    @derived('total_assets', 'total_liabilities', 'intangible_assets', 'market_cap')
     def price_to_tangible_book(self):
         return (self.total_assets - self.total_liabilities - self.intangible_assets)/self.market_cap
 
@@ -245,56 +547,41 @@ class Stock:
         return self.price_to_tangible_book
 
 
-    @property
+    @derived('latest_balance_sheet')
     def intangible_assets(self):
-        if self._intangible_assets is None:
-            try:
-                self._intangible_assets = (pd.concat([self.yearly_balance_sheet['IntangibleAssets'],
-                                                      self.quarterly_balance_sheet['IntangibleAssets']])
-                                             .reset_index().sort_values(by='asOfDate').dropna()
-                                             .set_index('asOfDate').tail(1)['IntangibleAssets'].item())
-            except:
-                self._intangible_assets = 0
-        return self._intangible_assets
+        try:
+            return self.latest_value(INTANGIBLE_ASSETS, 'balance_sheet')
+        except:
+            return 0
 
-    @property
+    @derived('total_assets', 'total_liabilities')
     def stockholder_equity(self):
         return self.total_assets - self.total_liabilities
 
-    @property
+    @derived('latest_balance_sheet')
     def total_assets(self):
-        if self._total_assets is None:
-            self._total_assets = (pd.concat([self.yearly_balance_sheet['TotalAssets'],
-                                             self.quarterly_balance_sheet['TotalAssets']])
-                                    .reset_index().sort_values(by='asOfDate').dropna()
-                                    .set_index('asOfDate').tail(1)['TotalAssets'].item())
-        return self._total_assets
+        return self.latest_value('TotalAssets', 'balance_sheet')
 
-    @property
+    @derived('latest_balance_sheet')
     def total_liabilities(self):
-        if self._total_liabilities is None:
-            self._total_liabilities = (pd.concat([self.yearly_balance_sheet['TotalLiabilitiesNetMinorityInterest'],
-                                                  self.quarterly_balance_sheet['TotalLiabilitiesNetMinorityInterest']])
-                                         .reset_index().sort_values(by='asOfDate').dropna()
-                                         .set_index('asOfDate').tail(1)['TotalLiabilitiesNetMinorityInterest'].item())
-        return self._total_liabilities
+        return self.latest_value(TOTAL_LIAB, 'balance_sheet')
     
     @property
     def earning_per_share(self):
         return self.net_income/self.market_cap
 
-    @property
+    @derived('info', 'market_cap', 'net_income')
     def PE(self):
         if (self.get_info("trailingPE") is not None) and not isinstance(self.get_info("trailingPE"), dict):
             return float(self.get_info("trailingPE"))
         else:
             return self.market_cap/self.net_income
 
-    @property
+    @derived('revenue', 'n_shares')
     def revenue_per_share(self):
         return self.revenue/self.n_shares
 
-    @property
+    @derived('last_financial_data', 'current_assets', 'current_liabilities')
     def current_ratio(self):
         try:
             return self.last_financial_data['currentRatio']
@@ -306,20 +593,16 @@ class Stock:
         if (self.get_info("netIncomeToCommon") is not None) and not isinstance(self.get_info("netIncomeToCommon"), dict):
             return self.get_info("netIncomeToCommon")
         elif 'NetIncome' in self.yearly_financials:
-            return (pd.concat([self.annualize_financials(self.quarterly_financials, 'NetIncome'),
-                                  self.yearly_financials['NetIncome'].reset_index()])
-                             .sort_values(by='asOfDate').dropna().tail(1)['NetIncome'].item())
+            return self.latest_flow('NetIncome')
         else:
             try:
                 return self.net_income_from_pe()
             except:
                 return self.net_income_from_roe()
 
-    @property
+    @derived('info', 'yearly_financials', 'ttm_financials', 'market_cap')
     def net_income(self):
-        if self._net_income is None:
-            self._net_income = self._set_net_income()
-        return self._net_income
+        return self._set_net_income()
 
 
     def net_income_from_pe(self):
@@ -328,7 +611,7 @@ class Stock:
     def net_income_from_roe(self):
         return float(self.get_info("returnOnEquity"))*self.market_cap
 
-    @property
+    @derived('book_value', 'earning_per_share')
     def graham_price(self):
         squared_graham = 22.5 * self.book_value * self.earning_per_share
         if squared_graham > 0:
@@ -336,21 +619,21 @@ class Stock:
         else:
             return np.nan
 
-    @property
+    @derived('info', 'net_income', 'total_assets')
     def ROA(self):
         if   (self.get_info("returnOnAssets") is not None):
             return float(self.get_info("returnOnAssets"))
         else:
             return self.net_income/self.total_assets
 
-    @property
+    @derived('info', 'key_stats', 'stockholder_equity', 'n_shares')
     def book_value(self):    
         try:
             return float(self.get_info("bookValue"))
         except Exception as e:
             print(f"{e}: {e.__doc__}")
             try:
-                return self.ticker.key_stats[self.yahoo_code]['bookValue']
+                return self.key_stats['bookValue']
             except:
                 return self.stockholder_equity/self.n_shares
     
@@ -362,14 +645,14 @@ class Stock:
     def price_to_book(self):
         return self.PB
 
-    @property
+    @derived('info')
     def full_time_employees(self):
         if self.get_info('fullTimeEmployees') is not None:
             return float(self.get_info('fullTimeEmployees'))
         else:
             return np.nan
 
-    @property
+    @derived('info', 'net_income', 'stockholder_equity')
     def return_on_equity(self):
         try:
            return float(self.get_info("returnOnEquity"))
@@ -389,92 +672,72 @@ class Stock:
     def inventory_end(self):
         return self.inventory
 
-    @property
+    @derived('latest_financials')
     def accounts_receivable(self):
         try:
-            return (pd.concat([self.quarterly_financials['AccountsReceivable'],
-                               self.yearly_financials['AccountsReceivable']]).reset_index()
-                      .sort_values(by='asOfDate').dropna().tail(1)['AccountsReceivable'].item())
+            return self.latest_value('AccountsReceivable')
         except Exception as e:
             print(f"{e}: {e.__doc__}")
             return 0
 
-    @property
+    @derived('latest_financials')
     def accounts_payable(self):
         try:
-            return (pd.concat([self.quarterly_financials['AccountsPayable'],
-                               self.yearly_financials['AccountsPayable']]).reset_index()
-                      .sort_values(by='asOfDate').dropna().tail(1)['AccountsPayable'].item())
+            return self.latest_value('AccountsPayable')
         except Exception as e:
             print(f"{e}: {e.__doc__}")
             return 0
 
-    @property
+    @derived('latest_financials')
     def total_equity(self):
         try:
-            return (pd.concat([self.quarterly_financials['TotalEquityGrossMinorityInterest'],
-                               self.yearly_financials['TotalEquityGrossMinorityInterest']]).reset_index()
-                     .sort_values(by='asOfDate').dropna().tail(1)['TotalEquityGrossMinorityInterest'].item())
+            return self.latest_value('TotalEquityGrossMinorityInterest')
         except Exception as e:
             print(f"{e}: {e.__doc__}")
             return np.nan
 
 
-    @property
+    @derived('latest_financials')
     def cash_and_equivalents(self):
         try:
-            return (pd.concat([self.quarterly_financials['CashAndCashEquivalents'],
-                               self.yearly_financials['CashAndCashEquivalents']]).reset_index()
-                      .sort_values(by='asOfDate').dropna().tail(1)['CashAndCashEquivalents'].item())
+            return self.latest_value('CashAndCashEquivalents')
         except Exception as e:
             print(f"{e}: {e.__doc__}")
             return np.nan
 
 
-    @property
+    @derived('yearly_financials', 'ttm_financials')
     def operating_income(self):
         try:
-            return (pd.concat([self.yearly_financials['OperatingIncome'].reset_index(),
-                                              self.annualize_financials(self.quarterly_financials, 
-                                                                        'OperatingIncome')])
-                                         .reset_index().sort_values(by='asOfDate').dropna()
-                                         .set_index('asOfDate').tail(1)['OperatingIncome'].item())
+            return self.latest_flow('OperatingIncome')
         except Exception as e:
             print(f"{e}: {e.__doc__}")
             return np.nan
 
-    @property
+    @derived('yearly_financials', 'ttm_financials')
     def depreciation_and_amortization(self):
         try:
             if 'DepreciationAndAmortization' in self.yearly_financials.columns:
                 label = 'DepreciationAndAmortization'
             else:
                 label = 'DepreciationAmortizationDepletion'
-            return (pd.concat([self.yearly_financials[label].reset_index(),
-                                              self.annualize_financials(self.quarterly_financials, 
-                                                                        label)])
-                                         .reset_index().sort_values(by='asOfDate').dropna()
-                                         .set_index('asOfDate').tail(1)[label].item())
+            return self.latest_flow(label)
         except Exception as e:
             print(f"{e}: {e.__doc__}")
             return np.nan
 
-    @property
+    @derived('latest_financials')
     def marketable_securities(self):
         try:
-            return (pd.concat([self.quarterly_financials['AvailableForSaleSecurities'],
-                               self.yearly_financials['AvailableForSaleSecurities']]).reset_index()
-                      .sort_values(by='asOfDate').dropna().tail(1)['AvailableForSaleSecurities'].item())
+            return self.latest_value('AvailableForSaleSecurities')
         except Exception as e:
             print(f"{e}: {e.__doc__}")
             return 0
 
-    @property
+    @derived('latest_financials', 'sector', 'total_assets')
     def current_assets(self):
         try:
-            return (pd.concat([self.quarterly_financials['CurrentAssets'],
-                               self.yearly_financials['CurrentAssets']]).reset_index()
-                      .sort_values(by='asOfDate').dropna().tail(1)['CurrentAssets'].item())
+            return self.latest_value('CurrentAssets')
         except Exception as e:
             print(f"{e}: {e.__doc__}")
             if self.sector == 'Financial Services':
@@ -482,68 +745,58 @@ class Stock:
             else:
                 return np.nan
 
-    @property
+    @derived('current_assets', 'current_liabilities')
     def net_current_assets(self):
         return self.current_assets - self.current_liabilities
 
-    @property
+    @derived('latest_financials')
     def inventory(self):
         try:
-            return (pd.concat([self.quarterly_financials['Inventory'],
-                               self.yearly_financials['Inventory']]).reset_index()
-                      .sort_values(by='asOfDate').dropna().tail(1)['Inventory'].item())
+            return self.latest_value('Inventory')
         except Exception as e:
             print(f"{e}: {e.__doc__}")
             return 0 #Insurance and banks do not have inventory
 
-    @property
+    @derived('current_assets', 'current_liabilities', 'n_shares')
     def working_capital_per_share(self):
         return liquidity.get_working_capital(self.current_assets - self.current_liabilities) / self.n_shares
 
-    @property
+    @derived('latest_financials', 'sector', 'total_liabilities')
     def current_liabilities(self):
         try:
-            return (pd.concat([self.quarterly_financials['CurrentLiabilities'],
-                               self.yearly_financials['CurrentLiabilities']]).reset_index()
-                      .sort_values(by='asOfDate').dropna().tail(1)['CurrentLiabilities'].item())
+            return self.latest_value('CurrentLiabilities')
         except:
             if self.sector == 'Financial Services':
                 return self.total_liabilities
             else:
                 return np.nan
 
-    @property
+    @derived('info', 'long_term_debt', 'current_liabilities')
     def total_debt(self):
         if   (self.get_info("totalDebt") is not None) and not isinstance(self.get_info("totalDebt"), dict):
             return self.get_info("totalDebt")
         else:
             return self.long_term_debt + self.current_liabilities
 
-    def find_longterm_debt_columns(self, df):
+    def find_longterm_debt_column(self, df):
         if ('LongTermDebt' in df.columns):
-            return df['LongTermDebt']
+            return 'LongTermDebt'
         else:
-            result = df.filter(like='LongTermDebt')
-            if len(result.columns):
-                col = result.columns[0]
-                return result.rename(columns={col : 'LongTermDebt'}).dropna()
+            columns = df.filter(like='LongTermDebt').columns
+            if len(columns):
+                return columns[0]
             else:
-                return pd.DataFrame()
-            
-        
-    @property
+                raise KeyError('LongTermDebt')
+
+    @derived('financials_timeline', 'latest_financials')
     def long_term_debt(self):
-        quarterly_longterm_debt = self.find_longterm_debt_columns(self.quarterly_financials)
-        yearly_longterm_debt = self.find_longterm_debt_columns(self.yearly_financials)
-        return (pd.concat([quarterly_longterm_debt,
-                           yearly_longterm_debt]).reset_index()
-                  .sort_values(by='asOfDate').dropna().tail(1)['LongTermDebt'].item())
+        return self.latest_value(self.find_longterm_debt_column(self.financials_timeline))
 
-    @property
+    @derived('cash', 'total_debt', 'n_shares')
     def net_cash_per_share(self):
         return (self.cash - self.total_debt) / self.n_shares
 
-    @property
+    @derived('info', 'yearly_financials', 'latest_financials')
     def cash(self):
         if   (self.get_info("totalCash") is not None):
             return self.get_info("totalCash")
@@ -553,20 +806,17 @@ class Stock:
             elif 'CashAndCashEquivalents' in self.yearly_financials.columns:
                 label = 'CashAndCashEquivalents'
             else: return np.nan
-            return  (pd.concat([self.yearly_financials[label].reset_index(),
-                                              self.annualize_financials(self.quarterly_financials, 
-                                                                        label)])
-                                         .reset_index().sort_values(by='asOfDate').dropna()
-                                         .set_index('asOfDate').tail(1)[label].item())
+            # a balance: the last reported value, not a sum over the year
+            return self.latest_value(label)
 
-    @property
+    @derived('last_dividend', 'earning_per_share')
     def payout_ratio(self):
         try:
             return  self.last_dividend / self.EPS #TODO yahooquery already provides this quantity, no need to calculate it
         except:
             return np.nan
 
-    @property
+    @derived('info', 'annual_dividends')
     def last_dividend(self):
         if   (self.get_info("dividendRate") is not None) and not (isinstance(self.get_info("dividendRate"), dict)):
             return  self.get_info("dividendRate")
@@ -576,46 +826,38 @@ class Stock:
             return 0
 
 
-    @property
+    @derived('last_dividend', 'reference_price')
     def dividend_yeld(self):
         return  self.last_dividend/self.reference_price
 
-    @property
+    @derived('info', 'yearly_financials', 'ttm_financials')
     def operating_cash_flow(self):
         if   (self.get_info("operatingCashflow") is not None) and not isinstance(self.get_info("operatingCashflow"), dict):
             return float(self.get_info("operatingCashflow"))
         else:
             try:
-                return (pd.concat([self.yearly_financials['OperatingCashFlow'].reset_index(),
-                                              self.annualize_financials(self.quarterly_financials, 
-                                                                        'OperatingCashFlow')])
-                                         .reset_index().sort_values(by='asOfDate').dropna()
-                                         .set_index('asOfDate').tail(1)['OperatingCashFlow'].item())
+                return self.latest_flow('OperatingCashFlow')
             except:
                 return np.nan
 
-    @property
+    @derived('market_cap', 'operating_cash_flow')
     def price_to_cash_flow(self):
         try:
             return self.market_cap/ self.operating_cash_flow
         except:
             return np.nan
 
-    @property
+    @derived('market_cap', 'free_cash_flow')
     def price_to_free_cash_flow(self):
         return self.market_cap / self.free_cash_flow
 
-    @property
+    @derived('info', 'yearly_financials', 'ttm_financials', 'operating_cash_flow')
     def free_cash_flow(self):
         try:
             return float(self.get_info("freeCashflow"))
         except:
             try:
-                return (pd.concat([self.yearly_financials['FreeCashFlow'].reset_index(),
-                                              self.annualize_financials(self.quarterly_financials, 
-                                                                        'FreeCashFlow')])
-                                         .reset_index().sort_values(by='asOfDate').dropna()
-                                         .set_index('asOfDate').tail(1)['FreeCashFlow'].item())
+                return self.latest_flow('FreeCashFlow')
             except:
                 try:
                     return self.operating_cash_flow - self.capital_expenditures
@@ -626,26 +868,22 @@ class Stock:
     def capital_expenditures(self):
         return self.tail(1).cashflow["CapitalExpenditures"]
 
-    @property
+    @derived('info', 'yearly_financials', 'ttm_financials')
     def revenue(self):
         if   (self.get_info("totalRevenue") is not None) and not isinstance(self.get_info("totalRevenue"), dict):
             return self.get_info("totalRevenue")
         else:
-            return (pd.concat([self.yearly_financials['TotalRevenue'].reset_index(),
-                                              self.annualize_financials(self.quarterly_financials, 
-                                                                        'TotalRevenue')])
-                                         .reset_index().sort_values(by='asOfDate').dropna()
-                                         .set_index('asOfDate').tail(1)['TotalRevenue'].item())
+            return self.latest_flow('TotalRevenue')
 
-    @property
+    @derived('net_income', 'full_time_employees')
     def net_income_per_employee(self):
         return self.net_income/self.full_time_employees
 
-    @property
+    @derived('revenue', 'full_time_employees')
     def revenue_per_employee(self):
         return  self.revenue/self.full_time_employees
     
-    @property
+    @derived('reference_price', 'PE', 'net_income', 'n_shares')
     def earning_per_share(self):
         try:
             return self.reference_price/self.PE
@@ -656,51 +894,27 @@ class Stock:
     def EPS(self):
         return self.earning_per_share
 
-    @property
+    @derived('EBIT', 'total_assets', 'current_liabilities')
     def ROCE(self):
         return self.EBIT/(self.total_assets - self.current_liabilities)
 
-    @property
+    @derived('yearly_financials', 'ttm_financials', 'pretax_income', 'interest_expense')
     def EBIT(self):
-        if self._EBIT is None:
-            try:
-                self._EBIT = (pd.concat([self.annualize_financials(self.quarterly_financials, 'EBIT'),
-                                         self.yearly_financials['EBIT'].reset_index()])
-                                .sort_values(by='asOfDate').dropna().tail(1)['EBIT'].item())
-            except:
-                logger.warning('EBIT column not found, recomputing from other quantities')
-                self._EBIT = self.pretax_income + self.interest_expense
-        return self._EBIT
+        try:
+            return self.latest_flow('EBIT')
+        except:
+            logger.warning('EBIT column not found, recomputing from other quantities')
+            return self.pretax_income + self.interest_expense
 
-    @property
+    @derived('yearly_financials', 'ttm_financials')
     def pretax_income(self):
-        if self._pretax_income is None:
-            self._pretax_income = (pd.concat([self.yearly_financials['PretaxIncome'].reset_index(),
-                                              self.annualize_financials(self.quarterly_financials, 
-                                                                        'PretaxIncome')])
-                                         .reset_index().sort_values(by='asOfDate').dropna()
-                                         .set_index('asOfDate').tail(1)['PretaxIncome'].item())
-        return self._pretax_income
+        return self.latest_flow('PretaxIncome')
 
-    @property
+    @derived('yearly_financials')
     def interest_expense(self):
         try:
             return self.yearly_financials.tail(1)[INTEREST_EXPENSE].item()
         except Exception as e:
             print(f"{e}: {e.__doc__}")
             return 0
-
-    def annualize_financials(self, financials : pd.DataFrame, label : str):
-        try:
-            period = int(financials['periodType'].unique().item().replace('M', ''))
-            variable = financials[label].dropna()
-            if len(variable) >= int(12/period):
-                results = variable.reset_index().tail(1)
-                results[label] = variable.tail(int(12/period)).sum()
-                return results
-            else:
-                return pd.DataFrame()
-        except KeyError:
-            logger.warn("Quarterly data not found! Using yearly")
-            return self.yearly_financials[label].reset_index().tail(1)
     
\ No newline at end of file
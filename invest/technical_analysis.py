@@ -1,11 +1,12 @@
-import piecewise_regression
-from sklearn import linear_model, model_selection
-from invest.plot import plot_candle, trendline, piecewise_regression_results
 import numpy as np
 import pandas as pd
-from matplotlib import pyplot as plt
+
+# scikit-learn, piecewise_regression and the plotting libraries are imported by the
+# functions using them, so that detect_trends and find_breakpoint only need NumPy
 
 def compute_longterm_trend(data, train_size=0.8):
+    from sklearn import linear_model, model_selection
+    from matplotlib import pyplot as plt
 
     first_trading_day = data.index.min()
     data['days_since_quot'] = (data.index - first_trading_day)/np.timedelta64(1, 'D')
@@ -67,7 +68,58 @@ def compute_longterm_trend(data, train_size=0.8):
     plt.show()
     return score, roe, vol, data
 
-def detect_trend(full_hist, train_length = 120, price_col = 'Close', verbose=True):
+def find_breakpoint(x, y, weights=None, min_size=3):
+    """
+    Exact search of the best breakpoint of a continuous piecewise-linear fit
+    y = a + b*x + c*max(x - x[k], 0), over all the candidate indices k.
+    The residual sum of squares of every candidate follows from cumulative sums,
+    so the whole search is O(n) and works on many series at once.
+
+    :param x: sorted abscissae, shape (n,) or (n_series, n)
+    :param y: ordinates, same shape as x
+    :param weights: optional 0/1 weights (0 for missing points), same shape as x
+    :param min_size: minimum number of points on each side of the breakpoint
+    :return: the index of the best breakpoint (or of each series' best breakpoint);
+             -1 when no candidate is valid
+    """
+    single = np.ndim(x) == 1
+    x, y = np.atleast_2d(x).astype(float), np.atleast_2d(y).astype(float)
+    w = np.ones_like(x) if weights is None else np.atleast_2d(weights).astype(float)
+    y = np.where(w > 0, y, 0.0)
+
+    def suffix(values):
+        # sum over the points strictly after each candidate
+        return np.cumsum(values[:, ::-1], axis=1)[:, ::-1] - values
+
+    n0, n1, n2 = suffix(w), suffix(w*x), suffix(w*x*x)
+    ny, nxy = suffix(w*y), suffix(w*x*y)
+    N, X, XX = w.sum(axis=1, keepdims=True), (w*x).sum(axis=1, keepdims=True), (w*x*x).sum(axis=1, keepdims=True)
+    Y, XY = (w*y).sum(axis=1, keepdims=True), (w*x*y).sum(axis=1, keepdims=True)
+
+    # inner products of the hinge h = max(x - x_k, 0) with 1, x, h and y
+    H = n1 - x*n0
+    HX = n2 - x*n1
+    HH = n2 - 2*x*n1 + x*x*n0
+    HY = nxy - x*ny
+
+    # residualize the hinge and y against the straight line [1, x]
+    det = N*XX - X*X
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gain_num = HY - (H*(XX*Y - X*XY) + HX*(N*XY - X*Y))/det
+        gain_den = HH - (H*(XX*H - X*HX) + HX*(N*HX - X*H))/det
+        gain = gain_num**2/gain_den
+    valid = (n0 >= min_size) & (N - n0 >= min_size) & (w > 0) & (gain_den > 1e-12*np.maximum(HH, 1e-300))
+    gain = np.where(valid, gain, -np.inf)
+    best = np.where(valid.any(axis=1), np.argmax(gain, axis=1), -1)
+    return best.item() if single else best
+
+
+def detect_trend(full_hist, train_length = 120, price_col = 'Close', verbose=True, engine='piecewise'):
+    """
+    :param engine: 'piecewise' fits the breakpoint with piecewise_regression,
+                   'exact' finds it by exact search (see find_breakpoint), much faster
+    """
+    from sklearn import linear_model
     data_norm = max(full_hist.reset_index()['index'])
     full_hist = full_hist.reset_index()
     norm_price = full_hist[price_col].tail(1).item()
@@ -75,14 +127,19 @@ def detect_trend(full_hist, train_length = 120, price_col = 'Close', verbose=Tru
     x = (full_hist['index'].tail(train_length)/data_norm).values
     y = (full_hist[price_col].tail(train_length)/norm_price).apply(np.log).values
     
-    pw_fit = piecewise_regression.Fit(x, y, n_breakpoints=1)
-    
-    try:
-        result = pw_fit.get_results()
-        best_b = result['estimates']['breakpoint1']['estimate']*data_norm
-    except Exception as e:
-        print(e)
-        best_b = full_hist['index'].tail(train_length).values[0]
+    if engine == 'exact':
+        best = find_breakpoint(x, y)
+        best_b = x[best]*data_norm if best >= 0 else full_hist['index'].tail(train_length).values[0]
+    else:
+        import piecewise_regression
+        pw_fit = piecewise_regression.Fit(x, y, n_breakpoints=1)
+
+        try:
+            result = pw_fit.get_results()
+            best_b = result['estimates']['breakpoint1']['estimate']*data_norm
+        except Exception as e:
+            print(e)
+            best_b = full_hist['index'].tail(train_length).values[0]
         
     clean_trend = full_hist.loc[full_hist['index'] > int(best_b)]
     
@@ -101,8 +158,96 @@ def detect_trend(full_hist, train_length = 120, price_col = 'Close', verbose=Tru
     actual = np.exp(ts_model.predict([[(data_norm)/data_norm]]))
     trend_magnitude = (projection - actual)/actual
     if verbose:
-        pw_fit.summary()
-        piecewise_regression_results(pw_fit)
+        from invest.plot import plot_candle, trendline, piecewise_regression_results
+        if engine != 'exact':
+            pw_fit.summary()
+            piecewise_regression_results(pw_fit)
         plot_candle(current_trend, trendline).show()
     return trend_magnitude.item(), pd.concat([full_hist.loc[full_hist.index <= best_b].copy(),
-                                              current_trend])
\ No newline at end of file
+                                              current_trend])
+
+def masked_median(values, mask):
+    """
+    Row-wise median of the values selected by mask (much faster than np.nanmedian on 2D arrays).
+    """
+    count = mask.sum(axis=1)
+    ordered = np.sort(np.where(mask, values, np.inf), axis=1)
+    low = np.take_along_axis(ordered, (np.maximum(count, 1) - 1)[:, None] // 2, axis=1)[:, 0]
+    high = np.take_along_axis(ordered, (np.maximum(count, 1) // 2)[:, None], axis=1)[:, 0]
+    return np.where(count > 0, np.where(count % 2, low, (low + high)/2), np.nan)
+
+
+def robust_line(x, y, weights, iterations=20, k=1.345, tol=1e-8):
+    """
+    Huber regression of many lines at once, by iteratively reweighted least squares
+    (the scale is the MAD of the least squares residuals).
+
+    :param x: abscissae, shape (n_series, n)
+    :param y: ordinates, same shape as x
+    :param weights: 0/1 weights selecting the points of each series, same shape as x
+    :return: the intercepts and the slopes, shape (n_series,)
+    """
+    r = weights.astype(float)
+    y = np.where(r > 0, y, 0.0)
+    scale = None
+    slope = np.zeros(len(x))
+    for _ in range(iterations):
+        previous = slope
+        s0, sx, sxx = r.sum(axis=1), (r*x).sum(axis=1), (r*x*x).sum(axis=1)
+        sy, sxy = (r*y).sum(axis=1), (r*x*y).sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slope = (s0*sxy - sx*sy)/(s0*sxx - sx*sx)
+            intercept = (sy - slope*sx)/s0
+        if scale is not None and np.nanmax(np.abs(slope - previous), initial=0) < tol:
+            break
+        residuals = np.abs(y - intercept[:, None] - slope[:, None]*x)
+        if scale is None:
+            scale = masked_median(residuals, weights > 0)/0.6745
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r = weights*np.minimum(1, k*scale[:, None]/residuals)
+        r = np.where(np.isfinite(r), r, weights)
+    return intercept, slope
+
+
+def detect_trends(price_panel : pd.DataFrame, windows=(120, 2520), horizon=365, chunk_size=256, min_size=3):
+    """
+    Vectorized detect_trend over a whole universe: for each window, the last breakpoint
+    of the log prices is found by exact search (see find_breakpoint) and a robust (Huber)
+    line is fitted after it. As in detect_trend, positions are counted in rows of the panel
+    and the trend magnitude is the relative change of the trendline horizon rows ahead.
+
+    :param price_panel: aligned prices, dates × symbols (missing prices as NaN)
+    :param windows: the numbers of rows used by each fit (detect_trend's train_length)
+    :param chunk_size: number of symbols processed at once, to bound the memory
+    :return: a frame indexed by symbol with columns (window, field), the fields being
+             breakpoint (date), slope (log price per row), trend_magnitude and trendline
+             (the trend value at the last date)
+    :rtype: pd.DataFrame
+    """
+    data_norm = max(len(price_panel) - 1, 1)
+    prices = price_panel.to_numpy(dtype=float).T
+    results = {}
+    for window in windows:
+        tail = prices[:, -window:]
+        dates = price_panel.index[-tail.shape[1]:]
+        x = np.arange(len(price_panel) - tail.shape[1], len(price_panel)) / data_norm
+        fields = {field: np.full(len(prices), np.nan) for field in ['slope', 'trend_magnitude', 'trendline']}
+        breakpoints = np.full(len(prices), -1)
+        for start in range(0, len(prices), chunk_size):
+            chunk = tail[start:start + chunk_size]
+            valid = np.isfinite(chunk) & (chunk > 0)
+            norm_price = chunk[np.arange(len(chunk)), np.where(valid.any(axis=1),
+                                                               tail.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1), 0)]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                y = np.where(valid, np.log(chunk/norm_price[:, None]), 0.0)
+            xs = np.broadcast_to(x, chunk.shape)
+            best = find_breakpoint(xs, y, valid, min_size=min_size)
+            after = valid & (np.arange(chunk.shape[1]) > np.where(best >= 0, best, -1)[:, None])
+            intercept, slope = robust_line(xs, y, after)
+            fields['slope'][start:start + len(chunk)] = slope/data_norm
+            fields['trend_magnitude'][start:start + len(chunk)] = np.expm1(slope*horizon/data_norm)
+            fields['trendline'][start:start + len(chunk)] = np.exp(intercept + slope*x[-1])*norm_price
+            breakpoints[start:start + len(chunk)] = best
+        results[window] = pd.DataFrame({'breakpoint': dates[np.maximum(breakpoints, 0)].where(breakpoints >= 0),
+                                        **fields}, index=price_panel.columns)
+    return pd.concat(results, axis=1, names=['window', 'field'])
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+
+import pandas as pd
+
+from invest import instrumentation
+from invest.stock import Stock
+
+logger = logging.getLogger()
+
+# The modules used by get_indicators, as (module, frequency) pairs
+DEFAULT_MODULES = [('summary_detail', None),
+                   ('financial_data', None),
+                   ('asset_profile', None),
+                   ('key_stats', None),
+                   ('summary_profile', None),
+                   ('all_financial_data', 'a'),
+                   ('all_financial_data', 'q'),
+                   ('balance_sheet', 'a'),
+                   ('balance_sheet', 'q'),
+                   ('history', None)]
+
+
+class StockUniverse:
+    """
+    A collection of stocks whose data are downloaded in bulk: a single
+    multi-symbol yahooquery Ticker is created for each chunk of symbols, all the
+    quoteSummary modules are requested with one call per symbol and the requests
+    of a chunk run concurrently. Each Stock receives its own slice of the responses,
+    so its lazy properties do not hit the network anymore. With a cache, only
+    the responses that are missing or expired are downloaded.
+    """
+    def __init__(self, isins, chunk_size : int = 50, max_workers : int = 8, cache=None, refresh=False,
+                 history_store=None, scheduler=None, data_source=None):
+        self.stocks = {isin: Stock(isin, cache=cache, refresh=refresh, history_store=history_store,
+                                   scheduler=scheduler, data_source=data_source)
+                       for isin in isins}
+        self.scheduler = scheduler
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        # the errors of the last snapshots, as a dict symbol -> exception
+        self.errors = {}
+
+    def __len__(self):
+        return len(self.stocks)
+
+    def __iter__(self):
+        return iter(self.stocks.values())
+
+    def __getitem__(self, isin):
+        return self.stocks[isin]
+
+    def chunks(self):
+        stocks = list(self.stocks.values())
+        for i in range(0, len(stocks), self.chunk_size):
+            yield stocks[i:i + self.chunk_size]
+
+    def iter_chunks(self, modules=DEFAULT_MODULES):
+        """
+        Yield the stocks one chunk at a time, downloading each chunk just before yielding it.
+        """
+        for chunk in self.chunks():
+            prefetch(chunk, modules, max_workers=self.max_workers)
+            yield chunk
+
+    def price_panel(self, price_col : str = 'Close'):
+        """
+        Return the aligned prices of all the stocks (dates × codes), the input of
+        invest.technical_analysis.detect_trends.
+        """
+        return pd.DataFrame({stock.code: stock.hist[price_col] for stock in self}).sort_index()
+
+    def ratio_history(self, ratios=None):
+        """
+        The tidy (symbol, asOfDate, periodType, ratio, value) history of the ratios of all the stocks,
+        see invest.ratio_history.ratio_history.
+        """
+        from invest.ratio_history import ratio_history
+        return ratio_history(self, ratios)
+
+    def snapshots(self, release : bool = True, modules=DEFAULT_MODULES):
+        """
+        Download the stocks chunk by chunk and return their invest.snapshot.StockSnapshot.
+        With release, the data of each chunk are dropped as soon as its snapshots are taken,
+        so that large universes fit in memory. The stocks whose snapshot fails are left out:
+        their errors are stored in self.errors, as a dict symbol -> exception.
+        """
+        symbols = {id(stock): symbol for symbol, stock in self.stocks.items()}
+        self.errors = {}
+        snapshots = []
+        for chunk in self.iter_chunks(modules):
+            for stock in chunk:
+                try:
+                    snapshots.append(stock.snapshot())
+                except Exception as e:
+                    logger.warning(f"{stock.code}: {e}")
+                    self.errors[symbols[id(stock)]] = e
+                finally:
+                    if release:
+                        stock.release()
+        return snapshots
+
+    async def aload(self, modules=DEFAULT_MODULES, max_connections : int = 100):
+        """
+        Download the stocks concurrently from the running event loop, through a single pooled
+        client (see Stock.aload). The stocks whose download fails are logged and left to
+        the lazy properties.
+        """
+        from invest.sources import YahooSource
+        from invest.async_client import AsyncYahooClient
+        if any(isinstance(stock.source, YahooSource) for stock in self):
+            async with AsyncYahooClient(max_connections, scheduler=self.scheduler) as client:
+                results = await asyncio.gather(*(stock.aload(modules, client) for stock in self),
+                                               return_exceptions=True)
+        else:
+            results = await asyncio.gather(*(stock.aload(modules) for stock in self), return_exceptions=True)
+        for stock, result in zip(self, results):
+            if isinstance(result, Exception):
+                logger.warning(f"{stock.code}: {result}")
+        return self
+
+    def prefetch(self, modules=DEFAULT_MODULES):
+        for _ in self.iter_chunks(modules):
+            pass
+        return self
+
+
+def prefetch(stocks, modules=DEFAULT_MODULES, max_workers : int = 8):
+    """
+    Download the given modules for a list of stocks, the ones that are not loaded nor
+    in the cache, and store them in each Stock. The data source of the first stock
+    downloads them all (with Yahoo Finance, a single multi-symbol Ticker, see
+    invest.sources.YahooSource.prefetch).
+
+    :param stocks: the stocks to be filled
+    :type stocks: list of invest.Stock
+    :param modules: (module, frequency) pairs, see DEFAULT_MODULES
+    :type modules: list
+    """
+    by_code = {stock.yahoo_code.upper(): stock for stock in stocks}
+    missing = {key: [code for code, stock in by_code.items()
+                     if (key not in stock._raw) and not stock.load_cached(*key)]
+               for key in modules}
+    missing = {key: codes for key, codes in missing.items() if codes}
+    if missing:
+        with instrumentation.stage('prefetch'):
+            next(iter(by_code.values())).source.prefetch(by_code, missing, max_workers=max_workers)
+    return stocks
@@ -1,10 +1,8 @@
 import os
 from functools import reduce
-from sklearn.metrics import mean_squared_error
 import numpy as np
 
 import pandas as pd
-import yaml
 
 
 
@@ -47,10 +45,12 @@ def load_yaml(filename: str) -> dict:
         "yml"
     ), "Not a yaml extention!"
     with open(filename, "r", encoding="utf-8") as handler:
+        import yaml
         return yaml.load(handler, Loader=yaml.FullLoader)
     
 def merge_dataframe(data_frames):
     return reduce(lambda left, right: pd.merge(left, right, how="outer"), data_frames)
 
 def rmse(y_true, y_pred):
+    from sklearn.metrics import mean_squared_error
     return np.sqrt(mean_squared_error(y_true, y_pred))
\ No newline at end of file
@@ -1,10 +1,19 @@
 
-from invest.data_loader.borsa_italiana import load_isin_list, load_financials, load_isin_alfa_transcode, url_scheda, url_financials
+import asyncio
+import argparse
+from datetime import timedelta
+from invest.data_loader.borsa_italiana import load_isin_list, scrape_pages
 import os
 import pandas as pd
-from invest.utils import file_folder_exists, select_or_create
-from langchain_community.document_loaders import AsyncChromiumLoader
-from bs4 import BeautifulSoup
+from invest.utils import select_or_create
+from invest.data_loader.refresh_manifest import RefreshManifest
+from invest.data_loader.symbol_master import save_symbol_master
+
+parser = argparse.ArgumentParser(description='Refresh the Borsa Italiana isin transcode and financials tables')
+parser.add_argument('--max-age', type=float, default=None, help='refresh the tables older than this number of days')
+parser.add_argument('--new-only', action='store_true', help='only fetch the isins never fetched before')
+parser.add_argument('--force', action='store_true', help='refresh all the tables')
+args = parser.parse_args()
 
 it_stocks = load_isin_list()
 
@@ -14,23 +23,31 @@ financials_path = select_or_create(os.path.join(data_path, 'financials'))
 
 it_stocks.to_csv(os.path.join(data_path, 'euronext_milano.csv'))
 
-for isin in it_stocks['Codice ISIN']:
-    print(isin)
-    transcode_table_path = os.path.join(transcode_path, f'{isin}.csv')
-    financials_table_path = os.path.join(financials_path, f'{isin}.csv')
-    if not(file_folder_exists(transcode_table_path)):
-        try:
-            transcode_table = load_isin_alfa_transcode(url_scheda(isin))
-            transcode_table.to_csv(transcode_table_path, index=0)
-        except:
-            pass
-    if not(file_folder_exists(financials_table_path)):
-        try:
-            financials_table = load_financials(url_financials(isin))
-            financials_table.to_csv(financials_table_path, index=0)
-        except:
-            pass
+table_paths = {'transcode': transcode_path, 'financials': financials_path}
+
+manifest = RefreshManifest(os.path.join(data_path, 'refresh_manifest.json'), table_paths).bootstrap()
+
+async def refresh(isins):
+    due = manifest.due(isins,
+                       max_age=None if args.max_age is None else timedelta(days=args.max_age),
+                       new_only=args.new_only,
+                       force=args.force)
+    print(f"{len(due)} tables to be fetched")
+    # one browser pool for all the pages, each table is saved as soon as it is parsed
+    try:
+        async for isin, table, result in scrape_pages(due, list(table_paths)):
+            if isinstance(result, Exception):
+                print(f"{isin} {table} - {result}: {result.__doc__}")
+                continue
+            changed = manifest.record(isin, table, result)
+            print(isin, table, 'changed' if changed else 'unchanged')
+    finally:
+        manifest.save()
+
+asyncio.run(refresh(it_stocks['Codice ISIN']))
 
 isin_alpha_transcode = pd.concat(map(lambda x : pd.read_csv(os.path.join(transcode_path, x)), os.listdir(transcode_path)))
 isin_alpha_transcode['yahoo_code'] = isin_alpha_transcode['Codice Alfanumerico'].apply(lambda x : f"{x}.MI")
 isin_alpha_transcode[['Codice Isin', 'Codice Alfanumerico', 'yahoo_code']].to_csv(os.path.join(data_path, 'milan_isin_transcode.csv'), index=0)
+
+save_symbol_master()
@@ -14,4 +14,7 @@ setup(name='invest',
                         'yahooquery',
                         'plotly',
                         'datetime'],
-      zip_safe=False)
\ No newline at end of file
+      extras_require={'history': ['pyarrow'],
+                      'async': ['httpx'],
+                      'scraping': ['playwright', 'beautifulsoup4', 'lxml']},
+      zip_safe=False)
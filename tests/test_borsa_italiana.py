@@ -0,0 +1,121 @@
+import asyncio
+import sys
+import types
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('bs4')
+pytest.importorskip('lxml')
+
+from invest.data_loader import borsa_italiana
+
+
+class Response:
+    def __init__(self, text):
+        self.text = text
+
+    def raise_for_status(self):
+        pass
+
+
+class Session:
+    """
+    Serves the listing pages in order, the last one again past the end (as the website does).
+    """
+    def __init__(self, pages):
+        self.pages = pages
+        self.requested = []
+
+    def get(self, url, timeout=None):
+        page = int(url.rsplit('pag=', 1)[1])
+        self.requested.append(page)
+        return Response(self.pages[min(page, len(self.pages) - 1)])
+
+
+def listing(*rows):
+    cells = ''.join(f"<tr><td>{name}</td><td>{isin}</td><td>{price}</td></tr>" for name, isin, price in rows)
+    return ("<html><body><table><tr><td>menu</td></tr></table>"
+            "<table><thead><tr><th>Nome</th><th>Codice ISIN</th><th>Ultimo prezzo</th></tr></thead>"
+            f"<tbody>{cells}</tbody></table></body></html>")
+
+
+def test_pages_are_walked_until_they_repeat():
+    session = Session([listing(('A2A', 'IT0001233417', 2.1), ('ENEL', 'IT0003128367', 6.5)),
+                       listing(('ENEL', 'IT0003128367', 6.5), ('NO ISIN', '', 1.0),
+                               ('AIRBUS', 'NL0000235190', 150.0), ('ENI', 'IT0003132476', 14.0))])
+    isins = borsa_italiana.load_isin_list(session)
+    # the third page repeats the second: the walk stops there
+    assert session.requested == [0, 1, 2]
+    assert list(isins['Codice ISIN']) == ['IT0001233417', 'IT0003128367', 'IT0003132476']
+    assert list(isins['Nome']) == ['A2A', 'ENEL', 'ENI']
+
+
+@pytest.mark.parametrize('page', ["<html><body><p>Nessun risultato</p></body></html>", listing()])
+def test_empty_listing(page):
+    isins = borsa_italiana.load_isin_list(Session([page]))
+    assert isins.empty
+    assert list(isins.columns) == borsa_italiana.LISTING_COLUMNS
+
+
+class FakeBrowser:
+    def __init__(self, tabs):
+        self.tabs = tabs
+        self.closed = False
+
+    async def new_page(self):
+        if not self.tabs:
+            raise RuntimeError('no more tabs')
+        self.tabs -= 1
+        return object()
+
+    async def close(self):
+        self.closed = True
+
+
+class FakePlaywright:
+    def __init__(self, browser):
+        self.browser = browser
+        self.stopped = False
+        self.chromium = self
+
+    async def start(self):
+        return self
+
+    async def launch(self, headless):
+        if self.browser is None:
+            raise RuntimeError('chromium not installed')
+        return self.browser
+
+    async def stop(self):
+        self.stopped = True
+
+
+def fake_playwright(monkeypatch, browser):
+    playwright = FakePlaywright(browser)
+    module = types.ModuleType('playwright.async_api')
+    module.async_playwright = lambda: playwright
+    monkeypatch.setitem(sys.modules, 'playwright', types.ModuleType('playwright'))
+    monkeypatch.setitem(sys.modules, 'playwright.async_api', module)
+    return playwright
+
+
+async def enter(pool):
+    async with pool:
+        pass
+
+
+@pytest.mark.parametrize('browser', [None, FakeBrowser(tabs=2)], ids=['launch', 'new_page'])
+def test_browser_pool_stops_playwright_when_start_up_fails(monkeypatch, browser):
+    playwright = fake_playwright(monkeypatch, browser)
+    with pytest.raises(RuntimeError):
+        asyncio.run(enter(borsa_italiana.BrowserPool(size=4)))
+    assert playwright.stopped
+    assert browser is None or browser.closed
+
+
+def test_browser_pool_closes_on_exit(monkeypatch):
+    browser = FakeBrowser(tabs=4)
+    playwright = fake_playwright(monkeypatch, browser)
+    asyncio.run(enter(borsa_italiana.BrowserPool(size=4)))
+    assert browser.closed and playwright.stopped
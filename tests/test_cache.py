@@ -0,0 +1,45 @@
+import os
+import time
+
+import pytest
+
+from invest.cache import DiskCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return DiskCache(str(tmp_path), max_size=10 ** 6)
+
+
+def entries_size(cache):
+    return sum(os.path.getsize(os.path.join(root, file))
+               for root, _, files in os.walk(cache.path) for file in files if file.endswith('.pkl'))
+
+
+def test_size_follows_set_and_delete(cache):
+    cache.set('ENEL.MI', 'summary_detail', None, {'marketCap': 1.0})
+    cache.set('ENI.MI', 'summary_detail', None, {'marketCap': 2.0})
+    assert cache.size == entries_size(cache) > 0
+    # overwriting an entry replaces its size
+    cache.set('ENEL.MI', 'summary_detail', None, {'marketCap': 1.0, 'sector': 'Utilities' * 10})
+    assert cache.size == entries_size(cache)
+    cache.delete('ENI.MI', 'summary_detail')
+    cache.delete('ENI.MI', 'summary_detail')
+    assert cache.size == entries_size(cache)
+    # a new process rebuilds the tally from the files
+    assert DiskCache(cache.path).size == cache.size
+
+
+def test_least_recently_used_entries_are_evicted(cache):
+    for i in range(5):
+        cache.set(f"SYM{i}", 'history', None, b'x' * 1000)
+        os.utime(cache.filename(f"SYM{i}", 'history'), (time.time() - 100 + i, time.time()))
+    cache.get('SYM0', 'history')
+    cache.max_size = 3500
+    cache.set('SYM5', 'history', None, b'x' * 1000)
+    assert cache.size == entries_size(cache) <= 3500
+    assert cache.get('SYM0', 'history') == b'x' * 1000
+    with pytest.raises(KeyError):
+        cache.get('SYM1', 'history')
+    cache.clear()
+    assert cache.size == entries_size(cache) == 0
@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from invest.fundamental_analysis import FUNDAMENTAL_FIELDS, panel_fundamental_indicators
+
+# round fundamentals, so that the indicators can be computed by hand
+FUNDAMENTALS = {'code': 'ENEL.MI', 'name': 'Enel', 'quot_date': pd.Timestamp('2024-05-31'),
+                'reference_price': 10.0, 'graham_price': 8.0, 'dividend_yeld': 0.05, 'payout_ratio': 0.6,
+                'dividend_years': 10, 'dividend_consistency': 0.9,
+                'cash_and_equivalents': 20.0, 'accounts_receivable': 10.0, 'marketable_securities': 10.0,
+                'current_liabilities': 40.0, 'current_ratio': 2.5, 'operating_cash_flow': 20.0, 'revenue': 200.0,
+                'inventory': 15.0, 'accounts_payable': 5.0, 'current_assets': 100.0, 'market_cap': 500.0,
+                'total_debt': 50.0, 'total_assets': 250.0, 'total_equity': 100.0, 'operating_income': 30.0,
+                'depreciation_and_amortization': 10.0, 'interest_expense': 8.0, 'free_cash_flow': 25.0,
+                'net_current_assets': 50.0, 'EPS': 1.0, 'n_shares': 50.0, 'PE': 10.0, 'ROE': 0.12, 'PB': 1.1,
+                'PS': 2.5, 'stockholder_equity': 100.0, 'price_to_cash_flow': 25.0, 'price_to_free_cash_flow': 20.0,
+                'net_cash_per_share': 2.0, 'ROCE': 0.1, 'net_income_per_employee': 1e4,
+                'revenue_per_employee': 2e5, 'full_time_employees': 1000.0, 'ROA': 0.04,
+                'NetIncome derivative': 1.0, 'Revenue derivative': -2.0, 'OperatingRevenue derivative': 0.0,
+                'TotalAssets derivative': 3.0, 'FreeCashFlow derivative': 0.5, 'TangibleBookValue derivative': 0.0,
+                'volatility': 0.2, 'BUYBACK_SCORE': 5}
+
+EXPECTED = {'Reference Price': 10.0, 'Graham Price': 8.0, 'Dividend yeld': 0.05, 'Payout Ratio': 0.6,
+            'Number of Years of Dividends': 10, 'Dividend Consistency': 0.9,
+            'Quick Ratio': 1.0,                              # (20 + 10 + 10) / 40
+            'Cash Ratio': 0.75,                              # (20 + 10) / 40
+            'Current Ratio': 2.5,
+            'Operating Cash Flow Ratio': 0.5,                # 20 / 40
+            'Operating Cash Flow Sales Ratio': 0.1,          # 20 / 200
+            'Short Term Coverage Ratio': 1.0,                # 20 / (10 + 15 - 5)
+            'Working capital over market cap': 0.12,         # (100 - 40) / 500
+            'Debt to Assets Ratio': 0.2,                     # 50 / 250
+            'Debt to Equity Ratio': 0.5,                     # 50 / 100
+            'Interest Coverage Ratio': 5.0,                  # (30 + 10) / 8
+            'Debt Service Coverage Ratio': 0.75,             # 30 / 40
+            'Free Cash Flow Yield': 0.05,                    # 25 / 500
+            'price_over_graham': 1.25,                       # 10 / 8
+            'Net current asset per share over price': 0.1,   # 50 / 500
+            'EPS over price': 0.1,                           # 1 / 10
+            'Revenue per Share': 4.0,                        # 200 / 50
+            'PE': 10.0, 'ROE': 0.12, 'PB': 1.1, 'PS': 2.5,
+            'Book Value per Share': 2.0,                     # 100 / 50
+            'Price to cash flow': 25.0, 'Price to free cash flow': 20.0,
+            'Net cash over market cap': 0.2,                 # 2 / 10
+            'ROCE': 0.1, 'Net income per employee': 1e4, 'Revenue per employee': 2e5, 'Fulltime employee': 1000.0,
+            'market_cap': 500.0, 'Return on Assets': 0.04, 'NetIncome derivative': 1.0, 'Revenue derivative': -2.0,
+            'OperatingRevenue derivative': 0.0, 'TotalAssets derivative': 3.0, 'FreeCashFlow derivative': 0.5,
+            'TangibleBookValue derivative': 0.0, 'volatility': 0.2, 'BUYBACK_SCORE': 5}
+
+
+def wide(*rows):
+    return pd.DataFrame([FUNDAMENTALS | row for row in rows])
+
+
+def long(frame):
+    # the symbol, field and value columns, e.g. read from a database
+    return frame.assign(symbol=frame['code']).melt(id_vars='symbol', var_name='field', value_name='value')
+
+
+def test_fundamentals_cover_every_field():
+    assert set(FUNDAMENTALS) == set(FUNDAMENTAL_FIELDS)
+
+
+def test_indicators():
+    indicators = panel_fundamental_indicators(wide({}))
+    assert list(indicators.columns[:3]) == ['code', 'name', 'LastPriceDate']
+    assert indicators.loc[0, 'code'] == 'ENEL.MI' and indicators.loc[0, 'name'] == 'Enel'
+    assert indicators.loc[0, 'LastPriceDate'] == pd.Timestamp('2024-05-31')
+    assert list(indicators.columns[3:]) == list(EXPECTED)
+    for column, value in EXPECTED.items():
+        assert indicators.loc[0, column] == pytest.approx(value), column
+
+
+def test_one_row_per_stock():
+    indicators = panel_fundamental_indicators(wide({}, {'code': 'ENI.MI', 'current_liabilities': 80.0}))
+    assert list(indicators['code']) == ['ENEL.MI', 'ENI.MI']
+    np.testing.assert_allclose(indicators['Quick Ratio'], [1.0, 0.5])
+    np.testing.assert_allclose(indicators['Working capital over market cap'], [0.12, 0.04])
+
+
+def test_long_input():
+    frame = wide({}, {'code': 'ENI.MI', 'revenue': 400.0})
+    from_long = panel_fundamental_indicators(long(frame))
+    from_wide = panel_fundamental_indicators(frame)
+    assert list(from_long['code']) == ['ENEL.MI', 'ENI.MI']
+    pd.testing.assert_frame_equal(from_long[list(EXPECTED)], from_wide[list(EXPECTED)], check_dtype=False)
+
+
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+def test_divisions_by_zero():
+    indicators = panel_fundamental_indicators(wide(
+        {'current_liabilities': 0.0},                                 # x / 0
+        {'current_liabilities': 0.0, 'operating_cash_flow': -20.0},   # -x / 0
+        {'current_liabilities': 0.0, 'operating_cash_flow': 0.0},     # 0 / 0
+        {'reference_price': 0.0, 'graham_price': 0.0, 'EPS': -1.0, 'net_cash_per_share': 0.0}))
+    np.testing.assert_array_equal(indicators['Operating Cash Flow Ratio'][:3], [np.inf, -np.inf, np.nan])
+    np.testing.assert_array_equal(indicators['Quick Ratio'][:3], [np.inf, np.inf, np.inf])
+    np.testing.assert_array_equal(indicators.loc[3, ['EPS over price', 'price_over_graham', 'Net cash over market cap']]
+                                  .astype(float), [-np.inf, np.nan, np.nan])
+    # the other stocks are not affected
+    assert indicators.loc[3, 'Quick Ratio'] == 1.0 and indicators.loc[0, 'EPS over price'] == 0.1
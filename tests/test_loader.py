@@ -0,0 +1,75 @@
+import os
+import pickle
+
+import pandas as pd
+import pytest
+
+from invest.data_loader import loader
+
+CSV = "SYMBOL,NAME,SECTOR\nENEL,Enel,Utilities\nENI,Eni,Energy\nNA,Nashville,Energy\n"
+
+
+@pytest.fixture
+def symbols_dir(tmp_path, monkeypatch):
+    (tmp_path / 'test.csv').write_text(CSV)
+    monkeypatch.setattr(loader, 'symbols_path', lambda filename: str(tmp_path / filename))
+    monkeypatch.setattr(loader, '_symbols_cache', {})
+    monkeypatch.setenv('INVEST_CACHE_DIR', str(tmp_path / 'cache'))
+    return tmp_path
+
+
+def sidecar_path(symbols_dir):
+    path = loader.sidecar_path(str(symbols_dir / 'test.csv'))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+@pytest.mark.parametrize('sidecar', [
+    b'not a pickle',                                   # corrupted
+    b'',                                               # truncated
+    b'cpandas\nNoSuchClass\n.',                        # class removed by another pandas version
+    b'cno_such_module\nFrame\n.',                      # module missing
+    pickle.dumps((0.0, pd.DataFrame(), {})),           # old format, without the pandas version
+])
+def test_unreadable_sidecar_is_parsed_again(symbols_dir, sidecar):
+    with open(sidecar_path(symbols_dir), 'wb') as handler:
+        handler.write(sidecar)
+    frame = loader.load_symbols('test.csv')
+    assert list(frame['SYMBOL']) == ['ENEL', 'ENI', 'NA']
+    # the sidecar is rewritten and read back by the next process
+    loader._symbols_cache.clear()
+    assert loader.load_symbols('test.csv').equals(frame)
+
+
+def test_stale_sidecar_is_parsed_again(symbols_dir):
+    mtime = os.stat(symbols_dir / 'test.csv').st_mtime
+    stale = pd.DataFrame({'SYMBOL': ['OLD']})
+    with open(sidecar_path(symbols_dir), 'wb') as handler:
+        pickle.dump((mtime, '0.0.0', stale, {'OLD': 0}), handler)
+    assert list(loader.load_symbols('test.csv')['SYMBOL']) == ['ENEL', 'ENI', 'NA']
+
+    with open(sidecar_path(symbols_dir), 'wb') as handler:
+        pickle.dump((mtime - 1, pd.__version__, stale, {'OLD': 0}), handler)
+    loader._symbols_cache.clear()
+    assert list(loader.load_symbols('test.csv')['SYMBOL']) == ['ENEL', 'ENI', 'NA']
+
+
+def test_valid_sidecar_is_used(symbols_dir):
+    mtime = os.stat(symbols_dir / 'test.csv').st_mtime
+    cached = pd.DataFrame({'SYMBOL': ['CACHED']})
+    with open(sidecar_path(symbols_dir), 'wb') as handler:
+        pickle.dump((mtime, pd.__version__, cached, {'CACHED': 0}), handler)
+    assert list(loader.load_symbols('test.csv')['SYMBOL']) == ['CACHED']
+
+
+def test_sidecar_is_written_in_the_user_cache(symbols_dir):
+    loader.load_symbols('test.csv')
+    assert os.path.exists(sidecar_path(symbols_dir))
+    # nothing is written next to the csv (e.g. in the installed package)
+    assert sorted(path.name for path in symbols_dir.iterdir()) == ['cache', 'test.csv']
+
+
+def test_sidecar_cannot_be_written(symbols_dir, monkeypatch):
+    (symbols_dir / 'not_a_folder').write_text('')
+    monkeypatch.setenv('INVEST_CACHE_DIR', str(symbols_dir / 'not_a_folder'))
+    assert list(loader.load_symbols('test.csv')['SYMBOL']) == ['ENEL', 'ENI', 'NA']
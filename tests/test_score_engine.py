@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from invest.score_engine import Bands, Linear, QuantileCap, evaluate
+
+inf = np.inf
+
+
+def values(*items):
+    return np.array(items, dtype=float)
+
+
+class TestBands:
+    def test_open_intervals(self):
+        rule = Bands([(0, 1, 5), (1, 2, 4)], default=0)
+        # the bounds belong to no band
+        np.testing.assert_array_equal(rule(values(0, 0.5, 1, 1.5, 2, 3)), [0, 5, 0, 4, 0, 0])
+
+    def test_first_match_wins(self):
+        rule = Bands([(2, inf, 5), (1, inf, 3), (-inf, 1, 2), (-inf, 0, 0)])
+        np.testing.assert_array_equal(rule(values(2.5, 1.5, 0.5, -1)), [5, 3, 2, 2])
+
+    def test_infinite_bounds_include_the_infinity(self):
+        rule = Bands([(0, inf, 5), (-inf, 0, 1)])
+        np.testing.assert_array_equal(rule(values(inf, -inf)), [5, 1])
+
+    def test_interpolated_band(self):
+        rule = Bands([(0, inf, ([0, 0.2], [0, 5])), (-inf, 0, 0)])
+        np.testing.assert_allclose(rule(values(0.05, 0.1, 0.2, 1, inf, -1)), [1.25, 2.5, 5, 5, 5, 0])
+
+    def test_default_and_nan(self):
+        rule = Bands([(0, 1, 5)], default=1, nan=3)
+        np.testing.assert_array_equal(rule(values(-1, 2, np.nan)), [1, 1, 3])
+        assert np.isnan(Bands([(0, 1, 5)])(values(2))[0])
+
+
+class TestLinear:
+    def test_interpolation_and_clipping(self):
+        rule = Linear([0.5, 1], [0, 5])
+        np.testing.assert_allclose(rule(values(-inf, 0, 0.5, 0.6, 1, 7, inf)), [0, 0, 0, 1, 5, 5, 5])
+
+    def test_nan(self):
+        assert np.isnan(Linear([0, 1], [0, 5])(values(np.nan))[0])
+        assert Linear([0, 1], [0, 5], nan=2)(values(np.nan))[0] == 2
+
+
+class TestQuantileCap:
+    def test_linear_up_to_the_quantile(self):
+        column = values(*range(11))  # the 0.9 quantile is 9
+        scores = QuantileCap(0.9)(column)
+        np.testing.assert_allclose(scores, [5 * v / 9 for v in range(10)] + [5])
+
+    def test_negative_and_nan(self):
+        scores = QuantileCap(nan=np.nan)(values(-3, np.nan, 1, 2))
+        assert scores[0] == 0 and np.isnan(scores[1])
+        assert QuantileCap()(values(np.nan, 1))[0] == 0
+
+    def test_positive_only(self):
+        column = values(-100, -50, 0, 1, 2, 3)
+        # without positive_only the negatives lower the quantile
+        assert QuantileCap(0.5, positive_only=True)(column)[3] == pytest.approx(2.5)
+        assert QuantileCap(0.5)(column)[2] == 0 and QuantileCap(0.5)(column)[3] == 5
+
+    def test_no_values(self):
+        assert np.isnan(QuantileCap(nan=np.nan)(values(np.nan, np.nan))).all()
+
+
+def test_evaluate():
+    table = pd.DataFrame({'a': [0.5, 'n/a', None], 'b': [1, 2, 3]}, index=['x', 'y', 'z'])
+    scores = evaluate(table, [('score_a', 'a', Linear([0, 1], [0, 5])),
+                              ('score_ab', lambda t: t['b'] * 2, Bands([(3, inf, 5)], default=0))])
+    assert list(scores.index) == ['x', 'y', 'z'] and (scores.dtypes == float).all()
+    np.testing.assert_array_equal(scores['score_a'], [2.5, np.nan, np.nan])
+    np.testing.assert_array_equal(scores['score_ab'], [0, 5, 5])
@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from invest import scoring
+from invest.scoring import SCORE_RULES, compute_score
+
+inf = np.inf
+
+INDICATORS = ['Dividend yeld', 'Payout Ratio', 'Number of Years of Dividends', 'Dividend Consistency', 'Quick Ratio',
+              'Cash Ratio', 'Current Ratio', 'Operating Cash Flow Ratio', 'market_cap', 'Net income per employee',
+              'Debt to Assets Ratio', 'Interest Coverage Ratio', 'Debt Service Coverage Ratio', 'Free Cash Flow Yield',
+              'PE', 'PB', 'Return on Assets', 'ROE', 'Net current asset per share over price', 'ROCE',
+              'EPS over price', 'Book Value per Share', 'Reference Price', 'Price to free cash flow',
+              'price_over_graham', 'NetIncome derivative', 'Revenue derivative', 'TotalAssets derivative',
+              'st_trend_magnitude', 'lt_trend_magnitude']
+
+
+@pytest.fixture
+def indicators():
+    rng = np.random.default_rng(0)
+    table = pd.DataFrame({column: rng.uniform(0, 3, 20) for column in INDICATORS})
+    table.insert(0, 'code', [f"SYN{i:05d}" for i in range(20)])
+    table.iloc[0, 1:] = np.nan
+    return table
+
+
+def scores_of(column, *items):
+    """
+    The scores of the given values of an indicator, the others being random.
+    """
+    rng = np.random.default_rng(1)
+    table = pd.DataFrame({name: rng.uniform(0.1, 3, len(items)) for name in INDICATORS})
+    table[column] = items
+    return compute_score(table).sort_index()
+
+
+def test_scores_and_overall_score(indicators):
+    scores = compute_score(indicators)
+    names = [name for name, _, _ in SCORE_RULES]
+    assert set(names) <= set(scores.columns) and (scores[names].dtypes == float).all()
+    assert ((scores[names] >= 0) & (scores[names] <= 5) | scores[names].isna()).all().all()
+    np.testing.assert_allclose(scores['OVERALL_SCORE'], scores.filter(like='score_').mean(axis=1))
+    assert scores['OVERALL_SCORE'].is_monotonic_decreasing
+
+
+def test_input_is_not_modified(indicators):
+    original = indicators.copy()
+    compute_score(indicators)
+    pd.testing.assert_frame_equal(indicators, original)
+
+
+def test_missing_values(indicators):
+    scores = compute_score(indicators).loc[0]
+    # missing fundamentals score 0, except for the ones without an opinion (NaN) or a neutral one
+    assert scores['score_dividend_YELD'] == 0 and scores['score_value_PE'] == 0
+    assert scores['score_value_NCAPSOP'] == 3
+    assert np.isnan(scores['score_liquidity_QR']) and np.isnan(scores['score_solvency_ICR'])
+
+
+def test_bands_of_the_value_scores():
+    scores = scores_of('PE', -5, 10, 11, 15, 17.5, 30, inf)
+    np.testing.assert_array_equal(scores['score_value_PE'], [5, 4, 4, 2, 1, 1, 1])
+    scores = scores_of('price_over_graham', 0.5, 1, 1.05, 1.5, 3, inf)
+    np.testing.assert_array_equal(scores['score_value_graham'], [5, np.nan, 4, np.nan, 1, 1])
+
+
+def test_growth_scores():
+    # a growing quantity scores 5, including an infinite growth (a division by zero)
+    scores = scores_of('NetIncome derivative', -1, 0, 1e-9, 3, inf, np.nan)
+    np.testing.assert_array_equal(scores['score_growth_netincome'], [0, 0, 5, 5, 5, 0])
+
+
+def test_eps_of_zero_scores_zero():
+    scores = scores_of('EPS over price', 0, -1, np.nan, 0.1)
+    np.testing.assert_array_equal(scores['score_value_EPS'][:3], [0, 0, 0])
+
+
+@pytest.mark.parametrize('helper, score', [('score_YELD', 'score_dividend_YELD'),
+                                           ('score_QR', 'score_liquidity_QR'),
+                                           ('score_OCFR', 'score_liquidity_OCFR'),
+                                           ('score_PE', 'score_value_PE'),
+                                           ('score_graham', 'score_value_graham'),
+                                           ('score_TREND', 'score_technical_sttrend'),
+                                           ('score_price_to_free_cashflow', 'score_value_PFCF')])
+def test_helpers_follow_the_rules(indicators, helper, score):
+    source = {name: source for name, source, _ in SCORE_RULES}[score]
+    expected = compute_score(indicators).sort_index()[score]
+    result = getattr(scoring, helper)(indicators[source])
+    np.testing.assert_array_equal(result.to_numpy(), expected.to_numpy())
+    assert result.index.equals(indicators.index)
+
+
+def test_quantile_helper():
+    scores = scoring.score_quantile(pd.Series([np.nan, -1, 0, 1, 2, 10], index=list('abcdef')), nan_score=2)
+    assert list(scores.index) == list('abcdef')
+    assert scores['a'] == 2 and scores['b'] == 0 and scores['c'] == 0 and scores['f'] == 5
@@ -0,0 +1,40 @@
+import pytest
+
+from invest import scoring
+from invest.sources import SyntheticSource
+
+
+@pytest.fixture
+def failing_indicators(monkeypatch):
+    get_indicators = scoring.get_indicators
+
+    def failing(stock, trend_engine):
+        if stock.code == 'ENEL.MI':
+            raise ValueError('no data')
+        return get_indicators(stock, trend_engine)
+    monkeypatch.setattr(scoring, 'get_indicators', failing)
+
+
+def test_errors_are_keyed_by_input_symbol(failing_indicators):
+    # ENEL is resolved to the isin IT0003128367 and the yahoo code ENEL.MI
+    indicators = scoring.screen(['ENEL', 'SYN00001'], workers=1, trend_engine='exact',
+                                data_source=SyntheticSource())
+    assert list(indicators['code']) == ['SYN00001']
+    assert list(indicators.attrs['errors']) == ['ENEL']
+    assert isinstance(indicators.attrs['errors']['ENEL'], ValueError)
+
+
+def test_worker_processes_are_not_forked():
+    pool = scoring.process_pool(2)
+    try:
+        assert pool._mp_context.get_start_method() != 'fork'
+    finally:
+        pool.shutdown()
+
+
+def test_screen_in_worker_processes():
+    symbols = SyntheticSource.symbols(4)
+    indicators = scoring.screen(symbols, workers=2, network_workers=2, chunk_size=2, trend_engine='exact',
+                                data_source=SyntheticSource())
+    assert sorted(indicators['code']) == symbols
+    assert not indicators.attrs['errors']
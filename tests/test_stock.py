@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+from invest.stock import trailing_sums
+
+
+def quarterly(**columns):
+    n = len(next(iter(columns.values())))
+    frame = pd.DataFrame(columns, index=pd.date_range('2022-03-31', periods=n, freq='QE', name='asOfDate'))
+    frame['periodType'] = '3M'
+    return frame
+
+
+def test_sums_of_the_last_four_quarters():
+    financials = quarterly(NetIncome=[1., 2., 3., 4., 5., 6.], TotalRevenue=[10., 10., 10., 10., 20., 20.])
+    sums = trailing_sums(financials, ['NetIncome', 'TotalRevenue'])
+    assert list(sums.columns) == ['NetIncome', 'TotalRevenue']
+    np.testing.assert_array_equal(sums['NetIncome'], [np.nan, np.nan, np.nan, 10, 14, 18])
+    np.testing.assert_array_equal(sums['TotalRevenue'], [np.nan, np.nan, np.nan, 40, 50, 60])
+
+
+def test_null_quarter_in_the_window():
+    # the null quarter is skipped: the window is made of the last four reported values
+    financials = quarterly(NetIncome=[1., 2., np.nan, 4., 5., 6.])
+    sums = trailing_sums(financials, ['NetIncome'])
+    np.testing.assert_array_equal(sums['NetIncome'], [np.nan, np.nan, np.nan, np.nan, 12, 17])
+
+
+def test_fewer_than_four_quarters():
+    sums = trailing_sums(quarterly(NetIncome=[1., 2., 3.]), ['NetIncome'])
+    assert len(sums) == 3 and sums['NetIncome'].isna().all()
+
+
+def test_repeated_and_missing_columns():
+    # the income statement and the cash flow share some columns, e.g. NetIncome
+    financials = quarterly(NetIncome=[1., 2., 3., 4.], FreeCashFlow=[1., 1., 1., 1.])
+    sums = trailing_sums(financials, ['NetIncome', 'FreeCashFlow', 'NetIncome', 'NotReported'])
+    assert list(sums.columns) == ['NetIncome', 'FreeCashFlow']
+    assert sums.iloc[-1].tolist() == [10, 4]
+
+
+def test_other_periods_and_order():
+    financials = quarterly(NetIncome=[4., 3., 2., 1., 100.]).iloc[::-1]
+    financials.loc[financials.index[0], 'periodType'] = '12M'
+    sums = trailing_sums(financials, ['NetIncome'])
+    # the yearly report is ignored and the quarters are sorted by date
+    assert sums.index.is_monotonic_increasing and len(sums) == 4
+    assert sums['NetIncome'].iloc[-1] == 10
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from invest.data_loader.symbol_master import SYMBOL_MASTER_DTYPE, SymbolMaster
+
+
+def master(*rows):
+    return SymbolMaster(np.array([tuple(field.encode('utf-8') for field in row) for row in rows],
+                                 dtype=SYMBOL_MASTER_DTYPE))
+
+
+# (isin, ticker, yahoo_code, exchange, name)
+ABC_MILAN = ('IT0000000001', 'ABC', 'ABC.MI', 'Borsa Italiana', 'ABC Milano')
+ABC_TOKYO = ('', 'ABC', 'ABC.T', 'Tokyo', 'ABC Tokyo')
+XYZ_MILAN = ('IT0000000002', 'XYZ', 'XYZ.MI', 'Borsa Italiana', 'XYZ Milano')
+XYZ_NYSE = ('', 'XYZ', 'XYZ', 'NYSE', 'XYZ Corp')
+
+
+def test_isin_and_yahoo_code_are_unique():
+    symbols = master(ABC_MILAN, ABC_TOKYO)
+    assert symbols.resolve('it0000000001')['yahoo_code'] == 'ABC.MI'
+    assert symbols.resolve('ABC.T')['exchange'] == 'Tokyo'
+    assert symbols.resolve('unknown') is None
+
+
+def test_colliding_ticker_needs_the_exchange():
+    symbols = master(ABC_MILAN, ABC_TOKYO)
+    with pytest.raises(ValueError, match='Borsa Italiana, Tokyo'):
+        symbols.resolve('ABC')
+    assert symbols.resolve('ABC', exchange='Borsa Italiana')['yahoo_code'] == 'ABC.MI'
+    assert symbols.resolve('abc', exchange='Tokyo')['yahoo_code'] == 'ABC.T'
+    assert symbols.resolve('ABC', exchange='NYSE') is None
+
+
+def test_yahoo_code_wins_over_ticker():
+    # in any merge order, XYZ is the NYSE yahoo code; the Milan ticker needs the exchange
+    for rows in [(XYZ_MILAN, XYZ_NYSE), (XYZ_NYSE, XYZ_MILAN)]:
+        symbols = master(*rows)
+        assert symbols.resolve('XYZ')['exchange'] == 'NYSE'
+        assert symbols.resolve('XYZ', exchange='Borsa Italiana')['yahoo_code'] == 'XYZ.MI'
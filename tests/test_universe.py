@@ -0,0 +1,35 @@
+import pandas as pd
+
+from invest import StockUniverse
+from invest.sources import SyntheticSource
+
+
+class MalformedSource(SyntheticSource):
+    """
+    Synthetic responses, except for the quarterly financials of one symbol (a frame without asOfDate).
+    """
+    def __init__(self, symbol : str):
+        super().__init__()
+        self.symbol = symbol
+
+    def download(self, stock, module : str, frequency : str = None):
+        if stock.yahoo_code == self.symbol and module == 'all_financial_data':
+            return pd.DataFrame({'unexpected': [1.0]})
+        return super().download(stock, module, frequency)
+
+
+def test_snapshots_skip_failing_stocks():
+    symbols = SyntheticSource.symbols(5)
+    universe = StockUniverse(symbols, chunk_size=2, data_source=MalformedSource('SYN00001'))
+    snapshots = universe.snapshots()
+    assert [snapshot.code for snapshot in snapshots] == [symbol for symbol in symbols if symbol != 'SYN00001']
+    assert list(universe.errors) == ['SYN00001']
+    assert isinstance(universe.errors['SYN00001'], KeyError)
+    # every stock is released, the failing one included
+    assert all(not stock._raw and not stock._memo for stock in universe)
+
+
+def test_snapshots_without_release_keep_the_data():
+    universe = StockUniverse(SyntheticSource.symbols(2), data_source=SyntheticSource())
+    assert len(universe.snapshots(release=False)) == 2 and not universe.errors
+    assert all(stock._raw for stock in universe)